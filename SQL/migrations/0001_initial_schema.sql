@@ -0,0 +1,17 @@
+-- Tables previously created by SQL/create_database.sql
+
+CREATE TABLE IF NOT EXISTS network_configurations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    network_name VARCHAR(255) NOT NULL,
+    bandwidth VARCHAR(255),
+    status VARCHAR(255) DEFAULT 'active',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS billing_records (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    amount DECIMAL(10, 2) NOT NULL,
+    payment_status VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,5 @@
+-- NetworkDatabase.retrieve_data, retrieve_many and update_data filter on network_name
+CREATE INDEX idx_network_configurations_network_name ON network_configurations (network_name);
+
+-- Billing queries filter by user and list the most recent records first
+CREATE INDEX idx_billing_records_user_id ON billing_records (user_id, created_at);
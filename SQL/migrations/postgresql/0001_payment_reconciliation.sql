@@ -0,0 +1,16 @@
+-- Orders written by BillingSystem.create_order; reconciliation upserts captured payments by order_id
+CREATE TABLE IF NOT EXISTS payments (
+    order_id VARCHAR(64) PRIMARY KEY,
+    payment_id VARCHAR(64),
+    amount BIGINT NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    payer VARCHAR(255),
+    payment_status VARCHAR(32) DEFAULT 'Created',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- High-water marks of incremental syncs, e.g. the Razorpay `from` timestamp of the last reconciliation
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    name VARCHAR(64) PRIMARY KEY,
+    position BIGINT NOT NULL
+);
@@ -0,0 +1,49 @@
+from a2wsgi import WSGIMiddleware
+from quart import Response
+from werkzeug.exceptions import HTTPException
+from broadcast import sse_stream
+
+
+class RouteDispatcher:
+    """
+    ASGI app serving the routes of an async (Quart) app natively and every other
+    request through a synchronous Flask app.
+
+    Routes whose handlers wait on outbound I/O are ported to the async app, where a
+    request waiting for an upstream API suspends instead of holding a thread. The rest
+    keep running unchanged on ``wsgi_workers`` threads. Lifespan and websocket events
+    go to the async app. The async app should be created with ``static_folder=None`` so
+    static files stay with Flask.
+    """
+
+    def __init__(self, async_app, wsgi_app, wsgi_workers=16):
+        """
+        :param async_app: Quart app with the async routes
+        :param wsgi_app: Flask app serving everything else
+        :param wsgi_workers: Threads running Flask requests at the same time
+        """
+        self.async_app = async_app
+        self.wsgi_app = WSGIMiddleware(wsgi_app, workers=wsgi_workers)
+        self.routes = async_app.url_map.bind("")
+
+    def is_async(self, path, method):
+        """Returns whether the async app has a route for ``method`` on ``path``."""
+        try:
+            self.routes.match(path, method=method)
+        except HTTPException:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not self.is_async(scope["path"], scope["method"]):
+            await self.wsgi_app(scope, receive, send)
+        else:
+            await self.async_app(scope, receive, send)
+
+
+def sse_response(subscription, heartbeat=15.0):
+    """Streams a broadcast.Subscription to the client as server-sent events."""
+    response = Response(sse_stream(subscription, heartbeat), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.timeout = None  # Open until the client disconnects
+    return response
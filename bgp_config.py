@@ -0,0 +1,224 @@
+import re
+
+# Command that prints the device's running BGP configuration
+RUNNING_CONFIG_COMMAND = "show running-config | section router bgp"
+
+# Neighbor attributes that take a single value; setting a new value replaces the old one
+SINGLE_VALUED = {"remote-as", "description", "update-source", "password", "ebgp-multihop",
+                 "peer-group", "maximum-prefix", "timers", "local-as", "weight"}
+
+# Settings IOS places under 'address-family ipv4' once 'no bgp default ipv4-unicast' is set, but
+# accepts (and older releases show) at router level
+IPV4_UNICAST = "address-family ipv4 unicast"
+FAMILY_STATEMENTS = ("network ", "redistribute ", "aggregate-address ", "maximum-paths ", "default-information ",
+                     "default-metric ", "distance ", "auto-summary", "no auto-summary", "synchronization",
+                     "no synchronization", "table-map ")
+FAMILY_NEIGHBOR_ATTRIBUTES = {"activate", "route-map", "prefix-list", "filter-list", "distribute-list",
+                              "soft-reconfiguration", "send-community", "next-hop-self", "maximum-prefix",
+                              "default-originate", "remove-private-as", "allowas-in", "route-reflector-client",
+                              "weight", "unsuppress-map", "as-override"}
+
+# Lines the platform adds to the running configuration by itself
+PLATFORM_DEFAULTS = {"bgp log-neighbor-changes"}
+
+# Objects an intent can remove with 'no ...'; other 'no ...' lines are settings in their own right
+REMOVABLE = ("neighbor ", "network ", "redistribute ", "aggregate-address ")
+
+
+class BGPConfig:
+    """
+    Structured form of a 'router bgp' section used to compute minimal config changes.
+
+    Lines are stored where they take effect rather than where they were written: IPv4
+    unicast settings given at router level and the lines of an 'address-family ipv4'
+    block both end up in the 'address-family ipv4 unicast' family, so a device that
+    shows them in an address-family block matches an intent that lists them flat.
+    """
+
+    def __init__(self, asn=None):
+        self.asn = asn
+        self.statements = {}        # Router level lines, in order (dict used as an ordered set)
+        self.address_families = {} # 'address-family ...' line -> ordered set of lines
+        self.headers = {}          # Family -> 'address-family' line as written, None if only given flat
+
+    @classmethod
+    def parse(cls, config):
+        """
+        Parses configuration lines into a BGPConfig.
+        Works on both a device's running configuration and a list of configuration commands.
+        :param config: Configuration text or list of lines
+        """
+        if isinstance(config, str):
+            config = config.splitlines()
+        result = cls()
+        in_router = False
+        block = None
+        for raw in config:
+            line = " ".join(raw.split())
+            if not line or line.startswith("!"):
+                continue
+            match = re.match(r"router bgp (\S+)$", line)
+            if match:
+                result.asn = match.group(1)
+                in_router = True
+                block = result.statements
+                continue
+            if not in_router:
+                continue
+            if line.startswith("address-family "):
+                family = _family(line)
+                result.headers[family] = line
+                block = result.address_families.setdefault(family, {})
+            elif line == "exit-address-family":
+                block = result.statements
+            elif line == "exit":
+                if block is result.statements:
+                    in_router = False
+                block = result.statements
+            elif line.startswith("router "):
+                # Another routing process
+                in_router = False
+            elif line in PLATFORM_DEFAULTS:
+                continue
+            elif block is result.statements and _in_ipv4_unicast(line):
+                result.headers.setdefault(IPV4_UNICAST, None)
+                result.address_families.setdefault(IPV4_UNICAST, {})[line] = None
+            else:
+                block[line] = None
+        return result
+
+    def diff(self, intended, replace=False):
+        """
+        Computes the commands that bring this (running) configuration to ``intended``.
+
+        By default the intent is merged: missing lines are added, changed single-valued
+        settings are overwritten and only the intent's own 'no ...' lines remove anything,
+        so neighbors, families and platform settings it does not mention are left alone.
+        With ``replace`` the intent is the complete BGP configuration and every other line
+        is removed.
+        :param intended: BGPConfig with the desired state
+        :param replace: Remove whatever the intent does not declare
+        :return: List of configuration commands, empty when nothing changed
+        """
+        if intended.asn is None:
+            return []
+        if self.asn is not None and self.asn != intended.asn:
+            # A device runs a single BGP process; replacing it means starting over
+            return [f"no router bgp {self.asn}"] + intended.commands()
+
+        removed_neighbors = set()
+        kept = set()
+        if replace:
+            # Neighbors that lose their remote-as are removed in one command
+            intended_keys = {_key(line) for line in intended.statements}
+            for line in self.statements:
+                words = line.split()
+                if len(words) >= 3 and words[0] == "neighbor" and words[2] == "remote-as" and _key(line) not in intended_keys:
+                    removed_neighbors.add(words[1])
+            # An intent written for 'bgp default ipv4-unicast' activates its neighbors implicitly
+            kept = {f"neighbor {line.split()[1]} activate" for line in intended.statements
+                    if line.startswith("neighbor ") and _key(line).endswith(" remote-as")}
+
+        commands = [f"no neighbor {neighbor}" for neighbor in sorted(removed_neighbors)]
+        commands += _diff_block(self.statements, intended.statements, removed_neighbors, replace)
+        families = list(self.address_families)
+        families += [family for family in intended.address_families if family not in self.address_families]
+        for family in families:
+            running = self.address_families.get(family, {})
+            wanted = intended.address_families.get(family)
+            header = self.headers.get(family) or intended.headers.get(family)
+            if wanted is None and family != IPV4_UNICAST:
+                if replace and running:
+                    commands.append(f"no {header}")
+                continue
+            # The IPv4 unicast family also holds router level settings, so it is cleared line by line
+            changes = _diff_block(running, wanted or {}, removed_neighbors, replace, kept)
+            if changes and header is None:
+                commands += changes  # IPv4 unicast settings given at router level stay there
+            elif changes:
+                commands += [header] + changes + ["exit-address-family"]
+        if not commands:
+            return []
+        return [f"router bgp {intended.asn}"] + commands + ["exit"]
+
+    def commands(self):
+        """Returns the full configuration as commands."""
+        commands = [f"router bgp {self.asn}"] + list(self.statements)
+        for family, lines in self.address_families.items():
+            header = self.headers.get(family)
+            if header is None:
+                commands += list(lines)
+            else:
+                commands += [header] + list(lines) + ["exit-address-family"]
+        return commands + ["exit"]
+
+
+def diff_commands(running_config, config_commands, replace=False):
+    """
+    Returns the minimal commands that bring the running configuration to the intended one.
+    :param running_config: Output of RUNNING_CONFIG_COMMAND
+    :param config_commands: Intended configuration commands
+    :param replace: Treat the commands as the complete BGP configuration and remove everything else
+    """
+    return BGPConfig.parse(running_config).diff(BGPConfig.parse(config_commands), replace)
+
+
+def _family(line):
+    """Normalises an 'address-family' line; 'address-family ipv4' means IPv4 unicast."""
+    words = line.split()
+    if len(words) == 2 and words[1] in ("ipv4", "ipv6"):
+        words.append("unicast")
+    return " ".join(words)
+
+
+def _in_ipv4_unicast(line):
+    """Returns whether a router level line is an IPv4 unicast setting."""
+    if line.startswith(FAMILY_STATEMENTS):
+        return True
+    words = line.split()
+    if words[0] == "no":
+        words = words[1:]
+    return len(words) >= 3 and words[0] == "neighbor" and words[2] in FAMILY_NEIGHBOR_ATTRIBUTES
+
+
+def _key(line):
+    """Identifies the setting a line configures, so a changed value replaces rather than removes it."""
+    words = line.split()
+    if words[0] == "neighbor" and len(words) >= 4:
+        if words[2] in SINGLE_VALUED:
+            return " ".join(words[:3])
+        if words[2] in ("route-map", "prefix-list", "filter-list", "distribute-list") and len(words) == 5:
+            return " ".join(words[:3] + words[4:])
+    if words[:2] == ["bgp", "router-id"]:
+        return "bgp router-id"
+    return line
+
+
+def _negate(line):
+    return line[3:] if line.startswith("no ") else f"no {line}"
+
+
+def _diff_block(running, wanted, removed_neighbors, replace=False, kept=()):
+    replaced = {_key(line) for line in wanted}
+    commands = []
+    for line in running:
+        if line in wanted or line in kept or not replace:
+            continue
+        words = line.split()
+        if words[0] == "neighbor" and len(words) > 1 and words[1] in removed_neighbors:
+            continue  # Already removed with 'no neighbor'
+        if _key(line) != line and _key(line) in replaced:
+            continue  # Overwritten by the new value
+        commands.append(_negate(line))
+    for line in wanted:
+        if line in running:
+            continue
+        if line.startswith("no ") and line[3:].startswith(REMOVABLE) and not _configured(line[3:], running):
+            continue  # Nothing to remove
+        commands.append(line)
+    return commands
+
+
+def _configured(line, running):
+    """Returns whether the running lines configure ``line``, e.g. 'neighbor 10.0.0.9' by any of its settings."""
+    return any(existing == line or existing.startswith(line + " ") for existing in running)
@@ -0,0 +1,157 @@
+import ipaddress
+import numpy as np
+from bgp_rib import RIB, format_prefix, prefix_key
+
+# ORIGIN attribute codes; lower is preferred
+ORIGIN_CODES = {"igp": 0, "egp": 1, "incomplete": 2}
+
+
+class RouteTable:
+    """
+    Candidate routes held in NumPy columns so the decision process runs over
+    every prefix at once.
+
+    Best path order: highest local-pref, shortest AS path, lowest origin,
+    lowest MED (compared across all neighbors, like 'bgp always-compare-med'),
+    lowest router-id.
+    """
+
+    def __init__(self, capacity=1024):
+        """
+        :param capacity: Initial number of rows; the columns grow as needed
+        """
+        self.size = 0
+        self.prefix = np.empty(capacity, dtype=np.int64)
+        self.peer = np.empty(capacity, dtype=np.int64)
+        self.local_pref = np.empty(capacity, dtype=np.int64)
+        self.as_path_len = np.empty(capacity, dtype=np.int32)
+        self.origin = np.empty(capacity, dtype=np.int8)
+        self.med = np.empty(capacity, dtype=np.int64)
+        self.router_id = np.empty(capacity, dtype=np.int64)
+        self.valid = np.empty(capacity, dtype=bool)
+        self.prefix_index = RIB()  # prefix -> row in prefix_keys
+        self.prefix_keys = []
+
+    def __len__(self):
+        return self.size
+
+    def _columns(self):
+        return ("prefix", "peer", "local_pref", "as_path_len", "origin", "med", "router_id", "valid")
+
+    def _grow(self, needed):
+        capacity = len(self.prefix)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self._columns():
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def _prefix_id(self, prefix):
+        key = prefix_key(prefix)
+        index = self.prefix_index.get(key)
+        if index is None:
+            index = len(self.prefix_keys)
+            self.prefix_index.insert(key, index)
+            self.prefix_keys.append(key)
+        return index
+
+    def add_route(self, prefix, peer, local_pref=100, as_path=(), origin="igp", med=0, router_id=0):
+        """
+        Adds a candidate route and returns its row number.
+        :param prefix: Prefix string or parsed prefix key
+        :param peer: ASN of the neighbor the route was learned from
+        :param as_path: AS path as a sequence of ASNs, or its length
+        :param origin: 'igp', 'egp', 'incomplete' or the numeric code
+        :param router_id: Neighbor router-id as dotted quad or integer
+        """
+        # Checked before any column is written, so a bad route leaves the table unchanged
+        code = ORIGIN_CODES.get(origin) if isinstance(origin, str) else origin
+        if code not in ORIGIN_CODES.values():
+            raise ValueError(f"Unknown origin {origin!r}")
+        self._grow(self.size + 1)
+        row = self.size
+        self.prefix[row] = self._prefix_id(prefix)
+        self.peer[row] = int(peer)
+        self.local_pref[row] = local_pref
+        self.as_path_len[row] = as_path if isinstance(as_path, int) else len(as_path)
+        self.origin[row] = code
+        self.med[row] = med
+        self.router_id[row] = int(ipaddress.IPv4Address(router_id)) if isinstance(router_id, str) else router_id
+        self.valid[row] = True
+        self.size += 1
+        return row
+
+    def add_routes(self, routes):
+        """
+        Adds routes given as dictionaries with 'prefix', 'peer' and optional
+        'local_pref', 'as_path', 'origin', 'med' and 'router_id' keys.
+        """
+        for route in routes:
+            self.add_route(
+                route["prefix"],
+                route["peer"],
+                route.get("local_pref", 100),
+                route.get("as_path", ()),
+                route.get("origin", "igp"),
+                route.get("med", 0),
+                route.get("router_id", 0),
+            )
+
+    def withdraw_peer(self, peer):
+        """Invalidates every route learned from ``peer`` (a session flap). Returns the number of routes removed."""
+        rows = (self.peer[:self.size] == peer) & self.valid[:self.size]
+        self.valid[:self.size][rows] = False
+        return int(rows.sum())
+
+    def restore_peer(self, peer):
+        """Re-validates the routes learned from ``peer`` after its session comes back."""
+        rows = self.peer[:self.size] == peer
+        self.valid[:self.size][rows] = True
+        return int(rows.sum())
+
+    def set_local_pref(self, peer, local_pref):
+        """Applies a local-pref policy to every route learned from ``peer``."""
+        self.local_pref[:self.size][self.peer[:self.size] == peer] = local_pref
+
+    def best_paths(self):
+        """
+        Runs the decision process for all prefixes in one vectorized pass.
+        :return: Array with the winning row for each prefix id, or -1 where no route is valid
+        """
+        n = self.size
+        rows = np.flatnonzero(self.valid[:n])
+        # np.lexsort sorts by the last key first
+        order = np.lexsort((
+            self.router_id[rows],
+            self.med[rows],
+            self.origin[rows],
+            self.as_path_len[rows],
+            -self.local_pref[rows],
+            self.prefix[rows],
+        ))
+        ranked = rows[order]
+        prefixes = self.prefix[ranked]
+        first = np.ones(len(ranked), dtype=bool)
+        first[1:] = prefixes[1:] != prefixes[:-1]
+        best = np.full(len(self.prefix_keys), -1, dtype=np.int64)
+        best[prefixes[first]] = ranked[first]
+        return best
+
+    def describe(self, best):
+        """Converts the result of best_paths() to {prefix: route attributes} for reporting."""
+        result = {}
+        for prefix_id in np.flatnonzero(best >= 0):
+            row = best[prefix_id]
+            result[format_prefix(self.prefix_keys[prefix_id])] = {
+                "peer": int(self.peer[row]),
+                "local_pref": int(self.local_pref[row]),
+                "as_path_len": int(self.as_path_len[row]),
+                "origin": int(self.origin[row]),
+                "med": int(self.med[row]),
+                "router_id": str(ipaddress.IPv4Address(int(self.router_id[row]))),
+            }
+        return result
@@ -0,0 +1,306 @@
+import ipaddress
+
+# Address widths by IP version
+WIDTH = {4: 32, 6: 128}
+
+_EMPTY = object()  # Marks glue nodes that only exist to branch the trie
+
+
+class RadixNode:
+    """A node of the compressed trie. ``key`` holds the prefix bits left-aligned to the address width."""
+
+    __slots__ = ("key", "length", "value", "left", "right")
+
+    def __init__(self, key, length, value=_EMPTY):
+        self.key = key
+        self.length = length
+        self.value = value
+        self.left = None
+        self.right = None
+
+
+class RadixTrie:
+    """Path-compressed binary radix trie (Patricia trie) for one address family."""
+
+    def __init__(self, width):
+        """
+        :param width: Address width in bits (32 for IPv4, 128 for IPv6)
+        """
+        self.width = width
+        self.root = RadixNode(0, 0)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _bit(self, key, position):
+        return (key >> (self.width - 1 - position)) & 1
+
+    def _common_length(self, a, b, limit):
+        diff = a ^ b
+        if not diff:
+            return limit
+        return min(self.width - diff.bit_length(), limit)
+
+    def insert(self, key, length, value):
+        """Inserts or replaces the value stored for a prefix. Returns the node holding it."""
+        width = self.width
+        node = self.root
+        while True:
+            if node.length == length:
+                if node.value is _EMPTY:
+                    self.size += 1
+                node.value = value
+                return node
+            right = (key >> (width - 1 - node.length)) & 1
+            child = node.right if right else node.left
+            if child is None:
+                child = RadixNode(key, length, value)
+                self.size += 1
+                if right:
+                    node.right = child
+                else:
+                    node.left = child
+                return child
+
+            if child.length <= length and not (key ^ child.key) >> (width - child.length):
+                # The child covers the new prefix: keep descending
+                node = child
+                continue
+
+            common = self._common_length(child.key, key, min(child.length, length))
+            if common == length:
+                # The new prefix covers the child: insert it between
+                new = RadixNode(key, length, value)
+            else:
+                # The prefixes diverge: branch them under a glue node
+                mask = self._mask(common)
+                new = RadixNode(key & mask, common)
+                leaf = RadixNode(key, length, value)
+                if self._bit(key, common):
+                    new.right = leaf
+                else:
+                    new.left = leaf
+            if self._bit(child.key, common):
+                new.right = child
+            else:
+                new.left = child
+            if right:
+                node.right = new
+            else:
+                node.left = new
+            self.size += 1
+            return new if common == length else leaf
+
+    def _mask(self, length):
+        return ((1 << length) - 1) << (self.width - length)
+
+    def find(self, key, length):
+        """Returns the node holding exactly this prefix, or None."""
+        # Descend on the prefix bits alone; a single key comparison at the end
+        # rejects any path that skipped over mismatching bits.
+        shift = self.width - 1
+        node = self.root
+        while node.length < length:
+            node = node.right if (key >> (shift - node.length)) & 1 else node.left
+            if node is None:
+                return None
+        if node.length != length or node.key != key or node.value is _EMPTY:
+            return None
+        return node
+
+    def get(self, key, length, default=None):
+        node = self.find(key, length)
+        return default if node is None else node.value
+
+    def withdraw(self, key, length):
+        """Removes a prefix and returns its value, or None if it was not present."""
+        shift = self.width - 1
+        grandparent = parent = None
+        node = self.root
+        while node.length < length:
+            grandparent, parent = parent, node
+            node = node.right if (key >> (shift - node.length)) & 1 else node.left
+            if node is None:
+                return None
+        if node.length != length or node.key != key or node.value is _EMPTY:
+            return None
+
+        value = node.value
+        node.value = _EMPTY
+        self.size -= 1
+        if node is self.root:
+            return value
+        # Keep the trie compressed: drop empty leaves and splice out single-child glue nodes
+        if node.left is not None and node.right is not None:
+            return value
+        self._replace(parent, node, node.left or node.right)
+        if parent is not self.root and parent.value is _EMPTY and (parent.left is None or parent.right is None):
+            self._replace(grandparent, parent, parent.left or parent.right)
+        return value
+
+    def _replace(self, parent, old, new):
+        if parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+
+    def longest_match(self, address):
+        """Returns the (key, length, value) of the most specific prefix containing ``address``, or None."""
+        best = None
+        node = self.root
+        while node is not None:
+            if node.length and (address ^ node.key) & self._mask(node.length):
+                break
+            if node.value is not _EMPTY:
+                best = node
+            if node.length == self.width:
+                break
+            node = node.right if self._bit(address, node.length) else node.left
+        return None if best is None else (best.key, best.length, best.value)
+
+    def covering(self, key, length):
+        """Yields (key, length, value) for every prefix that contains the given prefix, shortest first."""
+        node = self.root
+        while node is not None and node.length <= length:
+            if node.length and (key ^ node.key) & self._mask(node.length):
+                return
+            if node.value is not _EMPTY:
+                yield node.key, node.length, node.value
+            if node.length == length:
+                return
+            node = node.right if self._bit(key, node.length) else node.left
+
+    def covered(self, key, length):
+        """Yields (key, length, value) for every prefix inside the given prefix, including itself."""
+        node = self.root
+        mask = self._mask(length)
+        while node is not None and node.length < length:
+            node = node.right if self._bit(key, node.length) else node.left
+        if node is None or (node.key ^ key) & mask:
+            return
+        yield from self._walk(node)
+
+    def items(self):
+        """Yields (key, length, value) for every prefix in address order."""
+        return self._walk(self.root)
+
+    def _walk(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.value is not _EMPTY:
+                yield node.key, node.length, node.value
+            if node.right is not None:
+                stack.append(node.right)
+            if node.left is not None:
+                stack.append(node.left)
+
+
+class RIB:
+    """Routing table holding IPv4 and IPv6 prefixes in radix tries."""
+
+    def __init__(self):
+        self.tries = {version: RadixTrie(width) for version, width in WIDTH.items()}
+
+    def __len__(self):
+        return len(self.tries[4]) + len(self.tries[6])
+
+    def __contains__(self, prefix):
+        version, key, length = prefix_key(prefix)
+        return self.tries[version].find(key, length) is not None
+
+    def insert(self, prefix, value):
+        """
+        Adds or replaces a route.
+        :param prefix: Prefix string, ('address', 'netmask') pair or parsed prefix key
+        :param value: Route data stored for the prefix
+        """
+        version, key, length = prefix_key(prefix)
+        self.tries[version].insert(key, length, value)
+
+    def node(self, prefix, default=None):
+        """Returns the trie node for a prefix, creating it with ``default`` when missing."""
+        version, key, length = prefix_key(prefix)
+        trie = self.tries[version]
+        node = trie.find(key, length)
+        if node is None:
+            node = trie.insert(key, length, default)
+        return node
+
+    def get(self, prefix, default=None):
+        version, key, length = prefix_key(prefix)
+        return self.tries[version].get(key, length, default)
+
+    def withdraw(self, prefix):
+        """Removes a route and returns its value, or None if it was not present."""
+        version, key, length = prefix_key(prefix)
+        return self.tries[version].withdraw(key, length)
+
+    def longest_match(self, address):
+        """
+        Longest-prefix-match lookup.
+        :param address: IPv4 or IPv6 address
+        :return: Tuple of (prefix string, value), or None when no route matches
+        """
+        address = ipaddress.ip_address(address)
+        match = self.tries[address.version].longest_match(int(address))
+        if match is None:
+            return None
+        key, length, value = match
+        return format_prefix((address.version, key, length)), value
+
+    def covering(self, prefix):
+        """Returns [(prefix, value)] for the less-specific prefixes containing ``prefix`` (and itself)."""
+        version, key, length = prefix_key(prefix)
+        return [(format_prefix((version, k, l)), v) for k, l, v in self.tries[version].covering(key, length)]
+
+    def covered(self, prefix):
+        """Returns [(prefix, value)] for the more-specific prefixes inside ``prefix`` (and itself)."""
+        version, key, length = prefix_key(prefix)
+        return [(format_prefix((version, k, l)), v) for k, l, v in self.tries[version].covered(key, length)]
+
+    def items(self):
+        """Yields (prefix key, value) for every route, IPv4 first."""
+        for version, trie in self.tries.items():
+            for key, length, value in trie.items():
+                yield (version, key, length), value
+
+
+def prefix_key(prefix):
+    """
+    Parses a prefix into the (version, key, length) form used by the tries.
+    Accepts 'address/length', IOS style 'address mask netmask', an
+    ('address', 'netmask') pair or an already parsed key.
+    """
+    if isinstance(prefix, tuple):
+        if len(prefix) == 3:
+            return prefix
+        prefix = "/".join(prefix)
+    elif not isinstance(prefix, str):
+        prefix = str(prefix)
+    elif " mask " in prefix:
+        prefix = "/".join(prefix.split(" mask "))
+    network = ipaddress.ip_network(prefix.strip(), strict=False)
+    return (network.version, int(network.network_address), network.prefixlen)
+
+
+def format_prefix(key):
+    """Formats a parsed prefix key back to 'address/length'."""
+    version, value, length = key
+    address = ipaddress.IPv4Address(value) if version == 4 else ipaddress.IPv6Address(value)
+    return f"{address}/{length}"
+
+
+def config_networks(config_commands):
+    """
+    Yields the prefixes announced by 'network' statements in a BGP configuration.
+    :param config_commands: List of configuration lines, e.g. 'network 192.168.0.0 mask 255.255.255.0'
+    """
+    for line in config_commands:
+        words = line.split()
+        if len(words) >= 2 and words[0] == "network":
+            if len(words) >= 4 and words[2] == "mask":
+                yield prefix_key((words[1], words[3]))
+            else:
+                yield prefix_key(words[1])
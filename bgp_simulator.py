@@ -1,53 +1,607 @@
-from netmiko import ConnectHandler
+import heapq
 import logging
+import os
+import random
+import time
+from bgp_decision import RouteTable
+from bgp_rib import RIB, config_networks, format_prefix, prefix_key
+from config_push import ConfigPusher
+from mrt_reader import MRTFormatError, iter_routes
 
 # Setup logging for the output
 logging.basicConfig(level=logging.INFO)
 
-def update_bgp_configuration():
-    try:
-        # Define device connection parameters
-        device = {
-            'device_type': 'cisco_ios',  # Change this based on your device type (e.g., juniper, arista)
-            'host': '192.168.1.1',       # IP address of your device
-            'username': 'admin',         # SSH username
-            'password': 'password',      # SSH password
-            'secret': 'secret',          # Privileged mode password (if needed)
-            'port': 22,                  # SSH port (default is 22)
-            'timeout': 30,               # Timeout for connection
+# Event kinds handled by the simulator's scheduler
+EVENT_DELIVER = 0       # An UPDATE message arrives at a speaker
+EVENT_MRAI_EXPIRE = 1   # A session's MinRouteAdvertisementInterval timer fires
+EVENT_EXTERNAL = 2      # A scripted event (announce, withdraw, session up/down)
+
+# Events processed between checks whether a progress report is due
+PROGRESS_CHECK_EVERY = 1024
+
+# Local preference assigned by relationship (Gao-Rexford style policy)
+LOCAL_PREF = {"customer": 200, "peer": 100, "provider": 50, None: 100}
+
+
+class EventScheduler:
+    """Priority queue of timestamped simulation events."""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = 0
+        self.now = 0.0
+
+    def schedule(self, time, kind, payload):
+        # The sequence number keeps events at the same instant in FIFO order,
+        # which preserves per-session message ordering.
+        self._seq += 1
+        heapq.heappush(self._heap, (time, self._seq, kind, payload))
+
+    def pop(self):
+        time, _, kind, payload = heapq.heappop(self._heap)
+        self.now = time
+        return time, kind, payload
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class BGPSession:
+    """One direction of a BGP session, owned by the local speaker."""
+
+    __slots__ = ("local", "peer", "relationship", "delay", "mrai", "up", "timer_running", "pending")
+
+    def __init__(self, local, peer, relationship=None, delay=0.01, mrai=30.0):
+        self.local = local
+        self.peer = peer
+        self.relationship = relationship  # What the peer is to us: customer, peer, provider or None
+        self.delay = delay
+        self.mrai = mrai
+        self.up = True
+        self.timer_running = False
+        self.pending = {}  # prefix -> AS path waiting for the MRAI timer
+
+
+class RouteEntry:
+    """Routing state for one prefix: the paths received from peers and the selected best route."""
+
+    __slots__ = ("paths", "best", "local")
+
+    def __init__(self):
+        self.paths = {}     # Adj-RIB-In: peer ASN -> AS path
+        self.best = None    # Loc-RIB: (peer ASN or None for local routes, AS path)
+        self.local = False  # Originated by this speaker
+
+
+class BGPSpeaker:
+    """A BGP speaker (one per AS) with its routing table."""
+
+    __slots__ = ("asn", "sessions", "ranks", "rib")
+
+    def __init__(self, asn):
+        self.asn = asn
+        self.sessions = {}  # peer ASN -> BGPSession
+        self.ranks = {}     # peer ASN -> negated local-pref of routes learned from it
+        self.rib = RIB()    # prefix -> RouteEntry
+
+    def add_session(self, session):
+        self.sessions[session.peer] = session
+        self.ranks[session.peer] = -LOCAL_PREF[session.relationship]
+
+    def select_best(self, entry):
+        """Run the full decision process for a single prefix."""
+        if entry.local:
+            return (None, ())
+        if not entry.paths:
+            return None
+        ranks = self.ranks
+        paths = entry.paths
+        # Highest local-pref, then shortest AS path, then lowest neighbor ASN
+        peer = min(paths, key=lambda peer: (ranks[peer], len(paths[peer]), peer))
+        return (peer, paths[peer])
+
+    def export_info(self, route):
+        """
+        Prepares a route for export.
+        :return: Tuple of the advertised AS path and whether the route may only be
+                 exported to customers, or None when there is no route
+        """
+        if route is None:
+            return None
+        learned_from, path = route
+        # Only customer and local routes are exported to peers and providers
+        customers_only = learned_from is not None and self.sessions[learned_from].relationship in ("peer", "provider")
+        return ((self.asn,) + path, customers_only)
+
+    def export_path(self, route, session):
+        """Return the AS path advertised to ``session`` for ``route``, or None if filtered."""
+        info = self.export_info(route)
+        if info is None:
+            return None
+        path, customers_only = info
+        if customers_only and session.relationship in ("peer", "provider"):
+            return None
+        if session.peer in path:
+            # Sender-side loop detection; the peer would discard it anyway
+            return None
+        return path
+
+
+class BGPSimulator:
+    """Discrete-event BGP simulator that runs a topology to convergence."""
+
+    def __init__(self, mrai=30.0, delay=0.01, seed=None):
+        """
+        :param mrai: Default MinRouteAdvertisementInterval in seconds
+        :param delay: Default one-way session delay in seconds
+        :param seed: Seed for MRAI jitter, for reproducible runs
+        """
+        self.default_mrai = mrai
+        self.default_delay = delay
+        self.seed = seed
+        self.collector_rib = RIB()  # Routes ingested from MRT dumps, keyed by prefix then peer address
+        self.reset()
+
+    def reset(self):
+        """Clears the topology and all simulation state."""
+        self.speakers = {}
+        self.scheduler = EventScheduler()
+        self.random = random.Random(self.seed)
+        self.stats = {"events_processed": 0, "messages_sent": 0, "updates_sent": 0, "withdrawals_sent": 0}
+        self.last_change = 0.0
+
+    # Topology
+
+    def add_speaker(self, asn):
+        asn = int(asn)
+        if asn not in self.speakers:
+            self.speakers[asn] = BGPSpeaker(asn)
+        return self.speakers[asn]
+
+    def add_session(self, a, b, relationship=None, delay=None, mrai=None):
+        """
+        Connects two speakers.
+        :param relationship: None for no policy, 'p2p' for settlement-free peering
+                             or 'p2c' when ``a`` is the provider of ``b``
+        """
+        delay = self.default_delay if delay is None else delay
+        mrai = self.default_mrai if mrai is None else mrai
+        if relationship == "p2c":
+            a_view, b_view = "customer", "provider"
+        elif relationship == "p2p":
+            a_view, b_view = "peer", "peer"
+        elif relationship is None:
+            a_view, b_view = None, None
+        else:
+            raise ValueError(f"Unsupported relationship: {relationship}")
+        speaker_a, speaker_b = self.add_speaker(a), self.add_speaker(b)
+        speaker_a.add_session(BGPSession(speaker_a.asn, speaker_b.asn, a_view, delay, mrai))
+        speaker_b.add_session(BGPSession(speaker_b.asn, speaker_a.asn, b_view, delay, mrai))
+
+    def load(self, network_data):
+        """
+        Builds the topology and the event script from a network description.
+        :param network_data: Dictionary with 'speakers', 'sessions' and optional 'events'
+        """
+        if not network_data:
+            raise ValueError("network_data is required")
+        self.reset()
+        for entry in network_data.get("speakers", []):
+            if isinstance(entry, dict):
+                self.add_speaker(entry["asn"])
+                prefixes = list(entry.get("prefixes", []))
+                # Networks from a device configuration are announced too
+                prefixes.extend(config_networks(entry.get("config", [])))
+                for prefix in prefixes:
+                    self.schedule_event(0.0, {"type": "announce", "asn": entry["asn"], "prefix": prefix})
+            else:
+                self.add_speaker(entry)
+        for entry in network_data.get("sessions", []):
+            if isinstance(entry, dict):
+                a, b = entry["peers"]
+                self.add_session(a, b, entry.get("relationship"), entry.get("delay"), entry.get("mrai"))
+            else:
+                a, b = entry
+                self.add_session(a, b)
+        for event in network_data.get("events", []):
+            self.schedule_event(float(event.get("time", 0.0)), event)
+
+    def schedule_event(self, time, event):
+        """Schedules an 'announce', 'withdraw', 'session_down' or 'session_up' event."""
+        if event["type"] in ("announce", "withdraw"):
+            event = dict(event, asn=int(event["asn"]), prefix=prefix_key(event["prefix"]))
+        elif event["type"] not in ("session_down", "session_up"):
+            raise ValueError(f"Unsupported event type: {event['type']}")
+        self.scheduler.schedule(time, EVENT_EXTERNAL, event)
+
+    # Simulation
+
+    def simulate(self, network_data, max_time=None, max_events=None, include_routes=None, progress=None,
+                 progress_interval=0.5):
+        """
+        Runs a simulation of the given network until it converges.
+        :param network_data: Dictionary describing speakers, sessions and events
+        :param max_time: Stop after this much simulated time (seconds)
+        :param max_events: Stop after processing this many events
+        :param include_routes: Include every speaker's Loc-RIB in the result
+        :param progress: Called with progress_stats() about every ``progress_interval`` seconds while running
+        :return: Dictionary with convergence statistics
+        """
+        if network_data and not isinstance(network_data, dict):
+            raise TypeError(f"network_data must be an object, not {type(network_data).__name__}")
+        if network_data and "routes" in network_data:
+            if include_routes is None:
+                include_routes = network_data.get("include_routes", False)
+            return self.simulate_route_server(network_data, include_routes)
+        self.load(network_data)
+        if max_time is None:
+            max_time = network_data.get("max_time")
+        if max_events is None:
+            max_events = network_data.get("max_events")
+        if include_routes is None:
+            include_routes = network_data.get("include_routes", False)
+        converged = self.run(max_time, max_events, progress, progress_interval)
+        return self.report(converged, include_routes)
+
+    def simulate_route_server(self, network_data, include_routes=False):
+        """
+        Runs the batch decision process over a route server's full table, then
+        recomputes it after each scripted peer flap or policy change.
+        :param network_data: Dictionary with 'routes' and optional 'events' of type
+                             'session_down', 'session_up' or 'local_pref'
+        :param include_routes: Include the selected best path of every prefix
+        :return: Dictionary with best-path statistics for each recompute
+        """
+        routes = network_data["routes"]
+        table = RouteTable(max(len(routes), 1))
+        table.add_routes(routes)
+        started = time.perf_counter()
+        best = table.best_paths()
+        recomputes = [{"type": "initial", "seconds": time.perf_counter() - started}]
+
+        for event in network_data.get("events", []):
+            peer = int(event["peer"])
+            if event["type"] == "session_down":
+                table.withdraw_peer(peer)
+            elif event["type"] == "session_up":
+                table.restore_peer(peer)
+            elif event["type"] == "local_pref":
+                table.set_local_pref(peer, int(event["value"]))
+            else:
+                raise ValueError(f"Unsupported event type: {event['type']}")
+            started = time.perf_counter()
+            new_best = table.best_paths()
+            recomputes.append({
+                "type": event["type"],
+                "peer": peer,
+                "changed_prefixes": int((new_best != best).sum()),
+                "seconds": time.perf_counter() - started,
+            })
+            best = new_best
+
+        result = {
+            "converged": True,
+            "routes": len(table),
+            "prefixes": len(table.prefix_keys),
+            "reachable_prefixes": int((best >= 0).sum()),
+            "recomputes": recomputes,
         }
+        if include_routes:
+            result["best_paths"] = table.describe(best)
+        return result
+
+    def load_mrt(self, source, rib=None):
+        """
+        Streams the routes of an MRT dump (TABLE_DUMP_V2 or BGP4MP) into a RIB.
+        :param source: Path to a plain, gzip or bzip2 MRT file, raw MRT bytes or a binary file object
+        :param rib: RIB to update; defaults to the simulator's collector RIB
+        :return: Dictionary with ingestion statistics
+        """
+        rib = self.collector_rib if rib is None else rib
+        stats = {"routes": 0, "withdrawals": 0, "errors": 0}
+        try:
+            for route in iter_routes(source):
+                entry = rib.get(route.prefix)
+                if route.withdrawn:
+                    stats["withdrawals"] += 1
+                    if entry is not None and entry.paths.pop(route.peer_ip, None) is not None and not entry.paths:
+                        rib.withdraw(route.prefix)
+                    continue
+                if entry is None:
+                    entry = RouteEntry()
+                    rib.insert(route.prefix, entry)
+                entry.paths[route.peer_ip] = route.as_path
+                stats["routes"] += 1
+        except (MRTFormatError, OSError) as e:
+            logging.error(f"Error reading MRT data: {e}")
+            stats["errors"] += 1
+        stats["prefixes"] = len(rib)
+        return stats
+
+    def handle_large_data(self, data):
+        """
+        Ingests a large routing data payload into the collector RIB without loading it all at once.
+        :param data: MRT file path, raw MRT payload (bytes or str) or binary file object
+        :return: Dictionary with ingestion statistics
+        """
+        if isinstance(data, str):
+            data = data if os.path.isfile(data) else data.encode("latin-1")
+        stats = self.load_mrt(data)
+        logging.info(f"Ingested {stats['routes']} routes and {stats['withdrawals']} withdrawals")
+        return stats
+
+    def run(self, max_time=None, max_events=None, progress=None, progress_interval=0.5):
+        """
+        Processes events until the queue drains or a limit is hit. Returns True on convergence.
+        :param progress: Called with progress_stats() about every ``progress_interval`` seconds of wall time
+        """
+        scheduler = self.scheduler
+        next_report = time.monotonic() + progress_interval
+        while scheduler:
+            if max_events is not None and self.stats["events_processed"] >= max_events:
+                return False
+            if max_time is not None and scheduler._heap[0][0] > max_time:
+                return False
+            now, kind, payload = scheduler.pop()
+            self.stats["events_processed"] += 1
+            if progress is not None and not self.stats["events_processed"] % PROGRESS_CHECK_EVERY \
+                    and time.monotonic() >= next_report:
+                progress(self.progress_stats())
+                next_report = time.monotonic() + progress_interval
+            if kind == EVENT_DELIVER:
+                self._receive(now, *payload)
+            elif kind == EVENT_MRAI_EXPIRE:
+                self._mrai_expired(now, payload)
+            else:
+                self._external(now, payload)
+        return True
+
+    def progress_stats(self):
+        """Returns the counters of the running simulation and how many events are still queued."""
+        stats = {"simulated_time": self.scheduler.now, "convergence_time": self.last_change,
+                 "pending_events": len(self.scheduler)}
+        stats.update(self.stats)
+        return stats
+
+    def report(self, converged, include_routes=False):
+        result = {
+            "converged": converged,
+            "convergence_time": self.last_change,
+            "simulated_time": self.scheduler.now,
+            "speakers": len(self.speakers),
+            "sessions": sum(len(s.sessions) for s in self.speakers.values()) // 2,
+            "prefixes": len({prefix for s in self.speakers.values() for prefix, _ in s.rib.items()}),
+            "rib_sizes": {str(asn): len(s.rib) for asn, s in self.speakers.items()},
+        }
+        result.update(self.stats)
+        if include_routes:
+            result["routes"] = {
+                str(asn): {format_prefix(prefix): list(entry.best[1]) for prefix, entry in s.rib.items()}
+                for asn, s in self.speakers.items()
+            }
+        return result
+
+    def run_simulation(self, network_data=None):
+        """Runs the simulation for ``network_data`` (or the sample topology) and returns whether it converged."""
+        result = self.simulate(network_data or SAMPLE_NETWORK)
+        logging.info(f"Simulation finished: {result['events_processed']} events, converged={result['converged']}")
+        return result["converged"]
+
+    # Event handlers
+
+    def _external(self, now, event):
+        kind = event["type"]
+        if kind in ("announce", "withdraw"):
+            speaker = self.add_speaker(event["asn"])
+            entry = speaker.rib.get(event["prefix"])
+            if entry is None:
+                if kind == "withdraw":
+                    return
+                entry = RouteEntry()
+                speaker.rib.insert(event["prefix"], entry)
+            entry.local = kind == "announce"
+            self._recompute(now, speaker, [event["prefix"]])
+            return
+
+        a, b = (self.speakers[int(asn)] for asn in event["peers"])
+        if kind == "session_down":
+            for local, remote in ((a, b), (b, a)):
+                session = local.sessions[remote.asn]
+                if not session.up:
+                    continue
+                session.up = False
+                session.pending.clear()
+                affected = []
+                for prefix, entry in local.rib.items():
+                    if entry.paths.pop(remote.asn, None) is not None:
+                        affected.append(prefix)
+                self._recompute(now, local, affected)
+        else:
+            for local, remote in ((a, b), (b, a)):
+                session = local.sessions[remote.asn]
+                if session.up:
+                    continue
+                session.up = True
+                session.timer_running = False
+                # Initial full-table advertisement to the re-established peer
+                changes = []
+                for prefix, entry in local.rib.items():
+                    path = local.export_path(entry.best, session)
+                    if path is not None:
+                        changes.append((prefix, path))
+                if changes:
+                    self._send(now, session, changes)
+
+    def _receive(self, now, sender, receiver, changes):
+        speaker = self.speakers[receiver]
+        session = speaker.sessions.get(sender)
+        if session is None or not session.up:
+            return
+        tries = speaker.rib.tries
+        ranks = speaker.ranks
+        sender_rank = ranks[sender]
+        changed = []
+        for prefix, path in changes:
+            version, key, length = prefix
+            trie = tries[version]
+            node = trie.find(key, length)
+            entry = None if node is None else node.value
+            old = None if entry is None else entry.best
+            if path is None or speaker.asn in path:
+                # Withdrawal, or an announcement rejected by AS-path loop detection
+                if entry is None or entry.paths.pop(sender, None) is None:
+                    continue
+                if old[0] != sender:
+                    continue
+                new = speaker.select_best(entry)
+            else:
+                route = (sender, path)
+                if entry is None:
+                    entry = RouteEntry()
+                    trie.insert(key, length, entry)
+                entry.paths[sender] = path
+                # Only the new path needs comparing against the current best,
+                # unless it replaces the current best and may be worse than it.
+                if old is None:
+                    new = route
+                elif old[0] == sender:
+                    new = speaker.select_best(entry)
+                elif old[0] is None:
+                    continue
+                elif (sender_rank, len(path), sender) < (ranks[old[0]], len(old[1]), old[0]):
+                    new = route
+                else:
+                    continue
+            if new != old:
+                entry.best = new
+                if new is None:
+                    trie.withdraw(key, length)
+                changed.append((prefix, old, new))
+        self._apply(now, speaker, changed)
+
+    def _mrai_expired(self, now, session):
+        if not session.up:
+            session.timer_running = False
+            return
+        if session.pending:
+            changes = list(session.pending.items())
+            session.pending.clear()
+            self._send(now, session, changes)
+            self._start_timer(now, session)
+        else:
+            session.timer_running = False
+
+    # Route processing
+
+    def _recompute(self, now, speaker, prefixes):
+        """Re-runs the decision process for ``prefixes`` and propagates any best-path changes."""
+        changed = []
+        for prefix in prefixes:
+            entry = speaker.rib.get(prefix)
+            if entry is None:
+                continue
+            old = entry.best
+            new = entry.best = speaker.select_best(entry)
+            if new is None:
+                speaker.rib.withdraw(prefix)
+            if new != old:
+                changed.append((prefix, old, new))
+        self._apply(now, speaker, changed)
+
+    def _apply(self, now, speaker, changed):
+        """Advertises best-path changes to every peer."""
+        if not changed:
+            return
+        self.last_change = now
+
+        # Build each advertised path once; only the per-peer filters run per session
+        exports = [(prefix, speaker.export_info(old), speaker.export_info(new)) for prefix, old, new in changed]
+        for session in speaker.sessions.values():
+            if not session.up:
+                continue
+            peer = session.peer
+            restricted = session.relationship in ("peer", "provider")
+            pending = session.pending
+            withdrawals = []
+            announcements = []
+            for prefix, old, new in exports:
+                if new is not None and not (restricted and new[1]) and peer not in new[0]:
+                    announcements.append((prefix, new[0]))
+                elif (old is not None and not (restricted and old[1]) and peer not in old[0]) or prefix in pending:
+                    pending.pop(prefix, None)
+                    withdrawals.append((prefix, None))
+            # Withdrawals are not rate limited by MRAI
+            if session.timer_running:
+                session.pending.update(announcements)
+                if withdrawals:
+                    self._send(now, session, withdrawals)
+            elif announcements or withdrawals:
+                self._send(now, session, withdrawals + announcements)
+                if announcements:
+                    self._start_timer(now, session)
+
+    def _send(self, now, session, changes):
+        self.stats["messages_sent"] += 1
+        for _, path in changes:
+            if path is None:
+                self.stats["withdrawals_sent"] += 1
+            else:
+                self.stats["updates_sent"] += 1
+        self.scheduler.schedule(now + session.delay, EVENT_DELIVER, (session.local, session.peer, changes))
+
+    def _start_timer(self, now, session):
+        if session.mrai <= 0:
+            return
+        session.timer_running = True
+        # RFC 4271 jitter: the timer is reduced by a random 0-25%
+        interval = session.mrai * self.random.uniform(0.75, 1.0)
+        self.scheduler.schedule(now + interval, EVENT_MRAI_EXPIRE, session)
+
+
+# Define device connection parameters
+DEFAULT_DEVICE = {
+    'device_type': 'cisco_ios',  # Change this based on your device type (e.g., juniper, arista)
+    'host': '192.168.1.1',       # IP address of your device
+    'username': 'admin',         # SSH username
+    'password': 'password',      # SSH password
+    'secret': 'secret',          # Privileged mode password (if needed)
+    'port': 22,                  # SSH port (default is 22)
+    'timeout': 30,               # Timeout for connection
+}
+
+# BGP configuration pushed to the device
+BGP_CONFIG_COMMANDS = [
+    'router bgp 65000',              # Enter BGP configuration mode for ASN 65000
+    'neighbor 192.168.2.1 remote-as 65001',  # Set neighbor 192.168.2.1 with remote AS 65001
+    'network 192.168.0.0 mask 255.255.255.0', # Announce a network
+    'exit',  # Exit BGP configuration mode
+]
+
+# Topology matching the configuration pushed by update_bgp_configuration()
+SAMPLE_NETWORK = {
+    "speakers": [{"asn": 65000, "config": BGP_CONFIG_COMMANDS}, {"asn": 65001}],
+    "sessions": [{"peers": [65000, 65001]}],
+}
+
 
-        # Establish an SSH connection to the network device
-        logging.info(f"Connecting to {device['host']}...")
-        net_connect = ConnectHandler(**device)
-        net_connect.enable()  # Enter enable mode (privileged mode)
-
-        # Define the BGP configuration commands
-        config_commands = [
-            'router bgp 65000',              # Enter BGP configuration mode for ASN 65000
-            'neighbor 192.168.2.1 remote-as 65001',  # Set neighbor 192.168.2.1 with remote AS 65001
-            'network 192.168.0.0 mask 255.255.255.0', # Announce a network
-            'exit',  # Exit BGP configuration mode
-        ]
-
-        # Send the configuration commands to the device
-        logging.info("Sending BGP configuration commands...")
-        output = net_connect.send_config_set(config_commands)
-
-        # Output the results of the configuration change
-        logging.info("Configuration update successful. Output:")
-        logging.info(output)
-
-        # Save the configuration (optional)
-        logging.info("Saving the configuration...")
-        net_connect.save_config()
-
-        # Disconnect the session
-        net_connect.disconnect()
-        logging.info(f"Disconnected from {device['host']}")
-
-    except Exception as e:
-        logging.error(f"Error during BGP configuration update: {e}")
+def update_bgp_configuration(devices=None, config_commands=None, pusher=None, incremental=True, replace=False):
+    """
+    Pushes the BGP configuration to a fleet of devices in parallel.
+    :param devices: List of netmiko device parameter dictionaries (defaults to DEFAULT_DEVICE)
+    :param config_commands: Configuration commands (defaults to BGP_CONFIG_COMMANDS)
+    :param pusher: ConfigPusher whose SSH sessions are reused; a temporary one is used otherwise
+    :param incremental: Only send the lines that differ from each device's running configuration, so
+                        devices already in sync are neither configured nor saved
+    :param replace: With ``incremental``, also remove the BGP lines the commands do not declare
+    :return: Push report with per-device results
+    """
+    devices = devices or [DEFAULT_DEVICE]
+    config_commands = config_commands or BGP_CONFIG_COMMANDS
+    logging.info(f"Sending BGP configuration commands to {len(devices)} devices...")
+    if pusher is not None:
+        return pusher.push(devices, config_commands, incremental=incremental, replace=replace)
+    with ConfigPusher() as pusher:
+        return pusher.push(devices, config_commands, incremental=incremental, replace=replace)
 
 if __name__ == "__main__":
     update_bgp_configuration()
@@ -1,65 +1,299 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
 import razorpay
-import psycopg2
 import logging
-from config import RAZORPAY_API_KEY, RAZORPAY_API_SECRET, DATABASE_URI
+import requests
+from requests.adapters import HTTPAdapter
+from cache import TTLCache
+from config import RAZORPAY_API_KEY, RAZORPAY_API_SECRET, DATABASE_URI, ORDER_JOURNAL
+from db_pool import postgres_pool
+from reconciliation import PaymentReconciler
+from write_buffer import BufferFull, WriteBuffer
+
+# Bytes per gigabyte used for usage-based charges
+GIGABYTE = 10 ** 9
+
+# Razorpay receipts are limited to 40 characters
+MAX_RECEIPT_LENGTH = 40
+
+ORDER_INSERT = """
+    INSERT INTO payments (order_id, amount, currency, payer)
+    VALUES {values}
+    ON CONFLICT (order_id) DO NOTHING
+"""
+
+PAYMENT_STATUS_UPDATE = """
+    UPDATE payments
+    SET payment_status = %s
+    WHERE order_id IN ({values})
+    RETURNING order_id
+"""
+
+# Signatures checked inline below this batch size; starting and feeding worker processes costs more
+PARALLEL_VERIFY_THRESHOLD = 50000
+
+# Order IDs per UPDATE statement, well below PostgreSQL's limit on bind parameters
+UPDATE_CHUNK = 10000
+
+# Seconds the async client waits for the Razorpay API
+RAZORPAY_TIMEOUT = 30.0
+
+
+def signature_valid(secret, order_id, payment_id, signature):
+    """Checks a Razorpay checkout signature: HMAC-SHA256 of "order_id|payment_id" keyed with the API secret."""
+    expected = hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, str(signature))
+
+
+def _verify_chunk(secret, payments):
+    return [signature_valid(secret, *payment) for payment in payments]
+
+
+def order_request(amount, currency, payer, idempotency_key=None):
+    """Builds the body of a Razorpay create-order call."""
+    order_data = {
+        "amount": amount * 100,  # Razorpay requires amount in paise
+        "currency": currency,
+        "payment_capture": 1,
+        "notes": {"payer": payer}
+    }
+    if idempotency_key is not None:
+        order_data["receipt"] = idempotency_key[:MAX_RECEIPT_LENGTH]
+        order_data["notes"]["idempotency_key"] = idempotency_key
+    return order_data
+
+
+def order_fingerprint(amount, currency, payer):
+    """Identifies the details of an order, to tell a retry from a reused idempotency key."""
+    return hashlib.sha256(json.dumps([amount, currency, payer]).encode()).hexdigest()
+
+
+def razorpay_error(body):
+    """Maps a Razorpay error response to the exception the razorpay client raises for it."""
+    error = body.get("error") or {}
+    code = str(error.get("code", "")).upper()
+    message = error.get("description", "")
+    if code == "BAD_REQUEST_ERROR":
+        return razorpay.errors.BadRequestError(message)
+    if code == "GATEWAY_ERROR":
+        return razorpay.errors.GatewayError(message)
+    return razorpay.errors.ServerError(message)
+
+
+class IdempotencyConflict(ValueError):
+    """Raised when an idempotency key is reused for a different order."""
+
 
 class BillingSystem:
-    def __init__(self):
-        # Initialize Razorpay client with your API credentials
-        self.client = razorpay.Client(auth=(RAZORPAY_API_KEY, RAZORPAY_API_SECRET))
+    def __init__(self, usage_store=None, client=None, pool=None, order_journal=ORDER_JOURNAL,
+                 idempotency_ttl=86400.0, idempotency_size=100000, http_connections=32):
+        """
+        :param usage_store: timeseries.UsageStore holding network usage, for usage-based charges
+        :param client: razorpay.Client to use instead of one built from the configured credentials
+        :param pool: ConnectionPool to use instead of the shared PostgreSQL one
+        :param order_journal: Spill file for orders not yet written to the database, or None to keep them in memory
+        :param idempotency_ttl: Seconds an idempotency key returns the order it created
+        :param idempotency_size: Maximum number of idempotency keys remembered
+        :param http_connections: Keep-alive connections kept open to the Razorpay API
+        """
+        if client is None:
+            # Keep-alive connections shared by all request threads
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=http_connections)
+            session.mount("https://", adapter)
+            client = razorpay.Client(session=session, auth=(RAZORPAY_API_KEY, RAZORPAY_API_SECRET))
+        self.client = client
+        self.http_connections = http_connections
+        self._async_client = None  # httpx.AsyncClient of the ASGI app, created on first use
+
+        # Shared PostgreSQL connection pool
+        self.pool = pool if pool is not None else postgres_pool(DATABASE_URI)
+        self.usage_store = usage_store
+        self.reconciler = PaymentReconciler(self.client, self.pool)
 
-        # Initialize PostgreSQL database connection
-        self.conn = psycopg2.connect(DATABASE_URI)
-        self.cursor = self.conn.cursor()
+        # Orders are written to the database in batches off the request thread
+        self.order_buffer = WriteBuffer(self.store_orders, journal_path=order_journal, max_batch=200,
+                                        flush_interval=0.2)
+        self.orders = TTLCache(maxsize=idempotency_size, ttl=idempotency_ttl)
+        self._inflight = {}  # Idempotency key -> (fingerprint, future) of the order being created
+        self._inflight_lock = threading.Lock()
+        self._verifier = None  # Process pool for large verification batches, started on first use
 
     def process_billing(self):
-        """Process Razorpay transactions and handle subscriptions."""
+        """
+        Reconciles the Razorpay payments captured since the last run into the payments table
+        and logs the active subscriptions.
+        :return: Reconciliation summary, or None if the run failed and will be retried by the next one
+        """
         logging.info("Processing billing...")
 
         try:
-            # Example: Retrieve the list of payments to check for successful transactions
-            payments = self.client.payment.all({'status': 'captured'})  # Retrieve successful payments
-            if payments['items']:
-                for payment in payments['items']:
-                    logging.info(f"Payment ID: {payment['id']} - Amount: {payment['amount']} - Status: {payment['status']}")
-
-            # Example: Verify subscription payment (if applicable)
-            subscriptions = self.client.subscription.all({'status': 'active'})  # List active subscriptions
-            for subscription in subscriptions['items']:
+            summary = self.reconciler.run()
+
+            for subscription in self.reconciler.pages(self.client.subscription, {'status': 'active'}):
                 logging.info(f"Subscription ID: {subscription['id']} - Amount: {subscription['amount_paid']} - Status: {subscription['status']}")
 
             logging.info("Billing processed successfully.")
+            return summary
 
-        except razorpay.errors.RazorpayError as e:
+        except (razorpay.errors.BadRequestError, razorpay.errors.GatewayError, razorpay.errors.ServerError) as e:
             logging.error(f"Razorpay API error: {e}")
         except Exception as e:
             logging.error(f"Error processing billing: {e}")
 
-    def create_order(self, amount, currency, payer):
+    def usage_charge(self, network_name, start, end, rate_per_gb):
+        """
+        Computes the usage-based charge of a network for a billing period.
+        :param start: Start of the period (inclusive)
+        :param end: End of the period (exclusive)
+        :param rate_per_gb: Price per gigabyte of data usage
+        :return: Dictionary with the usage in bytes and the amount due
         """
-        Creates a Razorpay order and stores it in the database.
+        if self.usage_store is None:
+            raise ValueError("No usage store configured")
+        usage = self.usage_store.total(network_name, start, end)
+        return {"network_name": network_name, "data_usage": usage, "amount": round(usage / GIGABYTE * rate_per_gb, 2)}
+
+    def create_order(self, amount, currency, payer, idempotency_key=None):
+        """
+        Creates a Razorpay order and queues it for the database.
+        Calls repeating an idempotency key get the order created by the first one, including
+        calls made while it is still in progress.
         :param amount: Amount to be paid
         :param currency: Currency for the payment (INR/USD)
         :param payer: The payer's name (Individual/Company)
+        :param idempotency_key: Client-chosen key identifying this order across retries
         :return: Razorpay order details
         """
-        order_data = {
-            "amount": amount * 100,  # Razorpay requires amount in paise
-            "currency": currency,
-            "payment_capture": 1,
-            "notes": {"payer": payer}
-        }
-        order = self.client.order.create(order_data)
-        
-        # Insert the order details into the database
-        self.cursor.execute("""
-            INSERT INTO payments (order_id, amount, currency, payer)
-            VALUES (%s, %s, %s, %s)
-        """, (order['id'], order['amount'], currency, payer))
-        self.conn.commit()
-        
+        if idempotency_key is None:
+            return self._queue_order(self.client.order.create(order_request(amount, currency, payer)), currency, payer)
+        fingerprint = order_fingerprint(amount, currency, payer)
+        order, future = self._claim(idempotency_key, fingerprint)
+        if order is not None:
+            return order
+        if future is not None:
+            return self._replay(idempotency_key, fingerprint, *future.result())
+
+        try:
+            order_data = order_request(amount, currency, payer, idempotency_key)
+            order = self._queue_order(self.client.order.create(order_data), currency, payer)
+        except BaseException as e:
+            self._settle(idempotency_key, error=e)
+            raise
+        self._settle(idempotency_key, fingerprint, order)
+        return order
+
+    async def create_order_async(self, amount, currency, payer, idempotency_key=None):
+        """
+        Same as create_order, for the ASGI app: the Razorpay call is made with the shared async
+        client, so a request waiting for it does not hold a thread. Idempotency keys are shared
+        with create_order.
+        """
+        if idempotency_key is None:
+            return await self._create_order_async(order_request(amount, currency, payer), payer)
+        fingerprint = order_fingerprint(amount, currency, payer)
+        order, future = self._claim(idempotency_key, fingerprint)
+        if order is not None:
+            return order
+        if future is not None:
+            return self._replay(idempotency_key, fingerprint, *await asyncio.wrap_future(future))
+
+        try:
+            order = await self._create_order_async(order_request(amount, currency, payer, idempotency_key), payer)
+        except BaseException as e:
+            self._settle(idempotency_key, error=e)
+            raise
+        self._settle(idempotency_key, fingerprint, order)
+        return order
+
+    def _claim(self, idempotency_key, fingerprint):
+        """
+        Looks an idempotency key up, taking it over when nobody has used it yet.
+        :return: (order, None) for an order already created with the key, (None, future) of
+                 the call still creating it, or (None, None) if this call now has to
+        """
+        with self._inflight_lock:
+            cached = self.orders.get(idempotency_key)
+            if cached is not None:
+                return self._replay(idempotency_key, fingerprint, *cached), None
+            inflight = self._inflight.get(idempotency_key)
+            if inflight is None:
+                self._inflight[idempotency_key] = Future()
+        return None, inflight
+
+    def _settle(self, idempotency_key, fingerprint=None, order=None, error=None):
+        """Ends the creation of a claimed order, passing its outcome on to the calls waiting for it."""
+        with self._inflight_lock:
+            future = self._inflight.pop(idempotency_key)
+            if error is None:
+                self.orders.set(idempotency_key, (fingerprint, order))
+        # A failed attempt is not remembered, so the client's retry tries again
+        if error is None:
+            future.set_result((fingerprint, order))
+        else:
+            future.set_exception(error)
+
+    def _replay(self, idempotency_key, fingerprint, original, order):
+        if fingerprint != original:
+            raise IdempotencyConflict(f"Idempotency key {idempotency_key} was already used for a different order")
+        return order
+
+    def _queue_order(self, order, currency, payer):
+        row = {"order_id": order['id'], "amount": order['amount'], "currency": currency, "payer": payer}
+        try:
+            self.order_buffer.put(row)
+        except BufferFull:
+            # The order exists upstream, so store it now rather than lose it
+            self.store_orders([row])
+        return order
+
+    async def _create_order_async(self, order_data, payer):
+        response = await self.async_client().post("/v1/orders", json=order_data)
+        order = response.json()
+        if not 200 <= response.status_code < 300:
+            raise razorpay_error(order)
+        row = {"order_id": order['id'], "amount": order['amount'], "currency": order_data['currency'], "payer": payer}
+        try:
+            self.order_buffer.put(row)
+        except BufferFull:
+            await asyncio.to_thread(self.store_orders, [row])
         return order
 
+    def async_client(self):
+        """Returns the httpx.AsyncClient for the Razorpay API shared by all requests of the running event loop."""
+        if self._async_client is None:
+            import httpx
+            limits = httpx.Limits(max_connections=self.http_connections,
+                                  max_keepalive_connections=self.http_connections)
+            self._async_client = httpx.AsyncClient(base_url=self.client.base_url, auth=self.client.auth,
+                                                   timeout=RAZORPAY_TIMEOUT, limits=limits)
+        return self._async_client
+
+    def store_orders(self, rows):
+        """Inserts order rows in one statement; orders already stored are skipped, so replays are harmless."""
+        values = ", ".join(["(%s, %s, %s, %s)"] * len(rows))
+        params = [value for row in rows for value in (row["order_id"], row["amount"], row["currency"], row["payer"])]
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(ORDER_INSERT.format(values=values), params)
+            conn.commit()
+
+    def close(self):
+        """Writes the queued orders and stops the background writer."""
+        self.order_buffer.close()
+        if self._verifier is not None:
+            self._verifier.shutdown()
+
+    async def close_async(self):
+        """Closes the async client's connections."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
     def verify_payment(self, order_id, payment_id, signature):
         """
         Verifies Razorpay payment signature.
@@ -75,18 +309,69 @@ class BillingSystem:
                 "razorpay_signature": signature
             })
             
+            # Make sure the order row queued by create_order exists before updating it
+            self.order_buffer.flush(timeout=5)
+
             # Update payment status in the database
-            self.cursor.execute("""
-                UPDATE payments 
-                SET payment_status = %s
-                WHERE order_id = %s
-            """, ('Success', order_id))
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                self._mark_paid(conn, order_id)
             
             return True
         except razorpay.errors.SignatureVerificationError:
             return False
 
+    async def verify_payment_async(self, order_id, payment_id, signature):
+        """Same as verify_payment, for the ASGI app: the database work runs on the pool's threads."""
+        if not signature_valid(self.client.auth[1], order_id, payment_id, signature):
+            return False
+        await asyncio.to_thread(self.order_buffer.flush, 5)
+        await self.pool.run_async(self._mark_paid, order_id)
+        return True
+
+    def _mark_paid(self, conn, order_id):
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE payments 
+                SET payment_status = %s
+                WHERE order_id = %s
+            """, ('Success', order_id))
+        conn.commit()
+
+    def verify_payments(self, payments):
+        """
+        Verifies many payment signatures and marks the verified orders as paid in one UPDATE.
+        Batches of PARALLEL_VERIFY_THRESHOLD or more are checked across all cores.
+        :param payments: Sequence of (order_id, payment_id, signature)
+        :return: One dictionary per payment, in order, with 'verified' and 'updated' (an order row was marked)
+        """
+        payments = [tuple(payment) for payment in payments]
+        secret = self.client.auth[1]
+        if len(payments) < PARALLEL_VERIFY_THRESHOLD:
+            verified = _verify_chunk(secret, payments)
+        else:
+            workers = os.cpu_count() or 1
+            if self._verifier is None:
+                self._verifier = ProcessPoolExecutor(max_workers=workers)
+            size = -(-len(payments) // workers)
+            chunks = [payments[i:i + size] for i in range(0, len(payments), size)]
+            verified = [valid for chunk in self._verifier.map(_verify_chunk, [secret] * len(chunks), chunks)
+                        for valid in chunk]
+
+        order_ids = list(dict.fromkeys(order_id for (order_id, _, _), valid in zip(payments, verified) if valid))
+        updated = set()
+        if order_ids:
+            self.order_buffer.flush(timeout=5)
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                for i in range(0, len(order_ids), UPDATE_CHUNK):
+                    chunk = order_ids[i:i + UPDATE_CHUNK]
+                    cursor.execute(PAYMENT_STATUS_UPDATE.format(values=", ".join(["%s"] * len(chunk))),
+                                   ["Success"] + chunk)
+                    updated.update(row[0] for row in cursor.fetchall())
+                conn.commit()
+
+        return [{"order_id": order_id, "payment_id": payment_id, "verified": valid, "updated": order_id in updated}
+                for (order_id, payment_id, _), valid in zip(payments, verified)]
+
 if __name__ == "__main__":
     # Example usage of the BillingSystem class
     logging.basicConfig(level=logging.INFO)
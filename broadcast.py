@@ -0,0 +1,229 @@
+import asyncio
+import collections
+import json
+import os
+
+_CLOSED = object()
+
+
+class Subscription:
+    """Bounded queue of the events broadcast to one subscriber."""
+
+    def __init__(self, broadcaster, queue_size, select=None, on_close=None):
+        self.broadcaster = broadcaster
+        self.select = select
+        self.on_close = on_close
+        self.dropped = 0
+        self._queue = asyncio.Queue(maxsize=queue_size + 1)  # One slot is kept free for the end marker
+        self._size = queue_size
+        self._closed = False
+
+    def offer(self, event):
+        if self.select is not None:
+            event = self.select(event)
+        if event is None or self._closed:
+            return
+        if self._queue.qsize() >= self._size:
+            # A slow client is brought up to date with a snapshot instead of holding the producer back
+            self.dropped += 1
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            snapshot = self.broadcaster.snapshot()
+            if self.select is not None and snapshot is not None:
+                snapshot = self.select(snapshot)
+            event = snapshot if snapshot is not None else event
+        self._queue.put_nowait(event)
+
+    def finish(self):
+        """Ends the subscription once the queued events have been read."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put_nowait(_CLOSED)
+
+    async def get(self):
+        """Waits for the next event; returns None once the subscription has ended."""
+        event = await self._queue.get()
+        if event is _CLOSED:
+            self._queue.put_nowait(_CLOSED)  # Keep returning None
+            return None
+        return event
+
+    def close(self):
+        """Unsubscribes, e.g. when the client has gone away."""
+        self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """
+    Fans events from one producer out to any number of subscribers in the same event loop.
+
+    Every subscriber has its own bounded queue, so a slow client never delays the
+    producer or the other clients: when its queue is full, the queue is replaced by a
+    snapshot of the current state. New subscribers start with the same snapshot.
+    Producers on other threads publish with ``loop.call_soon_threadsafe(broadcaster.publish, event)``.
+    """
+
+    def __init__(self, queue_size=100, snapshot=None):
+        """
+        :param queue_size: Events queued per subscriber
+        :param snapshot: Callable returning the event that brings a new or lagging subscriber
+                         up to date, or None; defaults to the latest event published
+        """
+        self.queue_size = queue_size
+        self.latest = None
+        self.closed = False
+        self._snapshot = snapshot
+        self._subscribers = set()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def snapshot(self):
+        return self.latest if self._snapshot is None else self._snapshot()
+
+    def subscribe(self, select=None, on_close=None):
+        """
+        Adds a subscriber; call its close() when it goes away.
+        :param select: Callable mapping each event to what this subscriber receives, or to None to skip it
+        :param on_close: Called with the subscription once it is closed
+        """
+        subscription = Subscription(self, self.queue_size, select, on_close)
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            subscription.offer(snapshot)
+        if self.closed:
+            subscription.finish()
+        else:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self._subscribers:
+            self._subscribers.discard(subscription)
+            subscription.finish()
+            if subscription.on_close is not None:
+                subscription.on_close(subscription)
+
+    def publish(self, event):
+        """Queues an event for every subscriber."""
+        self.latest = event
+        for subscription in self._subscribers:
+            subscription.offer(event)
+
+    def close(self):
+        """Ends every subscription after its queued events; later subscribers only get the snapshot."""
+        self.closed = True
+        for subscription in list(self._subscribers):
+            self.unsubscribe(subscription)
+
+
+class EventLog:
+    """
+    Events appended to a JSON-lines file, so processes other than the producer's can follow them.
+
+    The producer appends every event it publishes; a process that does not have the
+    Broadcaster reads the latest event, or follows the file with subscribe().
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def append(self, event):
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(event) + "\n")  # One write per event, so readers never see half of one
+
+    def latest(self):
+        """Returns the last event appended, or None."""
+        try:
+            with open(self.path, "rb") as file:
+                end = file.seek(0, os.SEEK_END)
+                start, data = end, b""
+                # Read backwards until the last complete line is in the buffer
+                while start > 0 and data.count(b"\n") < 2:
+                    start = max(start - 65536, 0)
+                    file.seek(start)
+                    data = file.read(end - start)
+        except FileNotFoundError:
+            return None
+        lines = data.splitlines()
+        return json.loads(lines[-1]) if lines else None
+
+    def subscribe(self, last=None, poll_interval=0.5):
+        """
+        Follows the file from its latest event on, like a Subscription of the producer's Broadcaster.
+        :param last: Callable telling whether an event is the final one, after which the subscription ends
+        """
+        return FileSubscription(self.path, last, poll_interval)
+
+
+class FileSubscription:
+    """Subscription to an EventLog, read by polling the file."""
+
+    def __init__(self, path, last=None, poll_interval=0.5):
+        self.path = path
+        self.last = last
+        self.poll_interval = poll_interval
+        self._offset = None
+        self._events = collections.deque()
+        self._ended = False
+
+    def _read(self):
+        try:
+            with open(self.path, "rb") as file:
+                file.seek(self._offset or 0)
+                data = file.read()
+        except FileNotFoundError:
+            self._ended = True  # Expired
+            return
+        data = data[:data.rfind(b"\n") + 1]  # An event still being written is read next time
+        events = [json.loads(line) for line in data.splitlines()]
+        if self._offset is None:
+            events = events[-1:]  # Start from the current state, like a Broadcaster snapshot
+        self._offset = (self._offset or 0) + len(data)
+        self._events.extend(events)
+
+    async def get(self):
+        """Waits for the next event; returns None once the final event has been read or the file is gone."""
+        while not self._events:
+            if self._ended:
+                return None
+            self._read()
+            if not self._events and not self._ended:
+                await asyncio.sleep(self.poll_interval)
+        event = self._events.popleft()
+        if self.last is not None and self.last(event):
+            self._ended = True
+            self._events.clear()
+        return event
+
+    def close(self):
+        self._ended = True
+
+
+def format_sse(event):
+    """Encodes an event dictionary as a server-sent event named after its 'type'."""
+    lines = f"event: {event['type']}\n" if "type" in event else ""
+    return f"{lines}data: {json.dumps(event)}\n\n".encode()
+
+
+async def sse_stream(subscription, heartbeat=15.0):
+    """
+    Yields a subscription's events as server-sent events until it ends, with a comment
+    line every ``heartbeat`` seconds of silence so proxies keep the connection open.
+    The subscription is closed when the client disconnects.
+    """
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield format_sse(event)
+    finally:
+        subscription.close()
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live."""
+
+    def __init__(self, maxsize=1024, ttl=60.0, stale_ttl=0.0, clock=time.monotonic):
+        """
+        :param maxsize: Maximum number of entries; the least recently used entry is evicted first
+        :param ttl: Seconds an entry stays fresh
+        :param stale_ttl: Seconds past the TTL an entry can still be read with get_stale()
+        :param clock: Time source, replaceable in tests
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get_stale(key, count=False) is not None
+
+    def get(self, key, default=None):
+        """Returns the value for ``key`` if it is fresh, otherwise ``default``."""
+        entry = self.get_stale(key, count=False)
+        with self._lock:
+            if entry is None or not entry[1]:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return entry[0]
+
+    def get_stale(self, key, count=True):
+        """
+        Looks up ``key`` including entries past their TTL but still within ``stale_ttl``.
+        :return: Tuple of (value, is_fresh), or None when missing or too old
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now >= entry[1] + self.stale_ttl:
+                if entry is not None:
+                    del self._entries[key]
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry[0], now < entry[1]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """Returns (key, value) pairs for every entry that is fresh or still servable as stale."""
+        now = self.clock()
+        with self._lock:
+            return [(key, value) for key, (value, expires_at) in self._entries.items()
+                    if now < expires_at + self.stale_ttl]
+
+    def stats(self):
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
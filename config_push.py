@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from bgp_config import RUNNING_CONFIG_COMMAND, diff_commands
+
+
+def netmiko_connect(**device):
+    """Opens an SSH session with netmiko."""
+    # Imported here so the pusher can be used (and tested) without netmiko
+    from netmiko import ConnectHandler
+    return ConnectHandler(**device)
+
+
+def device_name(device):
+    return f"{device['host']}:{device.get('port', 22)}"
+
+
+class DeviceSessionPool:
+    """Keeps one SSH session per device open across pushes."""
+
+    def __init__(self, connect=netmiko_connect):
+        """
+        :param connect: Callable taking netmiko device parameters and returning a connection
+        """
+        self.connect = connect
+        self._sessions = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.connects = 0
+
+    def _device_lock(self, name):
+        with self._lock:
+            if name not in self._locks:
+                self._locks[name] = threading.Lock()
+            return self._locks[name]
+
+    def run(self, device, action):
+        """
+        Runs ``action(connection)`` on the device's session, connecting if needed.
+        Only one action runs on a session at a time.
+        """
+        name = device_name(device)
+        with self._device_lock(name):
+            connection = self._sessions.get(name)
+            if connection is not None and not connection.is_alive():
+                self.discard(name)
+                connection = None
+            if connection is None:
+                logging.info(f"Connecting to {device['host']}...")
+                connection = self.connect(**device)
+                connection.enable()  # Enter enable mode (privileged mode)
+                with self._lock:
+                    self._sessions[name] = connection
+                    self.connects += 1
+            try:
+                return action(connection)
+            except Exception:
+                # The session may be left mid-command; reconnect next time
+                self.discard(name)
+                raise
+
+    def discard(self, name):
+        """Drops and disconnects a device's session."""
+        with self._lock:
+            connection = self._sessions.pop(name, None)
+        if connection is not None:
+            try:
+                connection.disconnect()
+            except Exception as e:
+                logging.warning(f"Error disconnecting from {name}: {e}")
+
+    def close(self):
+        """Disconnects every session."""
+        with self._lock:
+            names = list(self._sessions)
+        for name in names:
+            self.discard(name)
+        logging.info(f"Disconnected {len(names)} device sessions")
+
+
+class ConfigPusher:
+    """Pushes configuration to many devices in parallel over pooled SSH sessions."""
+
+    def __init__(self, max_workers=16, timeout=120, connect=netmiko_connect):
+        """
+        :param max_workers: Maximum number of devices configured at the same time
+        :param timeout: Default seconds allowed per device, overridable with a device's 'push_timeout'
+        :param connect: Callable taking netmiko device parameters and returning a connection
+        """
+        self.timeout = timeout
+        self.sessions = DeviceSessionPool(connect)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="config-push")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.sessions.close()
+
+    def push(self, devices, config_commands, save=True, incremental=False, replace=False):
+        """
+        Sends a configuration set to every device.
+        :param devices: List of netmiko device parameter dictionaries
+        :param config_commands: List of configuration commands
+        :param save: Save the configuration after applying it
+        :param incremental: Diff the intended BGP configuration against the running one and
+                            send only the changed lines; devices already in sync are left untouched
+        :param replace: With ``incremental``, treat the commands as the complete BGP configuration
+                        and remove the lines they do not declare; otherwise they are merged
+        :return: Report dictionary with per-device results
+        """
+        started = time.monotonic()
+        starts = {}
+        futures = {}
+        for device in devices:
+            device = dict(device)
+            timeout = device.pop("push_timeout", self.timeout)
+            future = self._executor.submit(self._push_device, device, config_commands, save, incremental, replace,
+                                          starts)
+            futures[future] = (device, timeout)
+
+        results = {}
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            # Wake up for the earliest per-device deadline among running pushes
+            deadlines = [starts[device_name(device)] + timeout
+                         for future, (device, timeout) in futures.items()
+                         if future in pending and device_name(device) in starts]
+            wait_for = max(min(deadlines) - now, 0) if deadlines else 0.1
+            done, pending = wait(pending, timeout=min(wait_for, 1.0), return_when=FIRST_COMPLETED)
+            for future in done:
+                device, _ = futures[future]
+                results[device_name(device)] = future.result()
+
+            now = time.monotonic()
+            for future in list(pending):
+                device, timeout = futures[future]
+                name = device_name(device)
+                if name in starts and now - starts[name] > timeout:
+                    # Closing the session aborts the blocked worker
+                    logging.error(f"Configuration push to {name} timed out after {timeout}s")
+                    pending.discard(future)
+                    self.sessions.discard(name)
+                    results[name] = {"host": device["host"], "success": False, "changed": False, "output": "",
+                                     "error": f"Timed out after {timeout}s", "duration": now - starts[name]}
+
+        failed = [name for name, result in results.items() if not result["success"]]
+        report = {
+            "total": len(results),
+            "succeeded": len(results) - len(failed),
+            "changed": sum(1 for result in results.values() if result["changed"]),
+            "failed": failed,
+            "duration": time.monotonic() - started,
+            "devices": results,
+        }
+        logging.info(f"Configuration pushed to {report['succeeded']}/{report['total']} devices in {report['duration']:.2f}s")
+        return report
+
+    def _push_device(self, device, config_commands, save, incremental, replace, starts):
+        name = device_name(device)
+        starts[name] = time.monotonic()
+
+        def apply(connection):
+            commands = config_commands
+            if incremental:
+                commands = diff_commands(connection.send_command(RUNNING_CONFIG_COMMAND), config_commands, replace)
+                if not commands:
+                    logging.info(f"{name} is already up to date")
+                    return False, ""
+            output = connection.send_config_set(commands)
+            if save:
+                connection.save_config()
+            return True, output
+
+        try:
+            changed, output = self.sessions.run(device, apply)
+            return {"host": device["host"], "success": True, "changed": changed, "output": output, "error": None,
+                    "duration": time.monotonic() - starts[name]}
+        except Exception as e:
+            logging.error(f"Error during configuration push to {name}: {e}")
+            return {"host": device["host"], "success": False, "changed": False, "output": "", "error": str(e),
+                    "duration": time.monotonic() - starts[name]}
@@ -0,0 +1,287 @@
+import collections
+import functools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from config import DATABASE_URI
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    Connections are handed out one per thread of work and rolled back when they
+    come back, so no transaction or cursor state leaks between callers. A
+    connection that sat idle for longer than ``check_after`` is health-checked
+    before reuse, and idle connections above ``min_size`` are closed once they
+    have been unused for ``max_idle`` seconds.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, max_idle=300.0, check_after=30.0,
+                 checkout_timeout=30.0, health_query="SELECT 1", name="db", prefill=True):
+        """
+        :param connect: Callable returning a new DB-API connection
+        :param min_size: Connections kept open even when idle
+        :param max_size: Maximum number of open connections
+        :param max_idle: Seconds after which an idle connection above min_size is closed
+        :param check_after: Idle seconds after which a connection is health-checked before reuse
+        :param checkout_timeout: Seconds to wait for a free connection before raising PoolTimeout
+        :param health_query: Statement used to check that a connection is still usable
+        :param prefill: Open min_size connections straight away rather than on demand
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.checkout_timeout = checkout_timeout
+        self.health_query = health_query
+        self.name = name
+        self._idle = collections.deque()  # (connection, returned_at), most recently used on the right
+        self._size = 0
+        self._checked_out = {}  # id(connection) -> checkout time
+        self._closed = False
+        self._executor = None  # Threads of run_async, started on first use
+        self._condition = threading.Condition()
+        self._metrics = {"checkouts": 0, "timeouts": 0, "health_failures": 0, "created": 0, "reaped": 0,
+                         "wait_total": 0.0, "wait_max": 0.0, "hold_total": 0.0, "hold_max": 0.0}
+        for _ in range(min_size if prefill else 0):
+            self._idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        connection = self.connect()
+        with self._condition:
+            self._size += 1
+            self._metrics["created"] += 1
+        return connection
+
+    def _discard(self, connection):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+        try:
+            connection.close()
+        except Exception as e:
+            logging.warning(f"Error closing {self.name} connection: {e}")
+
+    def _healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(self.health_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            connection.rollback()
+            return True
+        except Exception as e:
+            logging.warning(f"Dropping unhealthy {self.name} connection: {e}")
+            with self._condition:
+                self._metrics["health_failures"] += 1
+            return False
+
+    def getconn(self, timeout=None):
+        """
+        Checks out a connection; return it with putconn().
+        :param timeout: Seconds to wait for a free connection, defaults to checkout_timeout
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise PoolTimeout(f"{self.name} pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        raise PoolTimeout(f"No {self.name} connection free after {timeout}s")
+                    self._condition.wait(remaining)
+                entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    self._size += 1  # Reserve the slot while connecting outside the lock
+
+            if entry is None:
+                try:
+                    connection = self.connect()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._metrics["created"] += 1
+            else:
+                connection, returned_at = entry
+                if time.monotonic() - returned_at > self.check_after and not self._healthy(connection):
+                    self._discard(connection)
+                    continue
+            break
+
+        now = time.monotonic()
+        waited = now - started
+        with self._condition:
+            self._checked_out[id(connection)] = now
+            self._metrics["checkouts"] += 1
+            self._metrics["wait_total"] += waited
+            self._metrics["wait_max"] = max(self._metrics["wait_max"], waited)
+        return connection
+
+    def putconn(self, connection, broken=False):
+        """
+        Returns a connection to the pool, rolling back any open transaction.
+        :param broken: Close the connection instead of reusing it
+        """
+        with self._condition:
+            checked_out = self._checked_out.pop(id(connection), None)
+            if checked_out is not None:
+                held = time.monotonic() - checked_out
+                self._metrics["hold_total"] += held
+                self._metrics["hold_max"] = max(self._metrics["hold_max"], held)
+        if not broken:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+        if broken or self._closed:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.monotonic()))
+            self._condition.notify()
+        self.reap_idle()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that checks out a connection and returns it afterwards.
+        Work that was not committed inside the block is rolled back.
+        """
+        connection = self.getconn(timeout)
+        try:
+            yield connection
+        finally:
+            self.putconn(connection)
+
+    async def run_async(self, func, *args, timeout=None):
+        """
+        Runs ``func(connection, *args)`` with a pooled connection for a coroutine, on one of
+        ``max_size`` threads. However many requests are waiting, no more threads block on the
+        database than there are connections; the rest wait as suspended coroutines.
+        Work that was not committed by ``func`` is rolled back.
+        :return: What ``func`` returned
+        """
+        import asyncio  # Only the ASGI app needs it; the WSGI workers boot without it
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix=f"{self.name}-pool")
+            executor = self._executor
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(self._run, func, args, timeout))
+
+    def _run(self, func, args, timeout):
+        with self.connection(timeout) as connection:
+            return func(connection, *args)
+
+    def reap_idle(self):
+        """Closes connections idle for longer than max_idle, keeping min_size open."""
+        now = time.monotonic()
+        reaped = []
+        with self._condition:
+            # The least recently used connections are on the left
+            while (self._idle and self._size - len(reaped) > self.min_size
+                   and now - self._idle[0][1] > self.max_idle):
+                reaped.append(self._idle.popleft()[0])
+            self._metrics["reaped"] += len(reaped)
+        for connection in reaped:
+            self._discard(connection)
+        return len(reaped)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def stats(self):
+        """Returns pool size and checkout metrics."""
+        with self._condition:
+            stats = dict(self._metrics)
+            stats.update(size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle))
+        checkouts = stats["checkouts"] or 1
+        stats["wait_avg"] = stats["wait_total"] / checkouts
+        stats["hold_avg"] = stats["hold_total"] / checkouts
+        return stats
+
+    def close(self):
+        """Closes idle connections; checked-out ones are closed when they are returned."""
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            executor, self._executor = self._executor, None
+            self._condition.notify_all()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for connection in idle:
+            self._discard(connection)
+
+
+# Pools are per process: connections must not be shared across a gunicorn fork
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, **options):
+    """
+    Returns the process-wide pool for ``key``, creating it on first use.
+    :param key: Hashable identifying the database
+    :param connect: Callable returning a new connection
+    :param options: ConnectionPool options used when the pool is created
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        pool = _pools.get((pid, key))
+        if pool is None or pool.closed:
+            for stale in [k for k in _pools if k[0] != pid]:
+                # Inherited from the parent process; drop without closing the parent's sockets
+                del _pools[stale]
+            options.setdefault("name", str(key[0]))
+            # Shared pools connect on first checkout, so building a subsystem never waits for the database
+            options.setdefault("prefill", False)
+            pool = _pools[(pid, key)] = ConnectionPool(connect, **options)
+        return pool
+
+
+def postgres_pool(dsn=DATABASE_URI, **options):
+    """Returns the shared PostgreSQL pool for ``dsn``."""
+    def connect():
+        import psycopg2
+        return psycopg2.connect(dsn)
+    return get_pool(("postgresql", dsn), connect, **options)
+
+
+def mysql_pool(host="localhost", user="root", password="password", database="vajra_network", **options):
+    """Returns the shared MySQL pool for the given server and database."""
+    def connect():
+        import mysql.connector
+        return mysql.connector.connect(host=host, user=user, password=password, database=database)
+    return get_pool(("mysql", host, user, database), connect, **options)
+
+
+def close_pools():
+    """Closes every pool created by this process."""
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (owner, _), pool in _pools.items() if owner == pid]
+        _pools.clear()
+    for pool in pools:
+        pool.close()
@@ -1,35 +1,356 @@
+import asyncio
+import collections
 import requests
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from broadcast import Broadcaster
+from cache import TTLCache
+from config import IXP_API_URL
+from ixp_scheduler import IXPScheduler
 
 class IXPManager:
-    def __init__(self):
-        self.ixp_status = {}  # Cache for IXP status
+    def __init__(self, base_url=IXP_API_URL, max_workers=16, timeout=2.0, deadline=5.0,
+                 cache_ttl=30.0, stale_ttl=300.0, cache_size=1024, max_connections=256):
+        """
+        :param base_url: Base URL of the IXP status API
+        :param max_workers: Maximum number of IXPs polled at the same time
+        :param timeout: Per-request connect/read timeout in seconds
+        :param deadline: Seconds after which a monitoring round returns whatever has arrived
+        :param cache_ttl: Seconds a fetched status is served without asking the API again
+        :param stale_ttl: Seconds past the TTL a status is still served while it is refreshed in the background
+        :param cache_size: Maximum number of IXPs kept in the status cache
+        :param max_connections: Connections the async client opens to the API at the same time
+        """
+        self.status_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl, stale_ttl=stale_ttl)
+        self.network_access = {}  # Network -> access state, used while no IXP capacity is registered
+        self.scheduler = IXPScheduler()
+        self._inflight = {}  # IXP -> future of the fetch in progress
+        self._inflight_lock = threading.Lock()
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.deadline = deadline
 
-    def access_ixp(self, network_id):
-        """Access an IXP for the given network."""
+        # Keep-alive connections shared by all polling threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ixp-monitor")
+
+        # Used by the *_async methods of the ASGI app; created on first use inside its event loop
+        self.max_connections = max_connections
+        self._async_client = None
+        self._async_inflight = {}  # IXP -> task of the fetch in progress
+
+    def register_ixp(self, ixp, ports, load=0.0, utilisation=0.0):
+        """Registers an IXP's port capacity so access requests are scheduled against it."""
+        return self.scheduler.register_ixp(ixp, ports, load, utilisation)
+
+    def update_ixp_load(self, ixp, load=None, utilisation=None):
+        """Records an IXP's live load and port utilisation; returns the grants this frees up."""
+        return self.scheduler.update(ixp, load=load, utilisation=utilisation)
+
+    def access_ixp(self, network_id, weight=1.0, ixp=None):
+        """
+        Access an IXP for the given network.
+        Once IXP capacity is registered, requests wait for a free port and are granted by
+        weighted fair queueing; the assigned IXP is in ``scheduler.grants``.
+        :param weight: Relative share of ports this network is entitled to
+        :param ixp: Specific IXP to wait for, or None for the least loaded one
+        :return: True if access was granted now, False if the request is queued
+        """
         logging.info(f"Attempting to access IXP for network: {network_id}")
-        if network_id in self.ixp_status and self.ixp_status[network_id] == "accessed":
-            raise Exception(f"Network {network_id} has already accessed the IXP.")
+        if not len(self.scheduler):
+            if self.network_access.get(network_id) == "accessed":
+                raise Exception(f"Network {network_id} has already accessed the IXP.")
+            self.network_access[network_id] = "accessed"
+            logging.info(f"Successfully accessed IXP for network: {network_id}")
+            return True
+
+        self.scheduler.request(network_id, weight, ixp)
+        granted = network_id in self.scheduler.grants
+        if granted:
+            logging.info(f"Successfully accessed IXP {self.scheduler.grants[network_id]} for network: {network_id}")
+        else:
+            logging.info(f"Network {network_id} queued for IXP access")
+        return granted
+
+    def release_ixp(self, network_id):
+        """Frees a network's IXP port; returns the (network_id, ixp) grants made with it."""
+        if network_id in self.network_access:
+            del self.network_access[network_id]
+            return []
+        return self.scheduler.release(network_id)
+
+    @property
+    def ixp_status(self):
+        """Cached status of every IXP that is fresh or still servable as stale."""
+        return dict(self.status_cache.items())
+
+    def fetch_status(self, ixp):
+        """Fetches the current status of a single IXP."""
+        response = self.session.get(f"{self.base_url}/{ixp}/status", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get("status", "unknown")
 
-        self.ixp_status[network_id] = "accessed"
-        logging.info(f"Successfully accessed IXP for network: {network_id}")
-        return True
+    def refresh_status(self, ixp):
+        """
+        Fetches an IXP's status in the background and stores it in the cache.
+        Concurrent refreshes of the same IXP share a single request.
+        :return: Future resolving to the status
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(ixp)
+            if future is None:
+                future = self._executor.submit(self._refresh, ixp)
+                self._inflight[ixp] = future
+            return future
 
-    def monitor_ixps(self, ixp_list):
-        """Monitor IXP statuses in real-time."""
+    def _refresh(self, ixp):
+        try:
+            status = self.fetch_status(ixp)
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error fetching IXP status for {ixp}: {e}")
+            raise
+        else:
+            self.status_cache.set(ixp, status)
+            self.scheduler.update(ixp, available=status == "up")
+            logging.info(f"IXP {ixp} status updated: {status}")
+            return status
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(ixp, None)
+
+    def iter_ixp_status(self, ixp_list, deadline=None):
+        """
+        Polls IXPs concurrently and yields (ixp, status) as each response arrives.
+        :param ixp_list: IXPs to poll
+        :param deadline: Seconds to wait overall; IXPs that have not answered by then are skipped
+        """
+        deadline = self.deadline if deadline is None else deadline
+        # Fetches still running at the deadline are left to finish and warm the cache
+        futures = {self.refresh_status(ixp): ixp for ixp in dict.fromkeys(ixp_list)}
+        try:
+            for future in as_completed(futures, timeout=deadline):
+                ixp = futures[future]
+                try:
+                    status = future.result()
+                except (requests.RequestException, ValueError):
+                    continue  # Logged by _refresh
+                yield ixp, status
+        except TimeoutError:
+            missing = [ixp for future, ixp in futures.items() if not future.done()]
+            logging.warning(f"IXP monitoring deadline of {deadline}s passed; no status from {missing}")
+
+    def get_status(self, ixp_list, deadline=None):
+        """
+        Returns IXP statuses from the cache, fetching only what is missing.
+        Stale statuses are returned immediately and refreshed in the background.
+        :param ixp_list: IXPs to look up
+        :param deadline: Seconds to wait for IXPs that are not cached at all
+        :return: Dictionary of IXP statuses
+        """
+        statuses = {}
+        missing = []
+        for ixp in dict.fromkeys(ixp_list):
+            cached = self.status_cache.get_stale(ixp)
+            if cached is None:
+                missing.append(ixp)
+                continue
+            statuses[ixp], fresh = cached
+            if not fresh:
+                self.refresh_status(ixp)
+        if missing:
+            statuses.update(self.iter_ixp_status(missing, deadline))
+        return statuses
+
+    def monitor_ixps(self, ixp_list, deadline=None):
+        """
+        Monitor IXP statuses in real-time.
+        :return: Dictionary of the statuses received before the deadline
+        """
         logging.info("Starting IXP monitoring...")
-        for ixp in ixp_list:
-            try:
-                response = requests.get(f"http://ixp_api/{ixp}/status")
-                if response.status_code == 200:
-                    self.ixp_status[ixp] = response.json().get("status", "unknown")
-                    logging.info(f"IXP {ixp} status updated: {self.ixp_status[ixp]}")
-            except requests.RequestException as e:
-                logging.error(f"Error fetching IXP status for {ixp}: {e}")
+        return dict(self.iter_ixp_status(ixp_list, deadline))
 
     def prioritize_access(self, ixp_list):
-        """Prioritize networks based on IXP load and availability."""
-        sorted_ixps = sorted(ixp_list, key=lambda ixp: self.ixp_status.get(ixp, "unknown"))
+        """Prioritize IXPs by availability, load and free ports; unregistered IXPs come last."""
+        sorted_ixps = sorted(ixp_list, key=self.scheduler.priority)
         logging.info(f"Prioritized IXP access: {sorted_ixps}")
         return sorted_ixps
+
+    def async_client(self):
+        """Returns the httpx.AsyncClient shared by all requests of the running event loop."""
+        if self._async_client is None:
+            import httpx
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=self.max_connections)
+            self._async_client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits)
+        return self._async_client
+
+    async def fetch_status_async(self, ixp):
+        """Fetches the current status of a single IXP without blocking the event loop."""
+        response = await self.async_client().get(f"/{ixp}/status")
+        response.raise_for_status()
+        return response.json().get("status", "unknown")
+
+    def refresh_status_async(self, ixp):
+        """
+        Fetches an IXP's status in a task of the running event loop and stores it in the cache.
+        Concurrent refreshes of the same IXP share a single request.
+        :return: Task resolving to the status, or to None if the fetch failed
+        """
+        task = self._async_inflight.get(ixp)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh_async(ixp))
+            self._async_inflight[ixp] = task
+        return task
+
+    async def _refresh_async(self, ixp):
+        import httpx
+        try:
+            status = await self.fetch_status_async(ixp)
+        except (httpx.HTTPError, ValueError) as e:
+            # Not raised: background refreshes have nobody awaiting them
+            logging.error(f"Error fetching IXP status for {ixp}: {e}")
+            return None
+        else:
+            self.status_cache.set(ixp, status)
+            self.scheduler.update(ixp, available=status == "up")
+            logging.info(f"IXP {ixp} status updated: {status}")
+            return status
+        finally:
+            self._async_inflight.pop(ixp, None)
+
+    async def get_status_async(self, ixp_list, deadline=None):
+        """
+        Same as get_status, for the ASGI app: waiting for uncached IXPs suspends the
+        request instead of holding a thread.
+        :return: Dictionary of IXP statuses
+        """
+        statuses = {}
+        missing = []
+        for ixp in dict.fromkeys(ixp_list):
+            cached = self.status_cache.get_stale(ixp)
+            if cached is None:
+                missing.append(ixp)
+                continue
+            statuses[ixp], fresh = cached
+            if not fresh:
+                self.refresh_status_async(ixp)
+        if missing:
+            deadline = self.deadline if deadline is None else deadline
+            tasks = {self.refresh_status_async(ixp): ixp for ixp in missing}
+            # Fetches still running at the deadline are left to finish and warm the cache
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+            for task in done:
+                if task.result() is not None:
+                    statuses[tasks[task]] = task.result()
+            if pending:
+                logging.warning(f"IXP monitoring deadline of {deadline}s passed; "
+                                f"no status from {[tasks[task] for task in pending]}")
+        return statuses
+
+    async def close_async(self):
+        """Closes the async client's connections."""
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class IXPStatusFeed:
+    """
+    Pushes IXP status changes to any number of subscribers, e.g. dashboards on an SSE stream.
+
+    A single task polls the IXPs watched by any subscriber once per ``interval``, so the
+    IXP APIs see one request per IXP and interval however many dashboards are open, and
+    /ixp_status requests are answered from the cache it keeps warm. A subscriber first gets
+    a snapshot of its IXPs, then only the IXPs whose status changed. Polling stops when
+    the last subscriber leaves.
+    """
+
+    def __init__(self, manager, interval=None, queue_size=100):
+        """
+        :param manager: IXPManager whose status cache and async client are used
+        :param interval: Seconds between polls, defaults to the status cache TTL
+        :param queue_size: Events queued per subscriber before it is sent a fresh snapshot instead
+        """
+        self.manager = manager
+        self.interval = manager.status_cache.ttl if interval is None else interval
+        self.statuses = {}  # Last published status of every watched IXP
+        self.broadcaster = Broadcaster(queue_size, snapshot=self._snapshot)
+        self._watched = collections.Counter()  # IXP -> subscribers watching it
+        self._added = set()  # Newly watched IXPs, polled without waiting for the next round
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def _snapshot(self):
+        return {"type": "snapshot", "statuses": dict(self.statuses), "time": time.time()}
+
+    def subscribe(self, ixp_list):
+        """
+        Subscribes to the statuses of ``ixp_list`` from a coroutine of the serving event loop.
+        :return: broadcast.Subscription; close it when the client goes away
+        """
+        wanted = frozenset(ixp_list)
+
+        def select(event):
+            statuses = {ixp: status for ixp, status in event["statuses"].items() if ixp in wanted}
+            if not statuses and event["type"] != "snapshot":
+                return None
+            return dict(event, statuses=statuses)
+
+        subscription = self.broadcaster.subscribe(select, on_close=lambda _: self._unwatch(wanted))
+        new = wanted - self._watched.keys()
+        self._watched.update(wanted)
+        if new:
+            self._added.update(new)
+            self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll())
+        return subscription
+
+    def _unwatch(self, ixps):
+        for ixp in ixps:
+            self._watched[ixp] -= 1
+            if self._watched[ixp] <= 0:
+                del self._watched[ixp]
+                self.statuses.pop(ixp, None)
+        if not self._watched:
+            self._wake.set()  # Lets the poller exit
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        next_round = loop.time()
+        while self._watched:
+            if loop.time() >= next_round:
+                ixps = list(self._watched)
+                next_round = loop.time() + self.interval
+            else:
+                ixps = [ixp for ixp in self._added if ixp in self._watched]
+            self._added.clear()
+            self._wake.clear()
+            await self.poll(ixps)
+            try:
+                await asyncio.wait_for(self._wake.wait(), max(0.0, next_round - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self, ixps):
+        """Fetches the given IXPs once and publishes the statuses that changed."""
+        if not ixps:
+            return
+        tasks = {self.manager.refresh_status_async(ixp): ixp for ixp in ixps}
+        # IXPs that miss the deadline keep their last status; their fetch still lands in the cache
+        done, _ = await asyncio.wait(tasks, timeout=self.manager.deadline)
+        changes = {}
+        for task in done:
+            ixp, status = tasks[task], task.result()
+            if status is not None and ixp in self._watched and self.statuses.get(ixp) != status:
+                changes[ixp] = status
+        if changes:
+            self.statuses.update(changes)
+            self.broadcaster.publish({"type": "delta", "statuses": changes, "time": time.time()})
@@ -0,0 +1,216 @@
+import heapq
+import itertools
+import logging
+import threading
+
+
+class IndexedHeap:
+    """Binary min-heap that can change or remove any item's key in O(log n)."""
+
+    def __init__(self):
+        self._heap = []       # [key, item]
+        self._position = {}   # item -> index in _heap
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, item):
+        return item in self._position
+
+    def key(self, item):
+        return self._heap[self._position[item]][0]
+
+    def push(self, item, key):
+        """Adds ``item`` or changes its key."""
+        if item in self._position:
+            index = self._position[item]
+            old = self._heap[index][0]
+            self._heap[index][0] = key
+            if key < old:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+            return
+        self._heap.append([key, item])
+        self._position[item] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def peek(self):
+        """Returns (item, key) with the smallest key."""
+        key, item = self._heap[0]
+        return item, key
+
+    def pop(self):
+        item, key = self.peek()
+        self.remove(item)
+        return item, key
+
+    def remove(self, item):
+        index = self._position.pop(item)
+        last = self._heap.pop()
+        if index < len(self._heap):
+            self._heap[index] = last
+            self._position[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self._position[last[1]])
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self._position[heap[i][1]] = i
+        self._position[heap[j][1]] = j
+
+    def _sift_up(self, index):
+        while index > 0:
+            parent = (index - 1) // 2
+            if self._heap[index][0] < self._heap[parent][0]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+
+    def _sift_down(self, index):
+        size = len(self._heap)
+        while True:
+            smallest = index
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < size and self._heap[child][0] < self._heap[smallest][0]:
+                    smallest = child
+            if smallest == index:
+                return
+            self._swap(index, smallest)
+            index = smallest
+
+
+class IXPScheduler:
+    """
+    Grants IXP ports to member networks.
+
+    IXPs are kept in an indexed heap ordered by availability, then by the higher of
+    live load and port utilisation, then by the share of ports already granted, so
+    the least loaded IXP with a free port is found in O(1) and a status change is
+    applied in O(log n). Waiting networks are served by weighted fair queueing: each
+    request gets a virtual finish time of max(virtual clock, the network's last
+    finish) + 1 / weight, and requests are granted in finish-time order.
+    """
+
+    def __init__(self):
+        self._ixps = {}           # IXP -> {'ports', 'in_use', 'load', 'utilisation', 'available'}
+        self._ranking = IndexedHeap()
+        self._queue = []          # (finish, seq, network_id, ixp)
+        self._queued = set()
+        self._finish = {}         # network_id -> last virtual finish time
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self.grants = {}          # network_id -> IXP
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ixps)
+
+    def register_ixp(self, ixp, ports, load=0.0, utilisation=0.0, available=True):
+        """
+        Adds an IXP or replaces its capacity.
+        :param ports: Number of member ports that can be granted
+        :param load: Live traffic load as a fraction of capacity
+        :param utilisation: Port utilisation as a fraction of capacity
+        """
+        with self._lock:
+            state = self._ixps.setdefault(ixp, {"in_use": 0})
+            state.update(ports=ports, load=load, utilisation=utilisation, available=available)
+            self._reprioritise(ixp)
+            return self._dispatch()
+
+    def update(self, ixp, load=None, utilisation=None, available=None):
+        """
+        Applies a status change to an IXP.
+        :return: List of (network_id, ixp) grants made possible by the change
+        """
+        with self._lock:
+            state = self._ixps.get(ixp)
+            if state is None:
+                return []
+            if load is not None:
+                state["load"] = load
+            if utilisation is not None:
+                state["utilisation"] = utilisation
+            if available is not None:
+                state["available"] = available
+            self._reprioritise(ixp)
+            return self._dispatch()
+
+    def priority(self, ixp):
+        """Sort key of an IXP; lower is better, unknown IXPs sort last."""
+        with self._lock:
+            if ixp not in self._ranking:
+                return (2, 0.0, 0.0)
+            return self._ranking.key(ixp)
+
+    def request(self, network_id, weight=1.0, ixp=None):
+        """
+        Queues an access request.
+        :param weight: Share of the ports this network is entitled to relative to others
+        :param ixp: IXP to wait for, or None for the least loaded one
+        :return: List of (network_id, ixp) grants made by this call
+        """
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        with self._lock:
+            if network_id in self.grants or network_id in self._queued:
+                raise Exception(f"Network {network_id} has already accessed the IXP.")
+            if ixp is not None and ixp not in self._ixps:
+                raise KeyError(f"Unknown IXP {ixp}")
+            finish = max(self._virtual_time, self._finish.get(network_id, 0.0)) + 1.0 / weight
+            self._finish[network_id] = finish
+            heapq.heappush(self._queue, (finish, next(self._seq), network_id, ixp))
+            self._queued.add(network_id)
+            return self._dispatch()
+
+    def release(self, network_id):
+        """
+        Frees the port held by a network, or withdraws its request if it is still waiting.
+        :return: List of (network_id, ixp) grants made with the freed port
+        """
+        with self._lock:
+            if network_id in self._queued:
+                # Gave up before being admitted, e.g. on a timeout
+                self._queue = [entry for entry in self._queue if entry[2] != network_id]
+                heapq.heapify(self._queue)
+                self._queued.discard(network_id)
+                return []
+            ixp = self.grants.pop(network_id, None)
+            if ixp is None:
+                return []
+            self._ixps[ixp]["in_use"] -= 1
+            self._reprioritise(ixp)
+            return self._dispatch()
+
+    def pending(self):
+        return len(self._queued)
+
+    def _reprioritise(self, ixp):
+        state = self._ixps[ixp]
+        free = state["available"] and state["in_use"] < state["ports"]
+        key = (0 if free else 1, max(state["load"], state["utilisation"]),
+               state["in_use"] / state["ports"] if state["ports"] else 1.0)
+        self._ranking.push(ixp, key)
+
+    def _dispatch(self):
+        grants = []
+        skipped = []
+        while self._queue and self._ranking and self._ranking.peek()[1][0] == 0:
+            finish, seq, network_id, wanted = heapq.heappop(self._queue)
+            ixp = wanted if wanted is not None else self._ranking.peek()[0]
+            if self._ranking.key(ixp)[0] != 0:
+                skipped.append((finish, seq, network_id, wanted))  # Waiting for a specific full IXP
+                continue
+            self._virtual_time = max(self._virtual_time, finish)
+            self._queued.discard(network_id)
+            self._ixps[ixp]["in_use"] += 1
+            self._reprioritise(ixp)
+            self.grants[network_id] = ixp
+            grants.append((network_id, ixp))
+            logging.info(f"Granted {ixp} to network {network_id}")
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        return grants
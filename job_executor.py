@@ -0,0 +1,215 @@
+import fcntl
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+_DAILY_TIME = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$")
+
+
+class Job:
+    """A task run every ``interval`` seconds or daily at a local ``at`` time ('HH:MM')."""
+
+    def __init__(self, name, func, interval=None, at=None, max_instances=1, jitter=0.0, catch_up=True):
+        """
+        :param name: Unique name; it keys the job's lock file and last-run record
+        :param func: Callable run without arguments
+        :param interval: Seconds between runs
+        :param at: Local time of a daily run, e.g. '00:00'
+        :param max_instances: Runs of this job allowed at the same time in this process
+        :param jitter: Up to this many seconds are added at random to each run time
+        :param catch_up: Run once at start-up if a run was missed while no process was running
+        """
+        if (interval is None) == (at is None):
+            raise ValueError("A job needs exactly one of interval or at")
+        if interval is not None and interval <= 0:
+            raise ValueError("interval must be positive")
+        if at is not None and not _DAILY_TIME.match(at):
+            raise ValueError(f"Invalid daily time {at}, expected HH:MM")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.at = at
+        self.max_instances = max_instances
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.scheduled = None  # Next run time before jitter
+        self.next_run = None
+        self.running = 0
+
+    def following(self, moment):
+        """Returns the first scheduled time after ``moment`` (a Unix time), before jitter."""
+        if self.interval is not None:
+            return moment + self.interval
+        hour, minute = map(int, self.at.split(":"))
+        current = datetime.fromtimestamp(moment)
+        candidate = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if candidate <= current:
+            candidate += timedelta(days=1)
+        return candidate.timestamp()
+
+
+class LastRunStore:
+    """JSON file of {job name: scheduled Unix time of its last run}, shared by every process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logging.warning(f"Ignoring unreadable job state in {self.path}")
+            return {}
+
+    def get(self, name):
+        return self.load().get(name)
+
+    def record(self, name, moment):
+        # Read-modify-write under an exclusive lock, since other processes record other jobs
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.load()
+            state[name] = moment
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                json.dump(state, file)
+            os.replace(temporary, self.path)
+
+
+class JobExecutor:
+    """
+    Runs jobs on a worker pool instead of the thread that schedules them, so a
+    slow job never delays the others.
+
+    Every process of a deployment (e.g. each gunicorn worker) may start an
+    executor over the same state directory. A run takes a non-blocking file
+    lock named after the job and re-checks the shared last-run store, so each
+    scheduled run happens in exactly one process while the others skip it. When
+    a job's last recorded run is more than one period old at start-up, e.g.
+    after a restart over midnight, it runs once straight away.
+    """
+
+    def __init__(self, state_directory, max_workers=4, clock=time.time):
+        """
+        :param state_directory: Directory for lock files and the last-run store; shared by all processes
+        :param max_workers: Jobs run at the same time in this process
+        :param clock: Returns the current Unix time
+        """
+        self.state_directory = state_directory
+        os.makedirs(state_directory, exist_ok=True)
+        self.store = LastRunStore(os.path.join(state_directory, "last_run.json"))
+        self.clock = clock
+        self.jobs = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def add(self, job):
+        """Registers a job and schedules its first run."""
+        with self._condition:
+            if job.name in self.jobs:
+                raise ValueError(f"Job {job.name} is already registered")
+            now = self.clock()
+            last_run = self.store.get(job.name)
+            if last_run is None or not job.catch_up:
+                job.scheduled = job.following(now)
+            else:
+                # A missed run is made up once, however many periods were missed
+                job.scheduled = max(now, job.following(last_run))
+            job.next_run = self._jittered(job, job.scheduled)
+            self.jobs[job.name] = job
+            self._condition.notify_all()
+        return job
+
+    def _jittered(self, job, moment):
+        return moment + random.uniform(0, job.jitter) if job.jitter else moment
+
+    def start(self):
+        """Starts the scheduling thread."""
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="job-executor", daemon=True)
+                self._thread.start()
+
+    def stop(self, wait=True):
+        """Stops scheduling; with ``wait``, also waits for running jobs to finish."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
+
+    def run_pending(self):
+        """
+        Submits every job that is due.
+        :return: Seconds until the next job is due, or None if there are no jobs
+        """
+        with self._condition:
+            now = self.clock()
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+                due = job.next_run
+                job.scheduled = job.following(job.scheduled)
+                if job.scheduled <= now:
+                    job.scheduled = job.following(now)  # Runs missed while busy are not queued up
+                job.next_run = self._jittered(job, job.scheduled)
+                if job.running >= job.max_instances:
+                    logging.warning(f"Skipping run of {job.name}: {job.running} still running")
+                    continue
+                job.running += 1
+                self._pool.submit(self._run, job, due)
+            if not self.jobs:
+                return None
+            return max(0.0, min(job.next_run for job in self.jobs.values()) - now)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+            wait = self.run_pending()
+            with self._condition:
+                if not self._stopped:
+                    # Short waits keep the schedule right across clock changes and suspends
+                    self._condition.wait(1.0 if wait is None else min(wait, 60.0))
+
+    def _run(self, job, due):
+        try:
+            with open(os.path.join(self.state_directory, f"{job.name}.lock"), "a") as lock:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logging.info(f"Job {job.name} is running in another process")
+                    return
+                last_run = self.store.get(job.name)
+                if last_run is not None and job.following(last_run) > due + job.jitter:
+                    logging.info(f"Job {job.name} already ran at {datetime.fromtimestamp(last_run)}")
+                    return
+                started = self.clock()
+                logging.info(f"Running job {job.name}")
+                try:
+                    job.func()
+                except Exception as e:
+                    logging.error(f"Job {job.name} failed: {e}")
+                else:
+                    logging.info(f"Job {job.name} finished in {self.clock() - started:.1f}s")
+                # The run's slot rather than its start is recorded, so a late start cannot hide the next
+                # slot; it is written while still holding the lock, and a run cut short by a crash is
+                # caught up on restart
+                self.store.record(job.name, due)
+        finally:
+            with self._condition:
+                job.running -= 1
@@ -0,0 +1,23 @@
+import functools
+import threading
+
+
+def lazy(factory):
+    """
+    Decorates a zero-argument factory so that it runs on the first call only and every
+    call returns that first result. Concurrent first calls wait for a single run.
+    ``created()`` tells whether it has run.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    get.created = lambda: bool(instance)
+    return get
@@ -0,0 +1,265 @@
+import itertools
+import json
+import logging
+import os
+import tarfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+# Bundle suffix per compression; 'zst' needs the optional zstandard package
+COMPRESSIONS = {"gz": ".tar.gz", "xz": ".tar.xz", "zst": ".tar.zst"}
+
+MANIFEST = "manifest.jsonl"
+
+
+def iter_old_files(directory, threshold):
+    """
+    Yields (name, size, mtime) of the regular files in ``directory`` last modified before
+    ``threshold`` (a Unix time), streaming the listing with os.scandir. Each entry is
+    stat()ed once and symbolic links are skipped.
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue  # Removed while listing
+            if stat.st_mtime < threshold:
+                yield entry.name, stat.st_size, stat.st_mtime
+
+
+def _open_bundle(path, compression):
+    if compression == "zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zst compression requires the zstandard package")
+        stream = open(path, "wb")
+        writer = zstandard.ZstdCompressor().stream_writer(stream)
+        return tarfile.open(fileobj=writer, mode="w|"), writer
+    if compression == "gz":
+        return tarfile.open(path, "w:gz", compresslevel=6), None  # Level 9 is far slower for little gain on logs
+    return tarfile.open(path, f"w:{compression}"), None
+
+
+def archive_bundle(directory, bundle_path, names, compression="gz"):
+    """
+    Writes the named files of ``directory`` into one compressed tar bundle, then deletes them.
+    The bundle is written to a temporary name, fsynced and renamed before anything is deleted.
+    Files that have gone or cannot be read are skipped and left where they are.
+    Runs in a worker process.
+    :return: List of (name, size, mtime) of the files archived
+    """
+    temporary = bundle_path + ".tmp"
+    archived = []
+    archive, writer = _open_bundle(temporary, compression)
+    try:
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+                archive.add(path, arcname=name, recursive=False)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logging.warning(f"Skipping unreadable log {path}: {e}")
+                continue
+            archived.append((name, stat.st_size, stat.st_mtime))
+    finally:
+        archive.close()
+        if writer is not None:
+            writer.close()
+    with open(temporary, "rb") as file:
+        os.fsync(file.fileno())
+    os.replace(temporary, bundle_path)
+    for name, _, _ in archived:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"Could not delete archived log {name}: {e}")
+    return archived
+
+
+class CleanupOperations:
+    """
+    Archives old logs into compressed, size-capped tar bundles.
+
+    The log directory is streamed with os.scandir and old files are grouped into
+    bundles of at most ``max_bundle_bytes`` of logs. Bundles are compressed in a
+    process pool with a bounded number in flight, so memory does not grow with the
+    directory. Every archived file is appended to manifest.jsonl in the archive
+    directory with the bundle that holds it, so locate() and extract() read a
+    single bundle. A bundle that fails keeps its logs for the next run without
+    stopping the others. When ``max_archive_bytes`` is set, the oldest bundles are
+    deleted once the archive grows past it.
+    """
+
+    def __init__(self, log_directory="/var/log/myapp/", archive_directory="/var/log/archive/", max_age_days=30,
+                 max_bundle_bytes=256 * 1024 * 1024, compression="gz", workers=None, max_archive_bytes=None):
+        """
+        :param log_directory: Directory holding the logs
+        :param archive_directory: Directory receiving the bundles and the manifest
+        :param max_age_days: Logs not modified for this many days are archived
+        :param max_bundle_bytes: Uncompressed log bytes per bundle; a larger file gets a bundle of its own
+        :param compression: 'gz', 'xz' or 'zst'
+        :param workers: Bundles compressed at the same time, defaults to the number of CPUs
+        :param max_archive_bytes: Size the bundles may take up in total, or None for no limit
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unsupported compression {compression}. Use one of {', '.join(COMPRESSIONS)}.")
+        self.log_directory = log_directory
+        self.archive_directory = archive_directory
+        self.max_age_days = max_age_days
+        self.max_bundle_bytes = max_bundle_bytes
+        self.compression = compression
+        self.workers = workers or os.cpu_count() or 1
+        self.max_archive_bytes = max_archive_bytes
+        self.manifest_path = os.path.join(archive_directory, MANIFEST)
+
+    def perform_cleanup(self):
+        """
+        Archive old logs and clean up temporary files.
+        :return: Dictionary with the files, bytes and bundles archived, or None if the cleanup failed
+        """
+        logging.info("Performing cleanup operations...")
+        try:
+            os.makedirs(self.archive_directory, exist_ok=True)
+            self._remove_partial_bundles()
+            threshold = (datetime.now() - timedelta(days=self.max_age_days)).timestamp()
+            summary = self.archive(iter_old_files(self.log_directory, threshold))
+            if self.max_archive_bytes is not None:
+                summary["bundles_pruned"] = self.prune(self.max_archive_bytes)
+            logging.info(f"Cleanup operations completed successfully: archived {summary['files']} files "
+                         f"({summary['bytes']} bytes) into {summary['bundles']} bundles.")
+            return summary
+        except Exception as e:
+            logging.error(f"Error during cleanup operations: {e}")
+
+    def archive(self, files):
+        """
+        Archives files of the log directory, bundling them in the order given.
+        :param files: Iterable of (name, size, mtime)
+        :return: Dictionary with the files, bytes and bundles archived and the bundles that failed
+        """
+        summary = {"files": 0, "bytes": 0, "bundles": 0, "bundles_failed": 0}
+        prefix = "logs-" + time.strftime("%Y%m%dT%H%M%S")
+        futures = {}
+        numbers = itertools.count()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor, \
+                open(self.manifest_path, "a", encoding="utf-8") as manifest:
+
+            def collect(done):
+                for future in done:
+                    bundle = futures.pop(future)
+                    try:
+                        archived = future.result()
+                    except Exception as e:
+                        # Its logs were not deleted; the other bundles are still recorded
+                        logging.error(f"Error writing archive bundle {bundle}: {e}")
+                        summary["bundles_failed"] += 1
+                        continue
+                    for name, size, mtime in archived:
+                        manifest.write(json.dumps({"file": name, "bundle": bundle, "size": size, "mtime": mtime}) + "\n")
+                    manifest.flush()
+                    summary["files"] += len(archived)
+                    summary["bytes"] += sum(size for _, size, _ in archived)
+                    summary["bundles"] += 1
+
+            def submit(names):
+                bundle = f"{prefix}-{next(numbers):05d}{COMPRESSIONS[self.compression]}"
+                future = executor.submit(archive_bundle, self.log_directory,
+                                         os.path.join(self.archive_directory, bundle), names, self.compression)
+                futures[future] = bundle
+                # Bounded in-flight bundles keep memory flat however large the directory is
+                while len(futures) >= 2 * self.workers:
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+
+            try:
+                names, size = [], 0
+                for name, file_size, _ in files:
+                    if names and size + file_size > self.max_bundle_bytes:
+                        submit(names)
+                        names, size = [], 0
+                    names.append(name)
+                    size += file_size
+                if names:
+                    submit(names)
+            finally:
+                # Bundles already written have deleted their logs, so they are recorded even if listing failed
+                while futures:
+                    collect(wait(futures, return_when=FIRST_COMPLETED).done)
+        return summary
+
+    def _bundles(self):
+        suffixes = tuple(COMPRESSIONS.values())
+        with os.scandir(self.archive_directory) as entries:
+            return sorted((entry.name, entry.stat().st_size) for entry in entries
+                          if entry.is_file() and entry.name.endswith(suffixes))
+
+    def _remove_partial_bundles(self):
+        # Left behind by a run that was killed; their logs were not deleted
+        with os.scandir(self.archive_directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".tmp"):
+                    os.remove(entry.path)
+
+    def prune(self, max_archive_bytes):
+        """
+        Deletes the oldest bundles until the rest fit in ``max_archive_bytes``.
+        :return: Number of bundles deleted
+        """
+        bundles = self._bundles()  # Names sort by creation time
+        total = sum(size for _, size in bundles)
+        pruned = 0
+        for name, size in bundles:
+            if total <= max_archive_bytes:
+                break
+            os.remove(os.path.join(self.archive_directory, name))
+            logging.warning(f"Deleted archive bundle {name} to stay within {max_archive_bytes} bytes")
+            total -= size
+            pruned += 1
+        return pruned
+
+    def locate(self, name):
+        """
+        Looks a log file up in the manifest.
+        :return: Manifest entries for ``name`` whose bundle still exists, oldest first
+        """
+        entries = []
+        try:
+            with open(self.manifest_path, encoding="utf-8") as manifest:
+                for line in manifest:
+                    if name in line:  # Cheap filter before parsing
+                        entry = json.loads(line)
+                        if entry["file"] == name:
+                            entries.append(entry)
+        except FileNotFoundError:
+            return []
+        return [entry for entry in entries if os.path.exists(os.path.join(self.archive_directory, entry["bundle"]))]
+
+    def extract(self, name, destination):
+        """
+        Restores the most recently archived copy of a log file into ``destination``.
+        :return: Path of the restored file
+        """
+        entries = self.locate(name)
+        if not entries:
+            raise FileNotFoundError(f"{name} is not in the archive")
+        bundle = os.path.join(self.archive_directory, entries[-1]["bundle"])
+        if bundle.endswith(COMPRESSIONS["zst"]):
+            import zstandard
+            with open(bundle, "rb") as file, zstandard.ZstdDecompressor().stream_reader(file) as reader, \
+                    tarfile.open(fileobj=reader, mode="r|") as archive:
+                for member in archive:
+                    if member.name == name:
+                        archive.extract(member, destination, filter="data")
+                        break
+        else:
+            with tarfile.open(bundle) as archive:
+                archive.extract(name, destination, filter="data")
+        return os.path.join(destination, name)
@@ -1,35 +1,70 @@
+import atexit
+import json
 from flask import Flask, render_template, request, jsonify, redirect, url_for
-from billing_system import BillingSystem
-from bgp_simulator import BGPSimulator
-from network_database import NetworkDatabase
-from optimizer import NetworkOptimizer
-from scheduler import add_network_data_task, cleanup_task
-import schedule
-import time
-import threading
+from write_buffer import BufferFull, WriteBuffer
+from config import NETWORK_DATA_JOURNAL
+from db_pool import close_pools
+from job_executor import Job
+from lazy import lazy
+from scheduler import build_executor
 
 app = Flask(__name__)
 
-# Initialize necessary systems
-billing_system = BillingSystem()
-bgp_simulator = BGPSimulator()
-network_db = NetworkDatabase()
-network_optimizer = NetworkOptimizer()
+# Razorpay checkout page per currency
+CHECKOUT_URLS = {"INR": "https://rzp.io/rzp/JusDG4P", "USD": "https://rzp.io/rzp/BblrH9g9"}
 
-# Initialize scheduler tasks in a separate thread
-def run_scheduler():
-    while True:
-        schedule.run_pending()
-        time.sleep(1)  # Sleep to prevent busy-waiting
+# Subsystems are imported and built on first use, and their pools connect on first checkout,
+# so a worker boots without razorpay, numpy, scipy or the database drivers and a route only
+# loads what it uses. startup_benchmark.py measures the import.
+@lazy
+def get_billing_system():
+    from billing_system import BillingSystem
+    billing_system = BillingSystem()
+    atexit.register(billing_system.close)
+    return billing_system
 
-# Schedule tasks for network data addition and cleanup operations
-schedule.every(15).minutes.do(add_network_data_task)
-schedule.every().day.at("00:00").do(cleanup_task)
+def new_bgp_simulator():
+    # A simulator holds the state of one run, so concurrent requests each get their own
+    from bgp_simulator import BGPSimulator
+    return BGPSimulator()
 
-# Start the scheduler in a separate thread to run asynchronously with the Flask app
-scheduler_thread = threading.Thread(target=run_scheduler)
-scheduler_thread.daemon = True  # Daemonize the thread to stop it when the main app exits
-scheduler_thread.start()
+@lazy
+def get_network_db():
+    from network_database import NetworkDatabase
+    return NetworkDatabase()
+
+@lazy
+def get_network_optimizer():
+    from optimizer import NetworkOptimizer
+    return NetworkOptimizer()
+
+# Registered first so the shared database pools close after everything that still writes to them
+atexit.register(close_pools)
+
+# Inserts are acknowledged once journaled and written to the database in batches
+@lazy
+def get_network_data_buffer():
+    buffer = WriteBuffer(lambda rows: get_network_db().add_many(rows), journal_path=NETWORK_DATA_JOURNAL)
+    atexit.register(buffer.close)
+    return buffer
+
+# Scheduled jobs run on a worker pool; with several worker processes, file locks and the
+# shared last-run store make sure each run happens in only one of them
+@lazy
+def get_job_executor():
+    executor = build_executor()
+    # Nightly reconciliation of the payments captured since the previous run
+    executor.add(Job("process_billing", lambda: get_billing_system().process_billing(), at="01:00", jitter=300))
+    executor.start()
+    atexit.register(executor.stop)
+    return executor
+
+@app.before_request
+def start_background_work():
+    # Started by the serving process rather than on import, so importing main writes no files
+    # and starts no threads; records journaled before a restart are written from the first request
+    get_network_data_buffer()
+    get_job_executor()
 
 @app.route("/")
 def index():
@@ -42,18 +77,19 @@ def create_order():
     amount = data["amount"]
     currency = data["currency"]
     payer = data["payer"]
+    # Retries carrying the same key get the order created by the first attempt
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
     
+    from billing_system import IdempotencyConflict
     try:
-        order = billing_system.create_order(amount, currency, payer)
+        order = get_billing_system().create_order(amount, currency, payer, idempotency_key=idempotency_key)
         # Redirect to Razorpay checkout based on the selected currency
-        if currency == "INR":
-            payment_url = "https://rzp.io/rzp/JusDG4P"
-        elif currency == "USD":
-            payment_url = "https://rzp.io/rzp/BblrH9g9"
-        else:
+        if currency not in CHECKOUT_URLS:
             return jsonify({"error": "Invalid currency selected"}), 400
         
-        return jsonify({"order": order, "payment_url": payment_url})
+        return jsonify({"order": order, "payment_url": CHECKOUT_URLS[currency]})
+    except IdempotencyConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -64,31 +100,78 @@ def verify_payment():
     payment_id = data["payment_id"]
     signature = data["signature"]
     
-    verified = billing_system.verify_payment(order_id, payment_id, signature)
+    verified = get_billing_system().verify_payment(order_id, payment_id, signature)
     if verified:
         return jsonify({"status": "success"})
     return jsonify({"status": "failure"}), 400
 
+@app.route("/verify_payments", methods=["POST"])
+def verify_payments():
+    # Webhook replays and settlement backfills: verified in one pass and applied with one UPDATE
+    data = request.json
+    try:
+        payments = [(item["order_id"], item["payment_id"], item["signature"]) for item in data["payments"]]
+    except (KeyError, TypeError) as e:
+        return jsonify({"error": f"payments must be a list of order_id, payment_id and signature objects: {e}"}), 400
+    results = get_billing_system().verify_payments(payments)
+    return jsonify({"results": results, "verified": sum(result["verified"] for result in results)})
+
 @app.route("/simulate_bgp", methods=["POST"])
 def simulate_bgp():
     data = request.json
     network_data = data.get("network_data")
-    result = bgp_simulator.simulate(network_data)
+    try:
+        result = new_bgp_simulator().simulate(network_data)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
     return jsonify({"result": result})
 
 @app.route("/optimize_network", methods=["POST"])
 def optimize_network():
     data = request.json
     network_config = data.get("network_config")
-    optimized_network = network_optimizer.optimize(network_config)
+    try:
+        optimized_network = get_network_optimizer().optimize(network_config)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"Invalid network_config: {e}"}), 400
     return jsonify({"optimized_network": optimized_network})
 
 @app.route("/add_network_data", methods=["POST"])
 def add_network_data():
     data = request.json
     network_info = data.get("network_info")
-    network_db.add_data(network_info)
-    return jsonify({"status": "Network data added successfully"})
+    if not isinstance(network_info, dict):
+        return jsonify({"error": "network_info must be an object"}), 400
+    try:
+        get_network_db().row(network_info)  # Reject incomplete records before they are queued
+    except KeyError as e:
+        return jsonify({"error": f"network_info is missing {e}"}), 400
+    try:
+        get_network_data_buffer().put(network_info)
+    except BufferFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
+    return jsonify({"status": "Network data accepted"}), 202
+
+def iter_ndjson(stream):
+    """Parses newline-delimited JSON records one line at a time."""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON on line {number}: {e}")
+
+@app.route("/add_network_data/bulk", methods=["POST"])
+def add_network_data_bulk():
+    # The body is streamed into the database in batches instead of being loaded whole
+    batch_size = request.args.get("batch_size", default=1000, type=int)
+    try:
+        added = get_network_db().add_many(iter_ndjson(request.stream), batch_size=batch_size)
+    except (ValueError, KeyError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "Network data added successfully", "added": added})
 
 if __name__ == "__main__":
     app.run(debug=True)
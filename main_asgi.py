@@ -0,0 +1,170 @@
+# Production entry point for an ASGI server, e.g.
+#   gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:5000 main_asgi:app
+# Routes waiting on Razorpay, the database or a simulation are served by the async app
+# below and suspend while they wait; every other route is served by main.app as before.
+import asyncio
+import os
+import re
+import time
+import uuid
+from quart import Quart, request, jsonify, url_for
+import main
+from asgi_support import RouteDispatcher, sse_response
+from broadcast import Broadcaster, EventLog
+from cache import TTLCache
+from config import SIMULATION_RUNS_DIRECTORY
+
+api = Quart(__name__, static_folder=None)
+
+# Simulations started through /simulate_bgp/runs are kept for an hour so clients connecting
+# late still get the result. The worker running a simulation streams its progress to its own
+# clients; every event is also appended to a file per run, from which the other workers on the
+# host answer. Behind a load balancer spanning several hosts, route /simulate_bgp/runs by host
+# or point SIMULATION_RUNS_DIRECTORY at shared storage.
+SIMULATION_RUN_TTL = 3600
+simulation_runs = TTLCache(maxsize=1000, ttl=SIMULATION_RUN_TTL)  # Runs started by this worker
+
+@api.before_serving
+async def start_background_work():
+    # Replays the journals of earlier runs, so it is kept off the event loop
+    await asyncio.to_thread(main.start_background_work)
+
+@api.after_serving
+async def close_clients():
+    if main.get_billing_system.created():
+        await main.get_billing_system().close_async()
+
+@api.route("/create_order", methods=["POST"])
+async def create_order():
+    data = await request.get_json()
+    amount = data["amount"]
+    currency = data["currency"]
+    payer = data["payer"]
+    # Retries carrying the same key get the order created by the first attempt
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+
+    from billing_system import IdempotencyConflict
+    try:
+        order = await main.get_billing_system().create_order_async(amount, currency, payer,
+                                                                   idempotency_key=idempotency_key)
+        if currency not in main.CHECKOUT_URLS:
+            return jsonify({"error": "Invalid currency selected"}), 400
+        return jsonify({"order": order, "payment_url": main.CHECKOUT_URLS[currency]})
+    except IdempotencyConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
+@api.route("/verify_payment", methods=["POST"])
+async def verify_payment():
+    data = await request.get_json()
+    verified = await main.get_billing_system().verify_payment_async(data["order_id"], data["payment_id"],
+                                                                    data["signature"])
+    if verified:
+        return jsonify({"status": "success"})
+    return jsonify({"status": "failure"}), 400
+
+@api.route("/verify_payments", methods=["POST"])
+async def verify_payments():
+    data = await request.get_json()
+    try:
+        payments = [(item["order_id"], item["payment_id"], item["signature"]) for item in data["payments"]]
+    except (KeyError, TypeError) as e:
+        return jsonify({"error": f"payments must be a list of order_id, payment_id and signature objects: {e}"}), 400
+    results = await asyncio.to_thread(main.get_billing_system().verify_payments, payments)
+    return jsonify({"results": results, "verified": sum(result["verified"] for result in results)})
+
+@api.route("/simulate_bgp", methods=["POST"])
+async def simulate_bgp():
+    data = await request.get_json()
+    network_data = data.get("network_data")
+    try:
+        result = await asyncio.to_thread(main.new_bgp_simulator().simulate, network_data)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"result": result})
+
+def run_log(run_id):
+    """Returns the EventLog of a simulation run, or None for an id that cannot be one."""
+    if not re.fullmatch(r"[0-9a-f]{32}", run_id):
+        return None
+    return EventLog(os.path.join(SIMULATION_RUNS_DIRECTORY, f"{run_id}.jsonl"))
+
+def finished(event):
+    return event["type"] in ("result", "error")
+
+def remove_expired_runs():
+    expiry = time.time() - SIMULATION_RUN_TTL
+    with os.scandir(SIMULATION_RUNS_DIRECTORY) as entries:
+        for entry in entries:
+            try:
+                if entry.name.endswith(".jsonl") and entry.stat().st_mtime < expiry:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Removed by another worker
+
+async def run_simulation(network_data, progress, log):
+    """Runs a simulation on a worker thread, publishing its progress and then its result."""
+    loop = asyncio.get_running_loop()
+
+    def publish(event):
+        log.append(event)
+        progress.publish(event)
+
+    def report(stats):
+        loop.call_soon_threadsafe(publish, dict(stats, type="progress"))
+
+    try:
+        result = await asyncio.to_thread(main.new_bgp_simulator().simulate, network_data, progress=report)
+    except (ValueError, KeyError, TypeError) as e:
+        publish({"type": "error", "error": str(e)})
+    else:
+        publish({"type": "result", "result": result})
+    finally:
+        progress.close()
+
+@api.route("/simulate_bgp/runs", methods=["POST"])
+async def start_simulation():
+    # Starts a simulation in the background; any number of clients can follow it on the events stream
+    data = await request.get_json()
+    network_data = data.get("network_data")
+    if not network_data:
+        return jsonify({"error": "network_data is required"}), 400
+    os.makedirs(SIMULATION_RUNS_DIRECTORY, exist_ok=True)
+    remove_expired_runs()
+    run_id = uuid.uuid4().hex
+    log = run_log(run_id)
+    progress = Broadcaster(queue_size=16)
+    started = {"type": "progress", "events_processed": 0}
+    log.append(started)
+    progress.publish(started)
+    simulation_runs.set(run_id, (progress, asyncio.ensure_future(run_simulation(network_data, progress, log))))
+    return jsonify({"run_id": run_id, "events": url_for("simulation_events", run_id=run_id)}), 202
+
+@api.route("/simulate_bgp/runs/<run_id>", methods=["GET"])
+async def simulation_status(run_id):
+    run = simulation_runs.get(run_id)
+    if run is not None:
+        return jsonify(run[0].latest)
+    log = run_log(run_id)
+    event = log and await asyncio.to_thread(log.latest)  # Started by another worker
+    if event is None:
+        return jsonify({"error": "Unknown simulation run"}), 404
+    return jsonify(event)
+
+@api.route("/simulate_bgp/runs/<run_id>/events", methods=["GET"])
+async def simulation_events(run_id):
+    # Server-sent progress events, then a 'result' or 'error' event, after which the stream ends
+    run = simulation_runs.get(run_id)
+    if run is not None:
+        return sse_response(run[0].subscribe())
+    log = run_log(run_id)
+    if log is None or not log.exists():
+        return jsonify({"error": "Unknown simulation run"}), 404
+    return sse_response(log.subscribe(last=finished))
+
+app = RouteDispatcher(api, main.app)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5000)
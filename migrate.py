@@ -0,0 +1,257 @@
+import argparse
+import collections
+import hashlib
+import logging
+import os
+import re
+
+# The network database runs on MySQL and the billing database (payments, reconciliation) on
+# PostgreSQL; each has its own numbered migrations
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "SQL", "migrations")
+POSTGRESQL_MIGRATIONS_DIRECTORY = os.path.join(MIGRATIONS_DIRECTORY, "postgresql")
+MIGRATION_DIRECTORIES = {"mysql": MIGRATIONS_DIRECTORY, "postgresql": POSTGRESQL_MIGRATIONS_DIRECTORY}
+
+# Per dialect: parameter placeholder and the statement that opens a transaction, if the driver
+# does not open one itself. MySQL commits implicitly around DDL, so only the DML in a MySQL
+# migration is covered by its transaction; PostgreSQL and SQLite roll DDL back as well.
+DIALECTS = {
+    "mysql": ("%s", None),
+    "postgresql": ("%s", None),
+    "sqlite": ("?", "BEGIN"),
+}
+
+SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(32) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_MIGRATION_FILE = re.compile(r"(\d+)_(\w+)\.sql$")
+_DOLLAR_QUOTE = re.compile(r"\$[A-Za-z_]*\$")
+
+Migration = collections.namedtuple("Migration", ["version", "name", "path"])
+
+
+class MigrationError(Exception):
+    """Raised when a migration cannot be read or applied."""
+
+
+def iter_statements(lines):
+    """
+    Splits SQL text into statements one line at a time, without loading the whole file.
+    Semicolons inside quotes, backticks, PostgreSQL dollar quotes and comments are ignored.
+    :param lines: Iterable of lines, such as an open file
+    :return: Generator of statements without the trailing semicolon
+    """
+    current = []
+    quote = None  # Open quote character or dollar-quote tag
+    block_comment = False
+    for line in lines:
+        i, n = 0, len(line)
+        while i < n:
+            c = line[i]
+            if block_comment:
+                if line.startswith("*/", i):
+                    block_comment = False
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if quote is not None:
+                if len(quote) > 1:
+                    if line.startswith(quote, i):
+                        current.append(quote)
+                        i += len(quote)
+                        quote = None
+                        continue
+                elif c == "\\" and quote != "`":
+                    current.append(line[i:i + 2])
+                    i += 2
+                    continue
+                elif c == quote:
+                    quote = None  # A doubled quote simply reopens on the next character
+                current.append(c)
+                i += 1
+                continue
+            if line.startswith("--", i):
+                current.append("\n")
+                break
+            if line.startswith("/*", i):
+                block_comment = True
+                i += 2
+                continue
+            if c == "$":
+                match = _DOLLAR_QUOTE.match(line, i)
+                if match:
+                    quote = match.group()
+                    current.append(quote)
+                    i = match.end()
+                    continue
+            elif c in "'\"`":
+                quote = c
+            elif c == ";":
+                statement = "".join(current).strip()
+                if statement:
+                    yield statement
+                current = []
+                i += 1
+                continue
+            current.append(c)
+            i += 1
+    if quote is not None or block_comment:
+        raise MigrationError("Unterminated quote or comment at end of file")
+    statement = "".join(current).strip()
+    if statement:
+        yield statement
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MigrationRunner:
+    """Applies numbered SQL files (e.g. 0002_add_indexes.sql) once each, in order."""
+
+    def __init__(self, connection, directory=None, dialect="mysql"):
+        """
+        :param connection: DB-API connection
+        :param directory: Directory holding the migration files, defaults to the dialect's own
+        :param dialect: 'mysql', 'postgresql' or 'sqlite'
+        """
+        if dialect not in DIALECTS:
+            raise ValueError(f"Unsupported dialect {dialect}. Use one of {', '.join(DIALECTS)}.")
+        if directory is None:
+            directory = MIGRATION_DIRECTORIES.get(dialect)
+            if directory is None:
+                raise ValueError(f"No migrations for {dialect}; pass a directory")
+        self.connection = connection
+        self.directory = directory
+        self.placeholder, self.begin = DIALECTS[dialect]
+
+    def discover(self):
+        """Returns the migrations found in the directory, ordered by version."""
+        migrations = {}
+        for entry in os.scandir(self.directory):
+            match = _MIGRATION_FILE.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            version = match.group(1)
+            if int(version) in migrations:
+                raise MigrationError(f"Duplicate migration version {version}")
+            migrations[int(version)] = Migration(version, match.group(2), entry.path)
+        return [migrations[version] for version in sorted(migrations)]
+
+    def applied(self):
+        """Returns {version: checksum} of the migrations already applied."""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(SCHEMA_MIGRATIONS)
+            self.connection.commit()
+            cursor.execute("SELECT version, checksum FROM schema_migrations")
+            return {version: checksum for version, checksum in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def pending(self):
+        """Returns the migrations not applied yet, warning about applied ones that were edited since."""
+        applied = self.applied()
+        pending = []
+        for migration in self.discover():
+            checksum = applied.get(migration.version)
+            if checksum is None:
+                pending.append(migration)
+            elif checksum != file_checksum(migration.path):
+                logging.warning(f"Migration {migration.version}_{migration.name} was modified after it was applied")
+        return pending
+
+    def run(self):
+        """
+        Applies every pending migration.
+        :return: Versions applied
+        """
+        applied = []
+        for migration in self.pending():
+            self.apply(migration)
+            applied.append(migration.version)
+        if applied:
+            logging.info(f"Applied migrations {', '.join(applied)}")
+        else:
+            logging.info("Database schema is up to date")
+        return applied
+
+    def apply(self, migration):
+        """Runs one migration and records it, all in a single transaction."""
+        logging.info(f"Applying migration {migration.version}_{migration.name}...")
+        checksum = file_checksum(migration.path)
+        cursor = self.connection.cursor()
+        try:
+            if self.begin:
+                cursor.execute(self.begin)
+            with open(migration.path, encoding="utf-8") as file:
+                for statement in iter_statements(file):
+                    cursor.execute(statement)
+                    if cursor.description:
+                        cursor.fetchall()  # Unread results would block the next statement
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES ({0}, {0}, {0})".format(self.placeholder),
+                (migration.version, migration.name, checksum),
+            )
+            self.connection.commit()
+        except Exception as e:
+            self.connection.rollback()
+            raise MigrationError(f"Migration {migration.version}_{migration.name} failed: {e}") from e
+        finally:
+            cursor.close()
+
+
+def execute_sql_file(filename, connection):
+    """Runs a plain SQL script, such as sample data, one statement at a time."""
+    cursor = connection.cursor()
+    try:
+        with open(filename, encoding="utf-8") as file:
+            for statement in iter_statements(file):
+                cursor.execute(statement)
+                if cursor.description:
+                    cursor.fetchall()
+        connection.commit()
+        logging.info(f"Successfully executed {filename}")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main():
+    from db_pool import mysql_pool, postgres_pool
+
+    parser = argparse.ArgumentParser(description="Apply pending database migrations.")
+    parser.add_argument("--dialect", choices=["mysql", "postgresql"], default="mysql")
+    parser.add_argument("--directory", help="Migrations to apply, defaults to those of the dialect")
+    parser.add_argument("--status", action="store_true", help="List pending migrations without applying them")
+    parser.add_argument("scripts", nargs="*", help="SQL scripts to run after migrating, e.g. SQL/insert_data.sql")
+    args = parser.parse_args()
+
+    pool = mysql_pool(min_size=0) if args.dialect == "mysql" else postgres_pool(min_size=0)
+    with pool.connection() as connection:
+        runner = MigrationRunner(connection, args.directory, args.dialect)
+        if args.status:
+            for migration in runner.pending():
+                print(f"pending {migration.version}_{migration.name}")
+            return
+        runner.run()
+        for script in args.scripts:
+            execute_sql_file(script, connection)
+    pool.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
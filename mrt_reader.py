@@ -0,0 +1,319 @@
+import bz2
+import collections
+import gzip
+import ipaddress
+import mmap
+import os
+import struct
+import zlib
+
+# MRT record types and subtypes (RFC 6396)
+TABLE_DUMP_V2 = 13
+BGP4MP = 16
+BGP4MP_ET = 17
+
+PEER_INDEX_TABLE = 1
+RIB_IPV4_UNICAST = 2
+RIB_IPV6_UNICAST = 4
+
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+
+# BGP path attribute type codes
+ATTR_ORIGIN = 1
+ATTR_AS_PATH = 2
+ATTR_NEXT_HOP = 3
+ATTR_MED = 4
+ATTR_LOCAL_PREF = 5
+ATTR_MP_REACH_NLRI = 14
+ATTR_MP_UNREACH_NLRI = 15
+ATTR_AS4_PATH = 17
+
+BGP_UPDATE = 2
+AS_SET = 1
+
+_HEADER = struct.Struct("!IHHI")
+
+MRTRoute = collections.namedtuple(
+    "MRTRoute",
+    ["timestamp", "prefix", "peer_as", "peer_ip", "as_path", "origin", "med", "local_pref", "next_hop", "withdrawn"],
+)
+MRTRoute.__doc__ = """A route announcement or withdrawal. ``prefix`` is a (version, key, length) prefix key."""
+
+
+class MRTFormatError(Exception):
+    """Raised when a record cannot be decoded."""
+
+
+def open_mrt(source):
+    """
+    Opens an MRT dump for streaming.
+    Uncompressed files are memory-mapped; gzip and bzip2 files are decompressed on the fly.
+    :param source: File path, bytes-like object or binary file object
+    :return: A memoryview or a readable binary file object
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source)
+    if not isinstance(source, (str, os.PathLike)):
+        return source
+    with open(source, "rb") as file:
+        magic = file.read(3)
+    if magic[:2] == b"\x1f\x8b":
+        return gzip.open(source, "rb")
+    if magic == b"BZh":
+        return bz2.open(source, "rb")
+    if not magic:
+        return memoryview(b"")
+    with open(source, "rb") as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def iter_records(stream):
+    """
+    Yields (timestamp, type, subtype, body) for each MRT record.
+    ``body`` is a zero-copy memoryview when reading a memory-mapped file.
+    :param stream: A memoryview or readable binary file object from open_mrt()
+    """
+    if isinstance(stream, memoryview):
+        offset, end = 0, len(stream)
+        while offset + _HEADER.size <= end:
+            timestamp, kind, subtype, length = _HEADER.unpack_from(stream, offset)
+            offset += _HEADER.size
+            if offset + length > end:
+                raise MRTFormatError(f"Truncated record at offset {offset - _HEADER.size}")
+            yield timestamp, kind, subtype, stream[offset:offset + length]
+            offset += length
+        if offset != end:
+            raise MRTFormatError("Trailing bytes after the last record")
+        return
+
+    while True:
+        header = _read(stream, _HEADER.size)
+        if not header:
+            return
+        if len(header) < _HEADER.size:
+            raise MRTFormatError("Truncated record header")
+        timestamp, kind, subtype, length = _HEADER.unpack(header)
+        body = _read(stream, length)
+        if len(body) < length:
+            raise MRTFormatError("Truncated record body")
+        yield timestamp, kind, subtype, memoryview(body)
+
+
+def _read(stream, size):
+    try:
+        return stream.read(size)
+    except (EOFError, zlib.error, OSError) as e:
+        # gzip raises EOFError for a cut-off file and zlib.error or BadGzipFile for corrupt data; bzip2 raises OSError
+        raise MRTFormatError(f"Unreadable compressed data: {e}") from e
+
+
+def iter_routes(source):
+    """
+    Streams the routes contained in a TABLE_DUMP_V2 or BGP4MP file.
+    Only the peer index table is held in memory.
+    :param source: File path, bytes-like object or binary file object
+    :return: Generator of MRTRoute tuples
+    """
+    stream = open_mrt(source)
+    peers = []
+    try:
+        for timestamp, kind, subtype, body in iter_records(stream):
+            # Decode the whole record first so a malformed one yields nothing
+            try:
+                routes = _parse_record(timestamp, kind, subtype, body, peers)
+            except (struct.error, IndexError, ValueError) as e:
+                raise MRTFormatError(f"Malformed record of type {kind}/{subtype}: {e}")
+            if isinstance(routes, list):
+                yield from routes
+            elif routes is not None:
+                peers = routes
+    finally:
+        if hasattr(stream, "close"):
+            stream.close()
+
+
+def _parse_record(timestamp, kind, subtype, body, peers):
+    """Returns the routes in a record, the new peer table for a PEER_INDEX_TABLE, or None."""
+    if kind == TABLE_DUMP_V2:
+        if subtype == PEER_INDEX_TABLE:
+            return tuple(_parse_peer_index(body))
+        if subtype in (RIB_IPV4_UNICAST, RIB_IPV6_UNICAST):
+            return list(_parse_rib(body, 4 if subtype == RIB_IPV4_UNICAST else 6, peers))
+    elif kind in (BGP4MP, BGP4MP_ET):
+        if kind == BGP4MP_ET:
+            body = body[4:]  # Microsecond timestamp
+        if subtype in (BGP4MP_MESSAGE, BGP4MP_MESSAGE_LOCAL):
+            return list(_parse_bgp4mp(body, timestamp, 2))
+        if subtype in (BGP4MP_MESSAGE_AS4, BGP4MP_MESSAGE_AS4_LOCAL):
+            return list(_parse_bgp4mp(body, timestamp, 4))
+    return None
+
+
+def _parse_peer_index(body):
+    offset = 4  # Collector BGP ID
+    (name_length,) = struct.unpack_from("!H", body, offset)
+    offset += 2 + name_length
+    (count,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    peers = []
+    for _ in range(count):
+        peer_type = body[offset]
+        offset += 5  # Peer type and BGP ID
+        ip_length = 16 if peer_type & 1 else 4
+        peer_ip = str(ipaddress.ip_address(bytes(body[offset:offset + ip_length])))
+        offset += ip_length
+        if peer_type & 2:
+            (peer_as,) = struct.unpack_from("!I", body, offset)
+            offset += 4
+        else:
+            (peer_as,) = struct.unpack_from("!H", body, offset)
+            offset += 2
+        peers.append((peer_as, peer_ip))
+    return peers
+
+
+def _parse_rib(body, version, peers):
+    offset = 4  # Sequence number
+    prefix, offset = _parse_prefix(body, offset, version)
+    (count,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    for _ in range(count):
+        peer_index, originated, attr_length = struct.unpack_from("!HIH", body, offset)
+        offset += 8
+        attrs = _parse_attributes(body[offset:offset + attr_length], 4, rib_entry=True)
+        offset += attr_length
+        if peer_index >= len(peers):
+            raise MRTFormatError(f"Unknown peer index {peer_index}")
+        peer_as, peer_ip = peers[peer_index]
+        yield MRTRoute(originated, prefix, peer_as, peer_ip, attrs["as_path"], attrs["origin"],
+                       attrs["med"], attrs["local_pref"], attrs["next_hop"], False)
+
+
+def _parse_bgp4mp(body, timestamp, as_size):
+    as_format = "!I" if as_size == 4 else "!H"
+    (peer_as,) = struct.unpack_from(as_format, body, 0)
+    offset = 2 * as_size + 2  # Peer AS, local AS and interface index
+    (afi,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    ip_length = 16 if afi == 2 else 4
+    peer_ip = str(ipaddress.ip_address(bytes(body[offset:offset + ip_length])))
+    offset += 2 * ip_length  # Peer and local addresses
+
+    # BGP message: 16 byte marker, length, type
+    message_type = body[offset + 18]
+    if message_type != BGP_UPDATE:
+        return
+    offset += 19
+    (withdrawn_length,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    withdrawn_end = offset + withdrawn_length
+    withdrawn = []
+    while offset < withdrawn_end:
+        prefix, offset = _parse_prefix(body, offset, 4)
+        withdrawn.append(prefix)
+    (attr_length,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    attrs = _parse_attributes(body[offset:offset + attr_length], as_size)
+    offset += attr_length
+    announced = list(attrs["announced"])
+    while offset < len(body):
+        prefix, offset = _parse_prefix(body, offset, 4)
+        announced.append(prefix)
+
+    for prefix in withdrawn + attrs["withdrawn"]:
+        yield MRTRoute(timestamp, prefix, peer_as, peer_ip, (), None, None, None, None, True)
+    for prefix in announced:
+        yield MRTRoute(timestamp, prefix, peer_as, peer_ip, attrs["as_path"], attrs["origin"],
+                       attrs["med"], attrs["local_pref"], attrs["next_hop"], False)
+
+
+def _parse_prefix(body, offset, version):
+    length = body[offset]
+    octets = (length + 7) // 8
+    width = 32 if version == 4 else 128
+    if length > width:
+        raise MRTFormatError(f"Invalid prefix length {length}")
+    key = int.from_bytes(body[offset + 1:offset + 1 + octets], "big") << (width - 8 * octets)
+    return (version, key, length), offset + 1 + octets
+
+
+def _parse_as_path(data, as_size):
+    as_format = "!%d" + ("I" if as_size == 4 else "H")
+    path = []
+    offset = 0
+    while offset < len(data):
+        segment_type, count = data[offset], data[offset + 1]
+        offset += 2
+        asns = struct.unpack_from(as_format % count, data, offset)
+        offset += count * as_size
+        if segment_type == AS_SET:
+            # An AS_SET counts as a single hop in the path length
+            path.append(tuple(sorted(asns)))
+        else:
+            path.extend(asns)
+    return tuple(path)
+
+
+def _parse_attributes(data, as_size, rib_entry=False):
+    attrs = {"origin": None, "as_path": (), "next_hop": None, "med": None, "local_pref": None,
+             "announced": [], "withdrawn": []}
+    as4_path = None
+    offset = 0
+    while offset < len(data):
+        flags, code = data[offset], data[offset + 1]
+        if flags & 0x10:
+            (length,) = struct.unpack_from("!H", data, offset + 2)
+            offset += 4
+        else:
+            length = data[offset + 2]
+            offset += 3
+        value = data[offset:offset + length]
+        offset += length
+
+        if code == ATTR_ORIGIN:
+            attrs["origin"] = value[0]
+        elif code == ATTR_AS_PATH:
+            attrs["as_path"] = _parse_as_path(value, as_size)
+        elif code == ATTR_AS4_PATH:
+            as4_path = _parse_as_path(value, 4)
+        elif code == ATTR_NEXT_HOP:
+            attrs["next_hop"] = str(ipaddress.IPv4Address(bytes(value)))
+        elif code == ATTR_MED:
+            (attrs["med"],) = struct.unpack_from("!I", value)
+        elif code == ATTR_LOCAL_PREF:
+            (attrs["local_pref"],) = struct.unpack_from("!I", value)
+        elif code == ATTR_MP_REACH_NLRI:
+            if rib_entry:
+                # TABLE_DUMP_V2 entries only carry the next hop (RFC 6396 section 4.3.4)
+                attrs["next_hop"] = _next_hop(value[1:1 + value[0]])
+            else:
+                afi, _, nh_length = struct.unpack_from("!HBB", value)
+                attrs["next_hop"] = _next_hop(value[4:4 + nh_length])
+                nlri_offset = 5 + nh_length  # Reserved octet follows the next hop
+                version = 6 if afi == 2 else 4
+                while nlri_offset < len(value):
+                    prefix, nlri_offset = _parse_prefix(value, nlri_offset, version)
+                    attrs["announced"].append(prefix)
+        elif code == ATTR_MP_UNREACH_NLRI:
+            (afi,) = struct.unpack_from("!H", value)
+            version = 6 if afi == 2 else 4
+            nlri_offset = 3
+            while nlri_offset < len(value):
+                prefix, nlri_offset = _parse_prefix(value, nlri_offset, version)
+                attrs["withdrawn"].append(prefix)
+
+    if as4_path is not None and as_size == 2 and len(as4_path) <= len(attrs["as_path"]):
+        # 2-byte sessions carry the real path of 4-byte ASNs in AS4_PATH (RFC 6793)
+        attrs["as_path"] = attrs["as_path"][:len(attrs["as_path"]) - len(as4_path)] + as4_path
+    return attrs
+
+
+def _next_hop(value):
+    if len(value) >= 16:
+        return str(ipaddress.IPv6Address(bytes(value[:16])))
+    if len(value) == 4:
+        return str(ipaddress.IPv4Address(bytes(value)))
+    return None
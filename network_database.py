@@ -1,36 +1,64 @@
-import os
-import shutil
+import io
+import itertools
 import logging
-from datetime import datetime, timedelta
-import mysql.connector
-import psycopg2
+from contextlib import closing
+from cache import TTLCache
 from config import DATABASE_URI
+from db_pool import close_pools, mysql_pool, postgres_pool
+from log_archiver import CleanupOperations
+
+MYSQL_INSERT = "INSERT INTO network_configurations (network_name, bandwidth, status) VALUES (%s, %s, %s)"
+POSTGRES_INSERT = """
+    INSERT INTO network_data (network_name, network_ip, network_details)
+    VALUES (%s, %s, %s)
+"""
+POSTGRES_COPY = "COPY network_data (network_name, network_ip, network_details) FROM STDIN"
+
+# Names looked up per IN (...) query in retrieve_many
+LOOKUP_CHUNK = 1000
 
 
 class NetworkDatabase:
-    def __init__(self, db_type="mysql", host="localhost", user="root", password="password", database="vajra_network"):
+    def __init__(self, db_type="mysql", host="localhost", user="root", password="password", database="vajra_network",
+                 pool=None, cache_size=4096, cache_ttl=60.0, **pool_options):
         """
-        Initialize the database connection.
+        Initialize the database connection pool.
+        Instances pointing at the same database share one pool per process.
         :param db_type: Type of the database ('mysql' or 'postgresql')
         :param host: Database host (MySQL or PostgreSQL)
         :param user: Database username
         :param password: Database password
         :param database: Database name
+        :param pool: ConnectionPool to use instead of the shared one
+        :param cache_size: Maximum number of networks kept by the read-through cache
+        :param cache_ttl: Seconds a cached lookup is served; writes through this instance invalidate it sooner
+        :param pool_options: ConnectionPool options such as min_size and max_size
         """
         self.db_type = db_type
-        if self.db_type == "mysql":
-            self.conn = mysql.connector.connect(
-                host=host,
-                user=user,
-                password=password,
-                database=database
-            )
-            self.cursor = self.conn.cursor(dictionary=True)
-        elif self.db_type == "postgresql":
-            self.conn = psycopg2.connect(DATABASE_URI)
-            self.cursor = self.conn.cursor()
-        else:
+        if self.db_type not in ("mysql", "postgresql"):
             raise ValueError("Unsupported database type. Use 'mysql' or 'postgresql'.")
+        if pool is not None:
+            self.pool = pool
+        elif self.db_type == "mysql":
+            self.pool = mysql_pool(host=host, user=user, password=password, database=database, **pool_options)
+        elif self.db_type == "postgresql":
+            self.pool = postgres_pool(DATABASE_URI, **pool_options)
+        self.table = "network_configurations" if self.db_type == "mysql" else "network_data"
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._generation = 0  # Bumped by every write so slower concurrent reads don't cache old rows
+
+    def _cursor(self, conn):
+        # Each operation gets its own cursor so concurrent requests never share one
+        return closing(conn.cursor(dictionary=True) if self.db_type == "mysql" else conn.cursor())
+
+    def row(self, network_info):
+        """
+        Returns the column values stored for a record.
+        Raises KeyError when a required field is missing.
+        """
+        if self.db_type == "mysql":
+            return network_info["network_name"], network_info.get("bandwidth", ""), network_info.get("status", "active")
+        return network_info["network_name"], network_info["network_ip"], network_info["network_details"]
 
     def add_data(self, network_info):
         """
@@ -39,40 +67,106 @@ class NetworkDatabase:
         :return: None
         """
         try:
-            if self.db_type == "mysql":
-                query = "INSERT INTO network_configurations (network_name, bandwidth, status) VALUES (%s, %s, %s)"
-                self.cursor.execute(query, (network_info["network_name"], network_info.get("bandwidth", ""), network_info.get("status", "active")))
-                self.conn.commit()
-            elif self.db_type == "postgresql":
-                self.cursor.execute("""
-                    INSERT INTO network_data (network_name, network_ip, network_details)
-                    VALUES (%s, %s, %s)
-                """, (network_info["network_name"], network_info["network_ip"], network_info["network_details"]))
-                self.conn.commit()
+            with self.pool.connection() as conn, self._cursor(conn) as cursor:
+                cursor.execute(MYSQL_INSERT if self.db_type == "mysql" else POSTGRES_INSERT, self.row(network_info))
+                conn.commit()
+            self._invalidate([network_info["network_name"]])
         except Exception as e:
-            self.conn.rollback()
+            # The pool rolls back uncommitted work when the connection is returned
             logging.error(f"Error adding data: {e}")
             raise e
 
+    def add_many(self, network_infos, batch_size=1000):
+        """
+        Adds many network records, committing once per batch.
+        MySQL batches are sent as one multi-row INSERT through executemany();
+        PostgreSQL batches are streamed with COPY FROM STDIN.
+        :param network_infos: Iterable of network_info dictionaries; it is consumed lazily
+        :param batch_size: Number of records per round-trip and commit
+        :return: Number of records added
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        added = 0
+        rows = (self.row(network_info) for network_info in network_infos)
+        try:
+            with self.pool.connection() as conn, self._cursor(conn) as cursor:
+                while True:
+                    batch = list(itertools.islice(rows, batch_size))
+                    if not batch:
+                        break
+                    if self.db_type == "mysql":
+                        cursor.executemany(MYSQL_INSERT, batch)
+                    else:
+                        cursor.copy_expert(POSTGRES_COPY, io.StringIO(copy_text(batch)))
+                    conn.commit()
+                    added += len(batch)
+                    self._invalidate(row[0] for row in batch)
+        except Exception as e:
+            # Earlier batches stay committed; the failing one is rolled back
+            logging.error(f"Error adding data after {added} records: {e}")
+            raise e
+        logging.info(f"Added {added} network records")
+        return added
+
     def retrieve_data(self, network_name):
         """
         Retrieves network data from the database.
         :param network_name: The name of the network to retrieve
         :return: Dictionary containing network data or an empty dictionary if not found
         """
+        cached = self.cache.get(network_name)
+        if cached is not None:
+            return dict(cached)
+        generation = self._generation
         try:
-            if self.db_type == "mysql":
-                query = "SELECT * FROM network_configurations WHERE network_name = %s"
-                self.cursor.execute(query, (network_name,))
-                result = self.cursor.fetchone()
-                return result if result else {}
-            elif self.db_type == "postgresql":
-                self.cursor.execute("SELECT * FROM network_data WHERE network_name = %s", (network_name,))
-                result = self.cursor.fetchone()
-                return result if result else {}
+            with self.pool.connection() as conn, self._cursor(conn) as cursor:
+                cursor.execute(f"SELECT * FROM {self.table} WHERE network_name = %s", (network_name,))
+                records = _records(cursor, limit=1)
         except Exception as e:
             logging.error(f"Error retrieving data: {e}")
             return {}
+        # Unknown networks are cached too, as an empty dictionary
+        result = records[0] if records else {}
+        if generation == self._generation:
+            self.cache.set(network_name, result)
+        return dict(result)
+
+    def retrieve_many(self, network_names):
+        """
+        Retrieves several networks, answering from the cache where possible and
+        fetching the rest with one IN (...) query per LOOKUP_CHUNK names.
+        :param network_names: Iterable of network names
+        :return: Dictionary of network name -> network data (empty if not found)
+        """
+        results = {}
+        missing = []
+        for network_name in dict.fromkeys(network_names):
+            cached = self.cache.get(network_name)
+            if cached is None:
+                missing.append(network_name)
+            else:
+                results[network_name] = dict(cached)
+        if not missing:
+            return results
+        generation = self._generation
+        try:
+            with self.pool.connection() as conn, self._cursor(conn) as cursor:
+                for start in range(0, len(missing), LOOKUP_CHUNK):
+                    chunk = missing[start:start + LOOKUP_CHUNK]
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    cursor.execute(f"SELECT * FROM {self.table} WHERE network_name IN ({placeholders})", chunk)
+                    found = {}
+                    for record in _records(cursor):
+                        found.setdefault(record["network_name"], record)
+                    for network_name in chunk:
+                        result = found.get(network_name, {})
+                        if generation == self._generation:
+                            self.cache.set(network_name, result)
+                        results[network_name] = dict(result)
+        except Exception as e:
+            logging.error(f"Error retrieving data: {e}")
+        return results
 
     def update_data(self, network_name, status):
         """
@@ -82,60 +176,62 @@ class NetworkDatabase:
         :return: None
         """
         try:
-            if self.db_type == "mysql":
-                query = "UPDATE network_configurations SET status = %s WHERE network_name = %s"
-                self.cursor.execute(query, (status, network_name))
-                self.conn.commit()
-            elif self.db_type == "postgresql":
-                self.cursor.execute("UPDATE network_data SET network_status = %s WHERE network_name = %s", (status, network_name))
-                self.conn.commit()
+            with self.pool.connection() as conn, self._cursor(conn) as cursor:
+                if self.db_type == "mysql":
+                    query = "UPDATE network_configurations SET status = %s WHERE network_name = %s"
+                    cursor.execute(query, (status, network_name))
+                elif self.db_type == "postgresql":
+                    cursor.execute("UPDATE network_data SET network_status = %s WHERE network_name = %s", (status, network_name))
+                conn.commit()
         except Exception as e:
-            self.conn.rollback()
             logging.error(f"Error updating data: {e}")
             raise e
+        finally:
+            self._invalidate([network_name])
 
     def close(self):
         """
-        Closes the database connection and cursor.
+        Releases this instance; its pool stays open.
+        Shared pools are also used by the other instances, BillingSystem and the
+        scheduler, and are closed with db_pool.close_pools() when the process shuts
+        down. A pool passed to the constructor belongs to the caller.
         """
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        self.cache.clear()
 
+    def _invalidate(self, network_names):
+        self._generation += 1
+        for network_name in network_names:
+            self.cache.invalidate(network_name)
 
-class CleanupOperations:
-    def __init__(self, log_directory="/var/log/myapp/", archive_directory="/var/log/archive/"):
-        self.log_directory = log_directory
-        self.archive_directory = archive_directory
+    def cache_stats(self):
+        """Returns the read-through cache's size and hit/miss counters."""
+        return self.cache.stats()
 
-    def perform_cleanup(self):
-        """Archive old logs and clean up temporary files."""
-        logging.info("Performing cleanup operations...")
-        try:
-            # Create archive directory if it doesn't exist
-            if not os.path.exists(self.archive_directory):
-                os.makedirs(self.archive_directory)
-
-            # Get the current date and calculate the threshold date (e.g., 30 days old)
-            threshold_date = datetime.now() - timedelta(days=30)
-
-            # Loop through log files and archive files older than 30 days
-            for filename in os.listdir(self.log_directory):
-                log_file = os.path.join(self.log_directory, filename)
-
-                # Check if the file is older than the threshold date
-                if os.path.isfile(log_file):
-                    file_mod_time = datetime.fromtimestamp(os.path.getmtime(log_file))
-                    if file_mod_time < threshold_date:
-                        # Move the file to the archive folder
-                        shutil.move(log_file, os.path.join(self.archive_directory, filename))
-                        logging.info(f"Archived log file: {filename}")
-
-            logging.info("Cleanup operations completed successfully.")
-        
-        except Exception as e:
-            logging.error(f"Error during cleanup operations: {e}")
+
+def _records(cursor, limit=None):
+    """Fetches rows as dictionaries, whichever cursor type produced them."""
+    rows = cursor.fetchall() if limit is None else cursor.fetchmany(limit)
+    if limit is not None:
+        cursor.fetchall()  # Drain the rest so the connection can be reused
+    if rows and not isinstance(rows[0], dict):
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in rows]
+    return rows
+
+
+def copy_text(rows):
+    """Encodes rows in PostgreSQL's COPY text format."""
+    lines = []
+    for row in rows:
+        fields = []
+        for value in row:
+            if value is None:
+                fields.append("\\N")
+            else:
+                fields.append(str(value).replace("\\", "\\\\").replace("\t", "\\t")
+                              .replace("\n", "\\n").replace("\r", "\\r"))
+        lines.append("\t".join(fields))
+    return "\n".join(lines) + "\n"
 
 
 if __name__ == "__main__":
@@ -172,6 +268,7 @@ if __name__ == "__main__":
         logging.error(f"Error adding network data to PostgreSQL: {e}")
     finally:
         network_db_postgresql.close()
+        close_pools()
 
     # Example of performing cleanup operations
     cleanup = CleanupOperations()
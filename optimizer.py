@@ -1,17 +1,322 @@
+import logging
+import time
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from scipy.sparse.csgraph import dijkstra
+
+# Flow variables above which the LP is skipped in favour of congestion-aware shortest paths. On a
+# 1,000-node, 3,000-link topology HiGHS took about 1.4 s for 12,000 variables, 2.9 s for 24,000 and
+# 10 s for 60,000 on one core, while the shortest-path placement took 0.2 s
+MAX_LP_VARIABLES = 20000
+
+
 class NetworkOptimizer:
-    def __init__(self):
-        # Initialize optimizer
-        pass
+    """
+    Traffic-engineering solver.
+
+    Demands are placed with a min-cost multi-commodity flow LP solved by HiGHS.
+    Commodities are aggregated per source or per destination, whichever gives
+    fewer, so the LP has (commodities x arcs) flow variables. Each arc may be
+    loaded up to ``target_utilisation`` of its capacity at its cost, and the
+    remaining headroom at a penalty, so congestion is spread before it is
+    accepted. Demand that cannot be carried at all is reported as unserved.
+
+    Placement on shortest paths (scipy.sparse.csgraph) is the baseline that
+    local-pref recommendations are measured against. When the LP is too large,
+    e.g. a full demand matrix, or fails, demands are instead placed in rounds on
+    shortest paths that avoid increasingly loaded links.
+    """
+
+    def __init__(self, target_utilisation=0.8, overload_penalty=None, max_lp_variables=MAX_LP_VARIABLES,
+                 time_limit=3.0, rounds=4, max_seconds=5.0):
+        """
+        :param target_utilisation: Fraction of a link's capacity usable at its normal cost
+        :param overload_penalty: Extra cost per unit of traffic above the target, defaults to the longest possible path cost
+        :param max_lp_variables: Largest LP attempted before falling back to shortest paths
+        :param time_limit: Seconds the LP solver may run
+        :param rounds: Increments demands are placed in when the LP is not used
+        :param max_seconds: Seconds optimize() should take at most; the LP only gets the time that
+                            leaves for the fallback
+        """
+        if not 0 < target_utilisation <= 1:
+            raise ValueError("target_utilisation must be in (0, 1]")
+        self.target_utilisation = target_utilisation
+        self.overload_penalty = overload_penalty
+        self.max_lp_variables = max_lp_variables
+        self.time_limit = time_limit
+        self.rounds = rounds
+        self.max_seconds = max_seconds
 
     def optimize(self, network_config):
         """
         Optimize the network based on the provided configuration.
-        :param network_config: A dictionary containing the network configuration
-        :return: Optimized network configuration
+        :param network_config: A dictionary with 'links' ({source, target, capacity, cost=1, directed=False}),
+                               optional 'ixp_ports' ({node, ixp, capacity, cost=1}, joining a node to an IXP
+                               that demands may target) and 'demands' ({source, target, volume})
+        :return: Dictionary with per-link flow and utilisation, unserved demand and recommended
+                 peering, local-pref and capacity changes
         """
-        optimized_network = {
-            "original_network": network_config,
+        started = time.perf_counter()
+        network = Network(network_config)
+        placed = time.perf_counter()
+        baseline = network.shortest_path_flow()
+        # The fallback places demands on shortest paths once per round
+        fallback = (time.perf_counter() - placed) * self.rounds
+        time_limit = min(self.time_limit, self.max_seconds - (time.perf_counter() - started) - fallback)
+        solver = "lp"
+        flow = unserved = prices = None
+        variables = network.commodity_count() * len(network.arc_costs)
+        if variables > self.max_lp_variables:
+            logging.info(f"LP with {variables} flow variables exceeds {self.max_lp_variables}, using shortest paths")
+        elif time_limit <= 0:
+            logging.info(f"No time left for the LP within {self.max_seconds}s, using shortest paths")
+        else:
+            solution = network.min_cost_flow(self.target_utilisation, self.overload_penalty, time_limit)
+            if solution is None:
+                logging.warning("LP did not solve, using shortest paths")
+            else:
+                flow, unserved, prices = solution
+        if flow is None:
+            solver = "congestion_aware_shortest_path"
+            flow, unserved = network.congestion_aware_flow(self.target_utilisation, self.rounds)
+            prices = np.zeros(len(flow))
+
+        result = network.report(flow, unserved, prices, baseline[0], self.target_utilisation)
+        result.update({
             "optimized": True,
-            "details": "Network optimized successfully"
+            "solver": solver,
+            "seconds": time.perf_counter() - started,
+            "details": f"Placed {result['served_volume']:g} of {result['demand_volume']:g} units of demand",
+        })
+        return result
+
+
+class Network:
+    """Nodes, arcs and demands of a network_config, indexed for the solvers."""
+
+    def __init__(self, network_config):
+        network_config = network_config or {}
+        self.nodes = {}
+        tails, heads, capacities, costs = [], [], [], []
+        self.links = []  # (description, arcs)
+
+        def arc(source, target, capacity, cost):
+            tails.append(self.node(source))
+            heads.append(self.node(target))
+            capacities.append(float(capacity))
+            costs.append(float(cost))
+            return len(tails) - 1
+
+        for link in network_config.get("links", []):
+            capacity, cost = link["capacity"], link.get("cost", 1)
+            arcs = [arc(link["source"], link["target"], capacity, cost)]
+            if not link.get("directed", False):
+                arcs.append(arc(link["target"], link["source"], capacity, cost))
+            self.links.append(({"source": link["source"], "target": link["target"], "capacity": capacity}, arcs))
+        for port in network_config.get("ixp_ports", []):
+            capacity, cost = port["capacity"], port.get("cost", 1)
+            arcs = [arc(port["node"], port["ixp"], capacity, cost), arc(port["ixp"], port["node"], capacity, cost)]
+            self.links.append(({"source": port["node"], "target": port["ixp"], "capacity": capacity,
+                                "ixp": port["ixp"]}, arcs))
+        if any(capacity < 0 for capacity in capacities) or any(cost < 0 for cost in costs):
+            raise ValueError("Link capacities and costs must not be negative")
+
+        # Parallel demands between the same nodes are merged
+        volumes = {}
+        for demand in network_config.get("demands", []):
+            volume = float(demand["volume"])
+            if volume < 0:
+                raise ValueError("Demand volumes must not be negative")
+            key = (self.node(demand["source"]), self.node(demand["target"]))
+            if key[0] != key[1] and volume > 0:
+                volumes[key] = volumes.get(key, 0.0) + volume
+
+        self.names = list(self.nodes)
+        self.tails = np.array(tails, dtype=np.int64)
+        self.heads = np.array(heads, dtype=np.int64)
+        self.capacities = np.array(capacities)
+        self.arc_costs = np.array(costs)
+        self.demands = np.array(list(volumes), dtype=np.int64).reshape(-1, 2)
+        self.volumes = np.array(list(volumes.values()))
+
+    def node(self, name):
+        return self.nodes.setdefault(str(name), len(self.nodes))
+
+    def commodity_count(self):
+        if not len(self.demands):
+            return 0
+        return min(len(np.unique(self.demands[:, 0])), len(np.unique(self.demands[:, 1])))
+
+    def shortest_path_flow(self, weights=None, volumes=None):
+        """
+        Places every demand on its cheapest path, ignoring capacity.
+        :param weights: Cost per arc, defaults to the configured costs; infinite weights exclude an arc
+        :param volumes: Volume per demand, defaults to the configured volumes
+        :return: Tuple of (flow per arc, unserved volume per demand)
+        """
+        weights = self.arc_costs if weights is None else weights
+        volumes = self.volumes if volumes is None else volumes
+        flow = np.zeros(len(self.arc_costs))
+        unserved = np.zeros(len(self.volumes))
+        if not len(self.volumes):
+            return flow, unserved
+        n = len(self.names)
+        # Cheapest arc between each pair of nodes, since csgraph would add up parallel arcs
+        usable = np.flatnonzero(np.isfinite(weights))
+        order = usable[np.lexsort((weights[usable], self.heads[usable], self.tails[usable]))]
+        pair_keys = self.tails[order] * n + self.heads[order]
+        arcs = order[np.unique(pair_keys, return_index=True)[1]]
+        # Zero-cost arcs would be dropped as missing edges by csgraph
+        graph = sparse.csr_matrix((np.maximum(weights[arcs], 1e-9), (self.tails[arcs], self.heads[arcs])), shape=(n, n))
+        arc_index = sparse.csr_matrix((arcs + 1, (self.tails[arcs], self.heads[arcs])), shape=(n, n))
+
+        sources, source_rows = np.unique(self.demands[:, 0], return_inverse=True)
+        distances, predecessors = dijkstra(graph, indices=sources, return_predecessors=True)
+        for row, source in enumerate(sources):
+            demands = np.flatnonzero(source_rows == row)
+            targets = self.demands[demands, 1]
+            unreachable = np.isinf(distances[row, targets])
+            unserved[demands[unreachable]] = volumes[demands[unreachable]]
+            load = np.zeros(n)
+            np.add.at(load, targets[~unreachable], volumes[demands[~unreachable]])
+            # Each node passes the traffic for itself and its subtree up to its predecessor, farthest nodes first
+            nodes = np.flatnonzero(np.isfinite(distances[row]) & (np.arange(n) != source))
+            nodes = nodes[np.argsort(-distances[row, nodes], kind="stable")]
+            parents = predecessors[row, nodes]
+            load_list = load.tolist()
+            for node, parent in zip(nodes.tolist(), parents.tolist()):
+                load_list[parent] += load_list[node]
+            load = np.array(load_list)
+            carrying = nodes[load[nodes] > 0]
+            if not len(carrying):
+                continue
+            tree_arcs = np.asarray(arc_index[predecessors[row, carrying], carrying]).ravel() - 1
+            np.add.at(flow, tree_arcs, load[carrying])
+        return flow, unserved
+
+    def congestion_aware_flow(self, target_utilisation, rounds=4):
+        """
+        Places demands in equal increments on shortest paths whose arc weights grow with the load
+        the previous increments project onto them (a BPR-style delay function), so later increments
+        steer around links heading past the target utilisation.
+        :return: Tuple of (flow per arc, unserved volume per demand)
+        """
+        flow = np.zeros(len(self.arc_costs))
+        unserved = np.zeros(len(self.volumes))
+        usable = np.where(self.capacities > 0, self.capacities * target_utilisation, np.nan)
+        base = np.where(self.capacities > 0, np.maximum(self.arc_costs, 1e-9), np.inf)
+        for placed in range(rounds):
+            projected = flow * rounds / placed if placed else flow
+            weights = base * (1 + np.nan_to_num(projected / usable) ** 4)
+            round_flow, round_unserved = self.shortest_path_flow(weights, self.volumes / rounds)
+            flow += round_flow
+            unserved += round_unserved
+        return flow, unserved
+
+    def min_cost_flow(self, target_utilisation, overload_penalty=None, time_limit=None):
+        """
+        Solves the min-cost multi-commodity flow LP.
+        :return: Tuple of (flow per arc, unserved volume per demand, capacity shadow price per arc), or None
+        """
+        n, m, k = len(self.names), len(self.arc_costs), len(self.volumes)
+        if not k:
+            return np.zeros(m), np.zeros(0), np.zeros(m)
+        # Aggregate commodities on whichever side has fewer distinct nodes
+        side = 0 if len(np.unique(self.demands[:, 0])) <= len(np.unique(self.demands[:, 1])) else 1
+        roots, commodity = np.unique(self.demands[:, side], return_inverse=True)
+        c = len(roots)
+
+        # Node-arc incidence: +1 where an arc leaves a node, -1 where it enters
+        incidence = sparse.csr_matrix(
+            (np.concatenate([np.ones(m), -np.ones(m)]),
+             (np.concatenate([self.tails, self.heads]), np.concatenate([np.arange(m), np.arange(m)]))),
+            shape=(n, m))
+        # Unserved volume u_d is taken out of its demand: out - in + u_d = volume_d at the source, - u_d at the target
+        unserved_rows = np.concatenate([commodity * n + self.demands[:, 0], commodity * n + self.demands[:, 1]])
+        unserved_columns = np.concatenate([np.arange(k), np.arange(k)])
+        unserved_values = np.concatenate([np.ones(k), -np.ones(k)])
+        a_eq = sparse.hstack([
+            sparse.kron(sparse.identity(c, format="csr"), incidence, format="csr"),
+            sparse.csr_matrix((n * c, m)),
+            sparse.csr_matrix((unserved_values, (unserved_rows, unserved_columns)), shape=(n * c, k)),
+        ], format="csr")
+        b_eq = np.zeros(n * c)
+        np.add.at(b_eq, commodity * n + self.demands[:, 0], self.volumes)
+        np.add.at(b_eq, commodity * n + self.demands[:, 1], -self.volumes)
+
+        # Sum of commodity flows on an arc, less its overload, stays within the target share of capacity
+        a_ub = sparse.hstack([
+            sparse.kron(np.ones((1, c)), sparse.identity(m, format="csr"), format="csr"),
+            -sparse.identity(m, format="csr"),
+            sparse.csr_matrix((m, k)),
+        ], format="csr")
+        b_ub = self.capacities * target_utilisation
+
+        # Overloading an arc costs more than any detour; dropping demand costs more than overloading a whole path
+        max_cost = float(self.arc_costs.max()) if m else 1.0
+        longest = (n - 1) * max_cost + 1.0
+        penalty = longest if overload_penalty is None else overload_penalty
+        drop = (n - 1) * (penalty + max_cost) + 1.0
+        objective = np.concatenate([np.tile(self.arc_costs, c), np.full(m, penalty), np.full(k, drop)])
+        bounds = np.concatenate([
+            np.column_stack([np.zeros(c * m), np.full(c * m, np.inf)]),
+            np.column_stack([np.zeros(m), self.capacities * (1 - target_utilisation)]),
+            np.column_stack([np.zeros(k), self.volumes]),
+        ])
+        options = {} if time_limit is None else {"time_limit": time_limit}
+        result = linprog(objective, A_ub=a_ub, b_ub=b_ub, A_eq=a_eq, b_eq=b_eq, bounds=bounds, method="highs",
+                         options=options)
+        if result.status != 0:
+            logging.warning(f"LP solver stopped: {result.message}")
+            return None
+        x = result.x
+        flow = x[:c * m].reshape(c, m).sum(axis=0)
+        return flow, x[c * m + m:], -result.ineqlin.marginals
+
+    def report(self, flow, unserved, prices, baseline, target_utilisation):
+        links = []
+        for description, arcs in self.links:
+            capacity = float(description["capacity"])
+            link_flow = [float(flow[arc]) for arc in arcs]
+            links.append(dict(description, flow=link_flow[0] if len(arcs) == 1 else link_flow,
+                              utilisation=max(link_flow) / capacity if capacity else (0.0 if not any(link_flow) else None),
+                              shadow_price=float(max(prices[arcs]))))
+
+        recommendations = []
+        for (description, arcs), link in zip(self.links, links):
+            if "ixp" not in description:
+                continue
+            shift = float(flow[arcs].sum() - baseline[arcs].sum())
+            if abs(shift) > 1e-6:
+                recommendations.append({
+                    "type": "local_pref", "node": description["source"], "ixp": description["ixp"],
+                    "action": "increase" if shift > 0 else "decrease", "traffic_shift": shift,
+                })
+            if link["shadow_price"] > 1e-9 or (link["utilisation"] is not None and link["utilisation"] > target_utilisation):
+                recommendations.append({
+                    "type": "peering", "node": description["source"], "ixp": description["ixp"],
+                    "action": "add_capacity", "utilisation": link["utilisation"],
+                })
+        # Links whose capacity constrains the placement (or, without an LP, that are overloaded),
+        # most valuable upgrade first
+        for (description, _), link in sorted(zip(self.links, links), key=lambda pair: -pair[1]["shadow_price"]):
+            overloaded = link["utilisation"] is not None and link["utilisation"] > 1
+            if "ixp" not in description and (link["shadow_price"] > 1e-9 or overloaded):
+                recommendations.append({
+                    "type": "capacity", "source": description["source"], "target": description["target"],
+                    "action": "add_capacity", "shadow_price": link["shadow_price"],
+                })
+
+        unserved_demands = [{"source": self.names[source], "target": self.names[target], "volume": float(volume)}
+                            for (source, target), volume in zip(self.demands, unserved) if volume > 1e-9]
+        utilisations = [link["utilisation"] for link in links if link["utilisation"] is not None]
+        demand_volume = float(self.volumes.sum())
+        return {
+            "links": links,
+            "max_utilisation": max(utilisations, default=0.0),
+            "demand_volume": demand_volume,
+            "served_volume": demand_volume - float(np.sum(unserved)),
+            "unserved": unserved_demands,
+            "recommendations": recommendations,
         }
-        return optimized_network
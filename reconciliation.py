@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import razorpay
+import requests
+
+# Largest page the Razorpay list APIs return
+MAX_PAGE_SIZE = 100
+
+PAYMENT_UPSERT = """
+    INSERT INTO payments (order_id, payment_id, amount, currency, payer, payment_status)
+    VALUES {values}
+    ON CONFLICT (order_id) DO UPDATE SET payment_id = excluded.payment_id, payment_status = excluded.payment_status
+"""
+CURSOR_SELECT = "SELECT position FROM sync_cursors WHERE name = {0}"
+CURSOR_UPSERT = """
+    INSERT INTO sync_cursors (name, position) VALUES ({0}, {0})
+    ON CONFLICT (name) DO UPDATE SET position = excluded.position
+"""
+
+# Errors worth retrying: throttling (reported as a server error), gateway errors and dropped connections
+_RETRYABLE = (razorpay.errors.ServerError, razorpay.errors.GatewayError, requests.exceptions.ConnectionError,
+              requests.exceptions.Timeout)
+
+
+class RateLimiter:
+    """Token bucket shared by the threads calling an API."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: Calls allowed per second
+        :param burst: Calls allowed back to back, defaults to one second's worth
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            self.sleep(wait_for)
+
+
+def payment_row(payment):
+    """Maps a captured Razorpay payment to a payments row; payments made without an order are keyed by their own ID."""
+    notes = payment.get("notes") or {}
+    return (payment.get("order_id") or payment["id"], payment["id"], payment["amount"], payment["currency"],
+            notes.get("payer") if isinstance(notes, dict) else None, "Success")
+
+
+class PaymentReconciler:
+    """
+    Copies captured Razorpay payments into the payments table, incrementally.
+
+    Each run lists the payments created in a fixed window (from the stored high-water
+    mark, minus a lookback, up to now) so offsets stay stable while new payments
+    arrive. Pages are fetched concurrently under a shared rate limit, upserted in
+    multi-row statements, and the window end is stored as the new high-water mark
+    only once every page was written. A failed run is simply repeated by the next
+    one; the upsert makes re-reading payments harmless.
+    """
+
+    def __init__(self, client, pool, cursor_name="razorpay_payments", page_size=MAX_PAGE_SIZE, workers=4, rate=5.0,
+                 batch_size=1000, lookback=3600, max_attempts=4, placeholder="%s", clock=time.time):
+        """
+        :param client: razorpay.Client
+        :param pool: ConnectionPool of the billing database
+        :param cursor_name: Row of sync_cursors holding the high-water mark
+        :param page_size: Payments per API call, at most MAX_PAGE_SIZE
+        :param workers: Pages fetched concurrently
+        :param rate: API calls per second across all workers
+        :param batch_size: Payments per upsert statement and commit
+        :param lookback: Seconds re-read before the high-water mark, to pick up payments captured after they were listed
+        :param max_attempts: Tries per page before the run fails
+        :param placeholder: Parameter placeholder of the database driver
+        :param clock: Returns the current Unix time
+        """
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+        self.client = client
+        self.pool = pool
+        self.cursor_name = cursor_name
+        self.page_size = page_size
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.batch_size = batch_size
+        self.lookback = lookback
+        self.max_attempts = max_attempts
+        self.placeholder = placeholder
+        self.clock = clock
+
+    def fetch_page(self, resource, params):
+        """Fetches one page of a Razorpay collection, retrying throttled and failed calls with backoff."""
+        delay = 0.5
+        for attempt in range(1, self.max_attempts + 1):
+            self.limiter.acquire()
+            try:
+                return resource.all(params)["items"]
+            except _RETRYABLE as e:
+                if attempt == self.max_attempts:
+                    raise
+                logging.warning(f"Razorpay page {params} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    def pages(self, resource, params):
+        """Yields every item of a Razorpay collection, one page at a time."""
+        skip = 0
+        while True:
+            items = self.fetch_page(resource, dict(params, count=self.page_size, skip=skip))
+            yield from items
+            if len(items) < self.page_size:
+                return
+            skip += self.page_size
+
+    def position(self):
+        """Returns the stored high-water mark, or None before the first run."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(CURSOR_SELECT.format(self.placeholder), (self.cursor_name,))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+        return row[0] if row else None
+
+    def run(self):
+        """
+        Reconciles the payments created since the last run.
+        :return: Dictionary with the pages and payments read, the payments upserted and the new high-water mark
+        """
+        position = self.position()
+        window = {"to": int(self.clock())}
+        if position is not None:
+            window["from"] = max(0, position - self.lookback)
+        summary = {"pages": 0, "payments": 0, "upserted": 0, "position": window["to"]}
+        rows = {}
+        with self.pool.connection() as conn:
+            for items in self._fetch_window(window):
+                summary["pages"] += 1
+                summary["payments"] += len(items)
+                for payment in items:
+                    if payment.get("status") == "captured":
+                        row = payment_row(payment)
+                        rows[row[0]] = row  # An order has one captured payment; this also dedupes overlapping pages
+                if len(rows) >= self.batch_size:
+                    summary["upserted"] += self._upsert(conn, list(rows.values()))
+                    rows = {}
+            summary["upserted"] += self._upsert(conn, list(rows.values()))
+            cursor = conn.cursor()
+            try:
+                cursor.execute(CURSOR_UPSERT.format(self.placeholder), (self.cursor_name, window["to"]))
+            finally:
+                cursor.close()
+            conn.commit()
+        logging.info(f"Reconciled {summary['upserted']} captured payments from {summary['pages']} pages")
+        return summary
+
+    def _fetch_window(self, window):
+        """Yields the pages of the window in order while up to ``workers`` pages are in flight."""
+        futures = {}
+        next_page = 0
+        last_page = None  # First page found to be short, i.e. the end of the window
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="razorpay-sync") as executor:
+            try:
+                while True:
+                    while len(futures) < self.workers and (last_page is None or next_page <= last_page):
+                        params = dict(window, count=self.page_size, skip=next_page * self.page_size)
+                        futures[next_page] = executor.submit(self.fetch_page, self.client.payment, params)
+                        next_page += 1
+                    if not futures:
+                        return
+                    page = min(futures)
+                    items = futures.pop(page).result()
+                    if len(items) < self.page_size:
+                        last_page = page
+                        for later in futures.values():
+                            later.cancel()
+                        futures.clear()
+                    yield items
+            finally:
+                for future in futures.values():
+                    future.cancel()
+
+    def _upsert(self, conn, rows):
+        if not rows:
+            return 0
+        values = ", ".join(["({})".format(", ".join([self.placeholder] * len(rows[0])))] * len(rows))
+        cursor = conn.cursor()
+        try:
+            cursor.execute(PAYMENT_UPSERT.format(values=values), [value for row in rows for value in row])
+        finally:
+            cursor.close()
+        conn.commit()
+        return len(rows)
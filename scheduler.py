@@ -1,11 +1,9 @@
-import os
-import shutil
 import logging
-import psycopg2
-import schedule
 import time
-from datetime import datetime, timedelta
-from config import DATABASE_URI
+from config import DATABASE_URI, JOB_STATE_DIRECTORY
+from db_pool import close_pools, postgres_pool
+from job_executor import Job, JobExecutor
+from log_archiver import CleanupOperations
 
 
 # Setting up logging for the scheduler
@@ -14,9 +12,8 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 
 class NetworkDatabase:
     def __init__(self):
-        """Initialize PostgreSQL connection."""
-        self.conn = psycopg2.connect(DATABASE_URI)
-        self.cursor = self.conn.cursor()
+        """Use the shared PostgreSQL connection pool."""
+        self.pool = postgres_pool(DATABASE_URI)
 
     def add_data(self, network_info):
         """
@@ -25,51 +22,17 @@ class NetworkDatabase:
         :return: None
         """
         try:
-            self.cursor.execute("""
-                INSERT INTO network_data (network_name, network_ip, network_details)
-                VALUES (%s, %s, %s)
-            """, (network_info["network_name"], network_info["network_ip"], network_info["network_details"]))
-            self.conn.commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO network_data (network_name, network_ip, network_details)
+                    VALUES (%s, %s, %s)
+                """, (network_info["network_name"], network_info["network_ip"], network_info["network_details"]))
+                conn.commit()
             logging.info(f"Network data added for {network_info['network_name']}")
         except Exception as e:
-            self.conn.rollback()
             logging.error(f"Error adding network data: {e}")
 
 
-class CleanupOperations:
-    def __init__(self, log_directory="/var/log/myapp/", archive_directory="/var/log/archive/"):
-        """Initialize cleanup operations."""
-        self.log_directory = log_directory
-        self.archive_directory = archive_directory
-
-    def perform_cleanup(self):
-        """Archive old logs and clean up temporary files."""
-        logging.info("Performing cleanup operations...")
-        try:
-            # Create archive directory if it doesn't exist
-            if not os.path.exists(self.archive_directory):
-                os.makedirs(self.archive_directory)
-
-            # Get the current date and calculate the threshold date (e.g., 30 days old)
-            threshold_date = datetime.now() - timedelta(days=30)
-
-            # Loop through log files and archive files older than 30 days
-            for filename in os.listdir(self.log_directory):
-                log_file = os.path.join(self.log_directory, filename)
-
-                # Check if the file is older than the threshold date
-                if os.path.isfile(log_file):
-                    file_mod_time = datetime.fromtimestamp(os.path.getmtime(log_file))
-                    if file_mod_time < threshold_date:
-                        # Move the file to the archive folder
-                        shutil.move(log_file, os.path.join(self.archive_directory, filename))
-                        logging.info(f"Archived log file: {filename}")
-
-            logging.info("Cleanup operations completed successfully.")
-        except Exception as e:
-            logging.error(f"Error during cleanup operations: {e}")
-
-
 def add_network_data_task():
     """Task to add network data."""
     # Sample network information to insert into the database
@@ -79,7 +42,7 @@ def add_network_data_task():
         "network_details": "Sample network data"
     }
 
-    # Initialize NetworkDatabase instance and insert data
+    # Connections come from the shared pool, so nothing is left open between runs
     network_db = NetworkDatabase()
     network_db.add_data(network_info)
 
@@ -91,20 +54,31 @@ def cleanup_task():
     cleanup.perform_cleanup()
 
 
-def schedule_tasks():
-    """Function to schedule the tasks."""
-    # Schedule the network data insertion every 15 minutes
-    schedule.every(15).minutes.do(add_network_data_task)
+def build_executor(state_directory=JOB_STATE_DIRECTORY, max_workers=4):
+    """Returns a JobExecutor with the network data and cleanup jobs registered, not yet started."""
+    executor = JobExecutor(state_directory, max_workers=max_workers)
+
+    # Add network data every 15 minutes
+    executor.add(Job("add_network_data", add_network_data_task, interval=15 * 60, jitter=30))
+
+    # Run the cleanup operation every day at midnight
+    executor.add(Job("cleanup", cleanup_task, at="00:00", jitter=60))
+    return executor
 
-    # Schedule the cleanup operation every day at midnight
-    schedule.every().day.at("00:00").do(cleanup_task)
 
+def schedule_tasks():
+    """Function to schedule the tasks."""
+    executor = build_executor()
+    executor.start()
     logging.info("Scheduler started. Tasks are being scheduled...")
 
-    # Continuously run the scheduled tasks
-    while True:
-        schedule.run_pending()
-        time.sleep(1)  # Sleep to prevent busy-waiting
+    # The executor runs the jobs on its own threads until interrupted
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        executor.stop()
+        close_pools()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+# Measures how long importing a service entry point takes, with python -X importtime in
+# fresh interpreters, and which heavy dependencies the import pulls in, e.g.
+#   python startup_benchmark.py main main_asgi --runs 5 --budget-ms 400
+#   python startup_benchmark.py app app_asgi --directory web
+# Exits with status 1 if the median import exceeds the budget or a forbidden module is loaded.
+import argparse
+import os
+import subprocess
+import sys
+
+# Dependencies the entry points must only import once a route or job needs them
+HEAVY_MODULES = ("razorpay", "numpy", "scipy", "netmiko", "paramiko", "psycopg2", "mysql")
+
+
+def import_times(module, python=sys.executable, cwd=None):
+    """
+    Imports ``module`` in a fresh interpreter with -X importtime.
+    :return: List of (name, depth, self_us, cumulative_us) in the order the imports finished
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    # The web app imports the shared modules from the repository root
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"], capture_output=True,
+                            text=True, cwd=cwd or root, env=env)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # Header line
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        times.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return times
+
+
+def measure(module, runs=5, top=15, forbidden=HEAVY_MODULES, cwd=None):
+    """
+    Imports ``module`` ``runs`` times.
+    :param cwd: Directory the module is imported from, defaults to the repository root
+    :return: Dictionary with the median import time, the slowest imports of the median run and
+             the forbidden modules it loaded
+    """
+    samples = []
+    for _ in range(runs):
+        times = import_times(module, cwd=cwd)
+        # Imports are listed after the modules they import, so the module's own tree ends with
+        # its line and starts after the previous top-level import (e.g. of the interpreter's site)
+        end = next(index for index, (name, depth, _, _) in enumerate(times) if name == module and depth == 0)
+        start = max((index + 1 for index, entry in enumerate(times[:end]) if entry[1] == 0), default=0)
+        samples.append((times[end][3], times[start:end]))
+    samples.sort(key=lambda sample: sample[0])
+    total, tree = samples[len(samples) // 2]
+    loaded = {name.split(".")[0] for name, _, _, _ in tree}
+    return {
+        "module": module,
+        "median_ms": total / 1000,
+        "runs_ms": [sample[0] / 1000 for sample in samples],
+        "slowest": [(name, cumulative / 1000) for name, depth, _, cumulative in
+                    sorted(tree, key=lambda entry: -entry[3]) if depth == 1][:top],
+        "forbidden": sorted(loaded.intersection(forbidden)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark of the service entry points")
+    parser.add_argument("modules", nargs="*", default=["main"], help="Modules to import (default: main)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--top", type=int, default=15, help="Slowest direct imports to list")
+    parser.add_argument("--budget-ms", type=float, help="Fail if the median import takes longer")
+    parser.add_argument("--allow", nargs="*", default=[], help="Heavy modules the import may load")
+    parser.add_argument("--directory", help="Directory to import from, e.g. web for the dashboard app")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        forbidden = [name for name in HEAVY_MODULES if name not in args.allow]
+        result = measure(module, args.runs, args.top, forbidden, args.directory)
+        print(f"import {module}: median {result['median_ms']:.1f} ms over {args.runs} runs "
+              f"({', '.join(f'{ms:.1f}' for ms in result['runs_ms'])})")
+        for name, ms in result["slowest"]:
+            print(f"  {ms:8.1f} ms  {name}")
+        if result["forbidden"]:
+            print(f"  loads heavy modules at import: {', '.join(result['forbidden'])}")
+            failed = True
+        if args.budget_ms is not None and result["median_ms"] > args.budget_ms:
+            print(f"  over the budget of {args.budget_ms:.0f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import asyncio
+import time
+import unittest
+import httpx
+from flask import Flask
+from quart import Quart
+from asgi_support import RouteDispatcher, sse_response
+from broadcast import Broadcaster
+
+
+def build_app():
+    sync_app = Flask(__name__)
+    async_app = Quart(__name__, static_folder=None)
+
+    @sync_app.route("/status")
+    def sync_status():
+        return {"served_by": "flask"}
+
+    @sync_app.route("/orders", methods=["POST"])
+    def sync_orders():
+        return {"served_by": "flask"}
+
+    @async_app.route("/orders", methods=["POST"])
+    async def async_orders():
+        await asyncio.sleep(0.2)
+        return {"served_by": "quart"}
+
+    @async_app.route("/runs/<run_id>/events")
+    async def run_events(run_id):
+        progress = Broadcaster()
+        for done in (1, 2):
+            progress.publish({"type": "progress", "run": run_id, "done": done})
+        subscription = progress.subscribe()
+        progress.publish({"type": "result", "run": run_id})
+        progress.close()
+        return sse_response(subscription)
+
+    return RouteDispatcher(async_app, sync_app, wsgi_workers=2)
+
+
+class TestRouteDispatcher(unittest.TestCase):
+    def test_async_routes_are_taken_over(self):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app()),
+                                         base_url="http://test") as client:
+                orders = await asyncio.gather(*(client.post("/orders") for _ in range(50)))
+                status = await client.get("/status")
+                missing = await client.get("/missing")
+            return orders, status, missing
+
+        started = time.monotonic()
+        orders, status, missing = asyncio.run(run())
+        # 50 waiting requests share the event loop rather than queueing for the 2 WSGI threads
+        self.assertLess(time.monotonic() - started, 2.0)
+        self.assertEqual({response.json()["served_by"] for response in orders}, {"quart"})
+        self.assertEqual(status.json(), {"served_by": "flask"})
+        self.assertEqual(missing.status_code, 404)
+
+    def test_sse_response(self):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app()),
+                                         base_url="http://test") as client:
+                return await client.get("/runs/7/events")
+
+        response = asyncio.run(run())
+        self.assertEqual(response.headers["content-type"], "text/event-stream; charset=utf-8")
+        self.assertEqual(response.text,
+                         'event: progress\ndata: {"type": "progress", "run": "7", "done": 2}\n\n'
+                         'event: result\ndata: {"type": "result", "run": "7"}\n\n')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+from bgp_decision import RouteTable
+
+
+class TestRouteTable(unittest.TestCase):
+    def test_unknown_origin_is_rejected_before_the_row_is_written(self):
+        table = RouteTable()
+        table.add_route("10.0.0.0/8", peer=65001, origin="igp")
+        for origin in ("IGP", "igpp", 7):
+            with self.assertRaisesRegex(ValueError, "Unknown origin"):
+                table.add_route("10.1.0.0/16", peer=65002, origin=origin)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(len(table.prefix_keys), 1)
+        table.add_route("10.0.0.0/8", peer=65002, origin=2)
+        self.assertEqual(len(table), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
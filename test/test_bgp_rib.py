@@ -0,0 +1,36 @@
+import unittest
+from bgp_rib import RIB, config_networks, format_prefix
+
+class TestRIB(unittest.TestCase):
+    def setUp(self):
+        self.rib = RIB()
+        for prefix in ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24", "192.168.0.0/24", "2001:db8::/32"]:
+            self.rib.insert(prefix, prefix)
+
+    def test_longest_match(self):
+        self.assertEqual(self.rib.longest_match("10.1.2.3"), ("10.1.2.0/24", "10.1.2.0/24"))
+        self.assertEqual(self.rib.longest_match("10.1.9.9")[0], "10.1.0.0/16")
+        self.assertEqual(self.rib.longest_match("2001:db8::1")[0], "2001:db8::/32")
+        self.assertIsNone(self.rib.longest_match("172.16.0.1"))
+
+    def test_withdraw(self):
+        self.assertEqual(self.rib.withdraw("10.1.0.0/16"), "10.1.0.0/16")
+        self.assertIsNone(self.rib.withdraw("10.1.0.0/16"))
+        self.assertEqual(self.rib.longest_match("10.1.9.9")[0], "10.0.0.0/8")
+        self.assertEqual(self.rib.longest_match("10.1.2.3")[0], "10.1.2.0/24")
+        self.assertEqual(len(self.rib), 4)
+
+    def test_covering_and_covered(self):
+        covering = [prefix for prefix, _ in self.rib.covering("10.1.2.0/24")]
+        self.assertEqual(covering, ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"])
+        covered = [prefix for prefix, _ in self.rib.covered("10.0.0.0/8")]
+        self.assertEqual(covered, ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"])
+
+    def test_config_networks(self):
+        commands = ["router bgp 65000", "network 192.168.0.0 mask 255.255.255.0", "exit"]
+        prefixes = [format_prefix(key) for key in config_networks(commands)]
+        self.assertEqual(prefixes, ["192.168.0.0/24"])
+        self.assertIn("192.168.0.0 mask 255.255.255.0", self.rib)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,3 +13,57 @@ class TestBGPSimulator(unittest.TestCase):
         data = "x" * 10**6  # Simulating 1 MB of data
         processed = self.simulator.handle_large_data(data)
         self.assertTrue(processed, "Large data should be processed correctly")
+
+    def test_simulate_converges_on_shortest_path(self):
+        network_data = {
+            "speakers": [{"asn": 1, "prefixes": ["10.0.0.0/8"]}, 2, 3, 4],
+            "sessions": [[1, 2], [2, 3], [3, 4], [4, 1]],
+            "include_routes": True,
+        }
+        result = self.simulator.simulate(network_data)
+        self.assertTrue(result["converged"])
+        self.assertEqual(result["routes"]["3"]["10.0.0.0/8"], [2, 1])
+
+    def test_session_down_reroutes(self):
+        network_data = {
+            "speakers": [{"asn": 1, "prefixes": ["10.0.0.0/8"]}, 2, 3, 4],
+            "sessions": [[1, 2], [2, 3], [3, 4], [4, 1]],
+            "events": [{"time": 100, "type": "session_down", "peers": [1, 2]}],
+            "include_routes": True,
+        }
+        result = self.simulator.simulate(network_data)
+        self.assertTrue(result["converged"])
+        self.assertEqual(result["routes"]["2"]["10.0.0.0/8"], [3, 4, 1])
+        self.assertGreater(result["withdrawals_sent"], 0)
+
+    def test_progress_is_reported_while_running(self):
+        network_data = {
+            "speakers": [{"asn": asn, "prefixes": [f"10.{asn}.0.0/16"]} for asn in range(1, 61)],
+            "sessions": [[asn, asn % 60 + 1] for asn in range(1, 61)] + [[asn, asn + 30] for asn in range(1, 31)],
+        }
+        reports = []
+        result = self.simulator.simulate(network_data, progress=reports.append, progress_interval=0)
+        self.assertTrue(result["converged"])
+        self.assertGreater(len(reports), 1)
+        processed = [report["events_processed"] for report in reports]
+        self.assertEqual(processed, sorted(processed))
+        self.assertLess(processed[-1], result["events_processed"])
+        self.assertGreater(reports[0]["pending_events"], 0)
+
+    def test_route_server_best_paths(self):
+        network_data = {
+            "routes": [
+                {"prefix": "10.0.0.0/8", "peer": 1, "as_path": [1, 5], "router_id": "10.0.0.1"},
+                {"prefix": "10.0.0.0/8", "peer": 2, "as_path": [2], "med": 50, "router_id": "10.0.0.2"},
+                {"prefix": "10.0.0.0/8", "peer": 3, "as_path": [3], "med": 10, "router_id": "10.0.0.3"},
+                {"prefix": "172.16.0.0/12", "peer": 1, "as_path": [1], "local_pref": 200},
+                {"prefix": "172.16.0.0/12", "peer": 2, "as_path": [2]},
+            ],
+            "events": [{"type": "session_down", "peer": 3}, {"type": "local_pref", "peer": 2, "value": 300}],
+            "include_routes": True,
+        }
+        result = self.simulator.simulate(network_data)
+        self.assertEqual(result["reachable_prefixes"], 2)
+        self.assertEqual([r.get("changed_prefixes") for r in result["recomputes"]], [None, 1, 1])
+        self.assertEqual(result["best_paths"]["10.0.0.0/8"]["peer"], 2)
+        self.assertEqual(result["best_paths"]["172.16.0.0/12"]["peer"], 2)
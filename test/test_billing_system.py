@@ -1,9 +1,27 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
 import unittest
-from billing_system import BillingSystem
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import razorpay
+from unittest import mock
+import billing_system
+from billing_system import BillingSystem, IdempotencyConflict, signature_valid
+from db_pool import ConnectionPool
 
 class TestBillingSystem(unittest.TestCase):
     def setUp(self):
-        self.billing_system = BillingSystem()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.billing_system = BillingSystem(order_journal=os.path.join(directory.name, "orders.journal"))
+        self.addCleanup(self.billing_system.close)
 
     def test_create_order_inr(self):
         order = self.billing_system.create_order(amount=100, currency="INR", payer="User1")
@@ -23,3 +41,160 @@ class TestBillingSystem(unittest.TestCase):
 
         verified = self.billing_system.verify_payment(order_id, payment_id, signature)
         self.assertTrue(verified, "Payment verification should succeed")
+
+
+class FakeOrdersHandler(BaseHTTPRequestHandler):
+    """Creates Razorpay orders after a short delay, numbering them in arrival order."""
+
+    protocol_version = "HTTP/1.1"
+    numbers = itertools.count(1)
+
+    def do_POST(self):
+        order = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.05)
+        order["id"] = f"order_{next(self.numbers)}"
+        body = json.dumps(order).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class OrderConnection:
+    """Connection stand-in that records the order rows inserted through it."""
+
+    def __init__(self):
+        self.inserts = []
+        self.updates = []
+        self.result = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params):
+        if query.split()[0] == "UPDATE":
+            self.updates.append(params)
+            stored = {order_id for batch in self.inserts for order_id in batch}
+            self.result = [(order_id,) for order_id in params[1:] if order_id in stored]
+        else:
+            self.inserts.append(params[0::4])
+
+    def fetchall(self):
+        rows, self.result = self.result, []
+        return rows
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeRazorpayTestCase(unittest.TestCase):
+    """Runs a BillingSystem against the fake orders endpoint and an OrderConnection."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOrdersHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.connection = OrderConnection()
+        client = razorpay.Client(auth=("key", "secret"), base_url=f"http://127.0.0.1:{self.server.server_port}")
+        pool = ConnectionPool(lambda: self.connection, min_size=0, max_size=1)
+        self.billing_system = BillingSystem(client=client, pool=pool, order_journal=None)
+        self.addCleanup(self.billing_system.close)
+
+
+class TestIdempotentOrders(FakeRazorpayTestCase):
+    def test_concurrent_retries_create_one_order(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            orders = list(executor.map(lambda _: self.billing_system.create_order(5, "INR", "User1", "checkout-1"),
+                                       range(8)))
+        self.assertEqual({order["id"] for order in orders}, {orders[0]["id"]})
+        self.assertEqual(orders[0]["receipt"], "checkout-1")
+        self.billing_system.order_buffer.flush()
+        self.assertEqual([order_id for batch in self.connection.inserts for order_id in batch], [orders[0]["id"]])
+
+    def test_reused_key_with_other_details_is_rejected(self):
+        self.billing_system.create_order(5, "INR", "User1", "checkout-2")
+        with self.assertRaises(IdempotencyConflict):
+            self.billing_system.create_order(7, "INR", "User1", "checkout-2")
+
+    def test_async_orders_share_keys_with_sync_ones(self):
+        async def create():
+            try:
+                orders = await asyncio.gather(*(self.billing_system.create_order_async(5, "INR", "User1", "checkout-3")
+                                                for _ in range(8)))
+                with self.assertRaises(IdempotencyConflict):
+                    await self.billing_system.create_order_async(7, "INR", "User1", "checkout-3")
+                return orders
+            finally:
+                await self.billing_system.close_async()
+
+        orders = asyncio.run(create())
+        self.assertEqual({order["id"] for order in orders}, {orders[0]["id"]})
+        self.assertEqual(self.billing_system.create_order(5, "INR", "User1", "checkout-3"), orders[0])
+        self.billing_system.order_buffer.flush()
+        self.assertEqual([order_id for batch in self.connection.inserts for order_id in batch], [orders[0]["id"]])
+
+    def test_orders_are_written_in_batches(self):
+        orders = [self.billing_system.create_order(5, "INR", "User1") for _ in range(3)]
+        self.billing_system.order_buffer.flush()
+        written = [order_id for batch in self.connection.inserts for order_id in batch]
+        self.assertEqual(written, [order["id"] for order in orders])
+        self.assertLess(len(self.connection.inserts), 3)
+
+
+def sign(order_id, payment_id, secret="secret"):
+    return hmac.new(secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+
+class TestBatchVerification(FakeRazorpayTestCase):
+    def test_signature_valid(self):
+        self.assertTrue(signature_valid("secret", "order_1", "pay_1", sign("order_1", "pay_1")))
+        self.assertFalse(signature_valid("secret", "order_1", "pay_2", sign("order_1", "pay_1")))
+
+    def test_verified_orders_are_updated_in_one_statement(self):
+        order = self.billing_system.create_order(5, "INR", "User1")
+        payments = [(order["id"], "pay_1", sign(order["id"], "pay_1")), ("order_x", "pay_2", "forged"),
+                    ("order_unknown", "pay_3", sign("order_unknown", "pay_3"))]
+        results = self.billing_system.verify_payments(payments)
+        self.assertEqual([(result["verified"], result["updated"]) for result in results],
+                         [(True, True), (False, False), (True, False)])
+        self.assertEqual(self.connection.updates, [["Success", order["id"], "order_unknown"]])
+
+    def test_verify_payment_async(self):
+        order = self.billing_system.create_order(5, "INR", "User1")
+        verified = asyncio.run(self.billing_system.verify_payment_async(order["id"], "pay_1", sign(order["id"], "pay_1")))
+        forged = asyncio.run(self.billing_system.verify_payment_async(order["id"], "pay_1", "forged"))
+        self.assertEqual((verified, forged), (True, False))
+        self.assertEqual(self.connection.inserts, [[order["id"]]])
+        self.assertEqual(self.connection.updates, [("Success", order["id"])])
+
+    def test_large_batches_are_verified_in_worker_processes(self):
+        payments = [(f"order_{i}", f"pay_{i}", sign(f"order_{i}", f"pay_{i}") if i % 3 else "forged")
+                    for i in range(60)]
+        with mock.patch.object(billing_system, "PARALLEL_VERIFY_THRESHOLD", 10):
+            results = self.billing_system.verify_payments(payments)
+        self.assertIsNotNone(self.billing_system._verifier)
+        self.assertEqual([result["verified"] for result in results], [bool(i % 3) for i in range(60)])
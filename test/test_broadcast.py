@@ -0,0 +1,101 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from broadcast import Broadcaster, EventLog, format_sse, sse_stream
+
+
+async def drain(subscription):
+    events = []
+    while (event := await subscription.get()) is not None:
+        events.append(event)
+    return events
+
+
+class TestBroadcaster(unittest.TestCase):
+    def test_every_subscriber_gets_every_event(self):
+        async def run():
+            broadcaster = Broadcaster()
+            subscriptions = [broadcaster.subscribe() for _ in range(3)]
+            for number in range(5):
+                broadcaster.publish({"type": "tick", "number": number})
+            broadcaster.close()
+            return await asyncio.gather(*(drain(subscription) for subscription in subscriptions))
+
+        for events in asyncio.run(run()):
+            self.assertEqual([event["number"] for event in events], list(range(5)))
+
+    def test_lagging_subscriber_is_sent_a_snapshot(self):
+        async def run():
+            state = {"count": 0}
+            broadcaster = Broadcaster(queue_size=4, snapshot=lambda: {"type": "snapshot", "count": state["count"]})
+            fast, slow = broadcaster.subscribe(), broadcaster.subscribe()
+            fast_events = []
+            for number in range(1, 11):
+                state["count"] = number
+                broadcaster.publish({"type": "delta", "count": number})
+                fast_events.append(await fast.get())
+            broadcaster.close()
+            return fast_events, await drain(slow), slow.dropped
+
+        fast_events, slow_events, dropped = asyncio.run(run())
+        self.assertEqual(fast_events[0], {"type": "snapshot", "count": 0})
+        # Each time its queue filled up, the backlog was replaced by the state at that point
+        self.assertEqual(slow_events, [{"type": "snapshot", "count": 8}, {"type": "delta", "count": 9},
+                                       {"type": "delta", "count": 10}])
+        self.assertEqual(dropped, 2)
+
+    def test_late_subscriber_gets_the_latest_event(self):
+        async def run():
+            broadcaster = Broadcaster()
+            broadcaster.publish({"type": "progress", "done": 1})
+            broadcaster.publish({"type": "result", "done": 2})
+            broadcaster.close()
+            return await drain(broadcaster.subscribe())
+
+        self.assertEqual(asyncio.run(run()), [{"type": "result", "done": 2}])
+
+    def test_sse_stream(self):
+        async def run():
+            broadcaster = Broadcaster()
+            closed = []
+            subscription = broadcaster.subscribe(on_close=closed.append)
+            stream = sse_stream(subscription, heartbeat=0.05)
+            heartbeat = await stream.__anext__()
+            broadcaster.publish({"type": "delta", "statuses": {"ams-ix": "up"}})
+            event = await stream.__anext__()
+            await stream.aclose()  # Client disconnected
+            return heartbeat, event, closed, len(broadcaster)
+
+        heartbeat, event, closed, subscribers = asyncio.run(run())
+        self.assertEqual(heartbeat, b": keep-alive\n\n")
+        self.assertEqual(event, format_sse({"type": "delta", "statuses": {"ams-ix": "up"}}))
+        self.assertTrue(event.startswith(b"event: delta\ndata: "))
+        self.assertEqual(json.loads(event.split(b"data: ")[1]), {"type": "delta", "statuses": {"ams-ix": "up"}})
+        self.assertEqual((len(closed), subscribers), (1, 0))
+
+
+class TestEventLog(unittest.TestCase):
+    def test_other_processes_follow_the_log(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        log = EventLog(os.path.join(directory.name, "run.jsonl"))
+        log.append({"type": "progress", "done": 1})
+        log.append({"type": "progress", "done": 2})
+
+        async def run():
+            subscription = log.subscribe(last=lambda event: event["type"] == "result", poll_interval=0.01)
+            first = await subscription.get()
+            log.append({"type": "progress", "done": 3})
+            log.append({"type": "result", "done": "x" * 100000})
+            return [first] + await drain(subscription)
+
+        events = asyncio.run(run())
+        self.assertEqual([event["done"] for event in events], [2, 3, "x" * 100000])
+        self.assertEqual(log.latest(), {"type": "result", "done": "x" * 100000})
+        self.assertIsNone(EventLog(os.path.join(directory.name, "missing.jsonl")).latest())
+
+
+if __name__ == "__main__":
+    unittest.main()
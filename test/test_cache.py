@@ -0,0 +1,39 @@
+import unittest
+from cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=10, stale_ttl=5, clock=self.clock)
+
+    def test_entries_expire(self):
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.clock.now = 12
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get_stale("a"), (1, False))
+        self.clock.now = 15
+        self.assertIsNone(self.cache.get_stale("a"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertNotIn("b", self.cache)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import threading
+import time
+import unittest
+from bgp_config import diff_commands
+from bgp_simulator import BGP_CONFIG_COMMANDS, update_bgp_configuration
+from config_push import ConfigPusher
+
+# 'show running-config | section router bgp' on an IOS-XE router with more peers than the intent covers
+IOS_XE_RUNNING_CONFIG = """router bgp 65000
+ bgp router-id 10.0.0.1
+ bgp log-neighbor-changes
+ no bgp default ipv4-unicast
+ neighbor 10.0.0.9 remote-as 65010
+ neighbor 10.0.0.9 description transit
+ neighbor 192.168.2.1 remote-as 65001
+ !
+ address-family ipv4
+  network 192.168.0.0 mask 255.255.255.0
+  neighbor 10.0.0.9 activate
+  neighbor 10.0.0.9 route-map TRANSIT-IN in
+  neighbor 192.168.2.1 activate
+ exit-address-family
+"""
+
+
+class FakeConnection:
+    """Stands in for a netmiko connection to a router CLI."""
+
+    connects = 0
+    lock = threading.Lock()
+
+    def __init__(self, host, delay=0.2, **kwargs):
+        with FakeConnection.lock:
+            FakeConnection.connects += 1
+        self.host = host
+        self.delay = delay
+        self.closed = threading.Event()
+        self.running_config = {}
+        self.sent = []
+        self.saves = 0
+
+    def enable(self):
+        pass
+
+    def is_alive(self):
+        return not self.closed.is_set()
+
+    def send_config_set(self, commands):
+        if self.host == "unreachable":
+            raise ConnectionError("Connection refused")
+        if self.closed.wait(self.delay):
+            raise OSError("Socket is closed")
+        self.sent.append(commands)
+        for command in commands:
+            if command.startswith("no "):
+                self.running_config.pop(command[3:], None)
+            elif not command.startswith(("router bgp", "exit")):
+                self.running_config[command] = None
+        return "\n".join(commands)
+
+    def send_command(self, command):
+        lines = "".join(f" {line}\n" for line in self.running_config)
+        return f"router bgp 65000\n{lines}" if lines else ""
+
+    def save_config(self):
+        self.saves += 1
+
+    def disconnect(self):
+        self.closed.set()
+
+
+class TestConfigPusher(unittest.TestCase):
+    def setUp(self):
+        FakeConnection.connects = 0
+        self.pusher = ConfigPusher(max_workers=20, connect=FakeConnection)
+
+    def tearDown(self):
+        self.pusher.close()
+
+    def test_parallel_push_with_session_reuse(self):
+        devices = [{"host": f"10.0.0.{i}"} for i in range(20)]
+        started = time.monotonic()
+        report = update_bgp_configuration(devices, pusher=self.pusher)
+        self.assertLess(time.monotonic() - started, 2.0, "Devices should be configured in parallel")
+        self.assertEqual(report["succeeded"], 20)
+        self.pusher.push(devices, ["router bgp 65000", "exit"])
+        self.assertEqual(FakeConnection.connects, 20, "Sessions should be reused across pushes")
+
+    def test_incremental_push_skips_unchanged_devices(self):
+        devices = [{"host": "10.0.0.1", "delay": 0}]
+        first = update_bgp_configuration(devices, pusher=self.pusher, incremental=True)
+        second = update_bgp_configuration(devices, pusher=self.pusher, incremental=True)
+        self.assertEqual((first["changed"], second["changed"]), (1, 0))
+        changed = ["router bgp 65000", "neighbor 192.168.2.1 remote-as 65002", "exit"]
+        report = update_bgp_configuration(devices, changed, pusher=self.pusher, incremental=True)
+        self.assertEqual(report["devices"]["10.0.0.1:22"]["output"],
+                         "router bgp 65000\nneighbor 192.168.2.1 remote-as 65002\nexit")
+        report = update_bgp_configuration(devices, changed, pusher=self.pusher, incremental=True, replace=True)
+        self.assertIn("no network 192.168.0.0 mask 255.255.255.0", report["devices"]["10.0.0.1:22"]["output"])
+        self.assertNotIn("no neighbor", report["devices"]["10.0.0.1:22"]["output"])
+
+    def test_unchanged_devices_get_no_commands_and_no_save(self):
+        connections = []
+
+        def connect(**device):
+            connection = FakeConnection(**device)
+            connection.running_config = dict.fromkeys(BGP_CONFIG_COMMANDS[1:-1])
+            connections.append(connection)
+            return connection
+
+        with ConfigPusher(connect=connect) as pusher:
+            report = update_bgp_configuration([{"host": "10.0.0.1", "delay": 0}], pusher=pusher)
+        self.assertEqual((report["succeeded"], report["changed"]), (1, 0))
+        self.assertEqual((connections[0].sent, connections[0].saves), ([], 0))
+
+    def test_diff_against_a_real_running_config(self):
+        self.assertEqual(diff_commands(IOS_XE_RUNNING_CONFIG, BGP_CONFIG_COMMANDS), [])
+        intent = ["router bgp 65000", "neighbor 192.168.2.1 remote-as 65001",
+                  "neighbor 192.168.2.1 route-map PEER-IN in", "no neighbor 10.0.0.9", "no neighbor 10.0.0.10", "exit"]
+        self.assertEqual(diff_commands(IOS_XE_RUNNING_CONFIG, intent),
+                         ["router bgp 65000", "no neighbor 10.0.0.9", "address-family ipv4",
+                          "neighbor 192.168.2.1 route-map PEER-IN in", "exit-address-family", "exit"])
+        self.assertEqual(diff_commands(IOS_XE_RUNNING_CONFIG, BGP_CONFIG_COMMANDS, replace=True),
+                         ["router bgp 65000", "no neighbor 10.0.0.9", "no bgp router-id 10.0.0.1",
+                          "bgp default ipv4-unicast", "exit"])
+
+    def test_failures_and_timeouts_are_reported(self):
+        devices = [{"host": "10.0.0.1"}, {"host": "unreachable"}, {"host": "slow", "delay": 5, "push_timeout": 0.3}]
+        report = self.pusher.push(devices, ["router bgp 65000"])
+        self.assertEqual(report["succeeded"], 1)
+        self.assertEqual(sorted(report["failed"]), ["slow:22", "unreachable:22"])
+        self.assertIn("Timed out", report["devices"]["slow:22"]["error"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+import threading
+import unittest
+from db_pool import ConnectionPool, PoolTimeout, get_pool
+
+
+def connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class TestConnectionPool(unittest.TestCase):
+    def test_connections_are_reused(self):
+        pool = ConnectionPool(connect, min_size=1, max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["checkouts"], 2)
+
+    def test_checkout_waits_for_a_free_connection(self):
+        pool = ConnectionPool(connect, min_size=0, max_size=1)
+        held = pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(timeout=0.05)
+        threading.Timer(0.05, pool.putconn, (held,)).start()
+        self.assertIs(pool.getconn(timeout=1), held)
+        self.assertEqual(pool.stats()["timeouts"], 1)
+
+    def test_unhealthy_connection_is_replaced(self):
+        pool = ConnectionPool(connect, min_size=1, max_size=1, check_after=0)
+        with pool.connection() as conn:
+            pass
+        conn.close()  # Simulates the server dropping an idle connection
+        with pool.connection() as replacement:
+            replacement.execute("SELECT 1")
+        self.assertIsNot(conn, replacement)
+        self.assertEqual(pool.stats()["health_failures"], 1)
+
+    def test_idle_connections_are_reaped_down_to_min_size(self):
+        pool = ConnectionPool(connect, min_size=1, max_size=4, max_idle=0)
+        connections = [pool.getconn() for _ in range(3)]
+        for conn in connections:
+            pool.putconn(conn)
+        self.assertEqual(pool.stats()["size"], 1)
+        self.assertEqual(pool.stats()["reaped"], 2)
+
+    def test_uncommitted_work_is_rolled_back(self):
+        pool = ConnectionPool(connect, min_size=1, max_size=1)
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.commit()
+        with self.assertRaises(RuntimeError):
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO t VALUES (1)")
+                raise RuntimeError
+        with pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM t").fetchone(), (0,))
+
+    def test_shared_pools_connect_on_first_checkout(self):
+        opened = []
+
+        def counting_connect():
+            opened.append(1)
+            return connect()
+
+        pool = get_pool(("sqlite", "test_shared_pools_connect_on_first_checkout"), counting_connect, min_size=2)
+        self.assertEqual(opened, [])
+        with pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT 1").fetchone(), (1,))
+        self.assertEqual(len(opened), 1)
+        pool.close()
+
+    def test_run_async_uses_at_most_max_size_threads(self):
+        pool = ConnectionPool(connect, min_size=0, max_size=2)
+        threads = set()
+
+        def query(conn, number):
+            threads.add(threading.current_thread().name)
+            return conn.execute("SELECT ?", (number,)).fetchone()[0]
+
+        async def run():
+            return await asyncio.gather(*(pool.run_async(query, number) for number in range(50)))
+
+        self.assertEqual(asyncio.run(run()), list(range(50)))
+        self.assertLessEqual(len(threads), 2)
+        self.assertLessEqual(pool.stats()["created"], 2)
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
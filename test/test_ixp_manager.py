@@ -1,9 +1,56 @@
+import asyncio
+import collections
+import json
+import threading
+import time
 import unittest
-from ixp_manager import IXPManager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from ixp_manager import IXPManager, IXPStatusFeed
+
+
+class StubIXPHandler(BaseHTTPRequestHandler):
+    """Serves /<ixp>/status; IXPs named 'slow-<ms>' answer after that many milliseconds."""
+
+    protocol_version = "HTTP/1.1"
+    requests = collections.Counter()
+    statuses = {}  # IXP -> status reported instead of 'up'
+
+    def do_GET(self):
+        ixp = self.path.strip("/").split("/")[0]
+        self.requests[ixp] += 1
+        if ixp.startswith("slow-"):
+            time.sleep(int(ixp.split("-")[1]) / 1000)
+        if ixp == "broken":
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({"status": self.statuses.get(ixp, "up")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
 
 class TestIXPManager(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubIXPHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
     def setUp(self):
-        self.ixp_manager = IXPManager()
+        self.ixp_manager = IXPManager(base_url=self.base_url)
 
     def test_access_ixp(self):
         result = self.ixp_manager.access_ixp("network1")
@@ -13,3 +60,100 @@ class TestIXPManager(unittest.TestCase):
         self.ixp_manager.access_ixp("network1")
         with self.assertRaises(Exception, msg="Duplicate access should raise an exception"):
             self.ixp_manager.access_ixp("network1")
+
+    def test_monitor_ixps_concurrently(self):
+        ixp_list = [f"slow-300-{i}" for i in range(8)] + ["broken"]
+        started = time.monotonic()
+        statuses = self.ixp_manager.monitor_ixps(ixp_list)
+        self.assertLess(time.monotonic() - started, 1.5, "IXPs should be polled in parallel")
+        self.assertEqual(statuses, {f"slow-300-{i}": "up" for i in range(8)})
+
+    def test_monitor_ixps_returns_partial_results_at_deadline(self):
+        statuses = self.ixp_manager.monitor_ixps(["fast", "slow-2000"], deadline=0.5)
+        self.assertEqual(statuses, {"fast": "up"})
+
+    def test_get_status_serves_from_cache(self):
+        self.assertEqual(self.ixp_manager.get_status(["cached-1"]), {"cached-1": "up"})
+        self.assertEqual(self.ixp_manager.get_status(["cached-1"]), {"cached-1": "up"})
+        self.assertEqual(StubIXPHandler.requests["cached-1"], 1)
+
+    def test_concurrent_fetches_are_deduplicated(self):
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.ixp_manager.get_status(["slow-200-shared"])))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{"slow-200-shared": "up"}] * 5)
+        self.assertEqual(StubIXPHandler.requests["slow-200-shared"], 1)
+
+    def test_stale_status_is_served_while_refreshing(self):
+        manager = IXPManager(base_url=self.base_url, cache_ttl=0.05, stale_ttl=10)
+        manager.get_status(["slow-300-stale"])
+        time.sleep(0.1)
+        started = time.monotonic()
+        self.assertEqual(manager.get_status(["slow-300-stale"]), {"slow-300-stale": "up"})
+        self.assertLess(time.monotonic() - started, 0.2, "Stale status should not wait for the refresh")
+        manager.refresh_status("slow-300-stale").result()
+        self.assertEqual(StubIXPHandler.requests["slow-300-stale"], 2)
+
+    def test_get_status_async(self):
+        async def poll():
+            try:
+                statuses = await asyncio.gather(*(self.ixp_manager.get_status_async(["slow-200-async", "broken"])
+                                                  for _ in range(20)))
+                cached = await self.ixp_manager.get_status_async(["slow-200-async"])
+                partial = await self.ixp_manager.get_status_async(["fast-async", "slow-2000-async"], deadline=0.5)
+                return statuses, cached, partial
+            finally:
+                await self.ixp_manager.close_async()
+
+        started = time.monotonic()
+        statuses, cached, partial = asyncio.run(poll())
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(statuses, [{"slow-200-async": "up"}] * 20)
+        self.assertEqual(cached, {"slow-200-async": "up"})
+        self.assertEqual(partial, {"fast-async": "up"})
+        self.assertEqual(StubIXPHandler.requests["slow-200-async"], 1)
+        self.assertEqual(self.ixp_manager.get_status(["slow-200-async"]), {"slow-200-async": "up"})
+
+    def test_status_feed_polls_once_for_all_subscribers(self):
+        async def watch():
+            feed = IXPStatusFeed(self.ixp_manager, interval=0.2)
+            subscriptions = [feed.subscribe(["feed-a", "feed-b"]) for _ in range(50)]
+            only_b = feed.subscribe(["feed-b"])
+            try:
+                events = [[await subscription.get() for _ in range(2)] for subscription in subscriptions]
+                StubIXPHandler.statuses["feed-a"] = "down"
+                change = await subscriptions[0].get()
+                b_events = [await only_b.get() for _ in range(2)]
+                return events, change, b_events, feed
+            finally:
+                for subscription in subscriptions + [only_b]:
+                    subscription.close()
+                await self.ixp_manager.close_async()
+
+        events, change, b_events, feed = asyncio.run(watch())
+        # A snapshot first, then the statuses polled straight away rather than after an interval
+        for subscriber in events:
+            self.assertEqual([(event["type"], event["statuses"]) for event in subscriber],
+                             [("snapshot", {}), ("delta", {"feed-a": "up", "feed-b": "up"})])
+        self.assertEqual((change["type"], change["statuses"]), ("delta", {"feed-a": "down"}))
+        self.assertEqual([event["statuses"] for event in b_events], [{}, {"feed-b": "up"}])
+        # 51 subscribers, one request per poll
+        self.assertEqual(StubIXPHandler.requests["feed-a"], 2)
+        self.assertEqual(feed._watched, {})
+
+    def test_access_waits_for_a_free_port(self):
+        self.ixp_manager.register_ixp("ams-ix", ports=1)
+        self.assertTrue(self.ixp_manager.access_ixp("network1"))
+        self.assertFalse(self.ixp_manager.access_ixp("network2"))
+        self.assertEqual(self.ixp_manager.release_ixp("network1"), [("network2", "ams-ix")])
+
+    def test_prioritize_access_by_load(self):
+        for ixp, load in (("de-cix", 0.7), ("ams-ix", 0.2), ("linx", 0.4)):
+            self.ixp_manager.register_ixp(ixp, ports=10, load=load)
+        self.ixp_manager.update_ixp_load("ams-ix", load=0.9)
+        self.assertEqual(self.ixp_manager.prioritize_access(["ams-ix", "unknown", "linx", "de-cix"]),
+                         ["linx", "de-cix", "ams-ix", "unknown"])
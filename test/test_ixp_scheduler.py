@@ -0,0 +1,59 @@
+import random
+import unittest
+from ixp_scheduler import IndexedHeap, IXPScheduler
+
+
+class TestIndexedHeap(unittest.TestCase):
+    def test_matches_sorted_order_after_updates(self):
+        rng = random.Random(1)
+        heap = IndexedHeap()
+        keys = {}
+        for _ in range(500):
+            item = rng.randrange(50)
+            if item in keys and rng.random() < 0.3:
+                heap.remove(item)
+                del keys[item]
+            else:
+                keys[item] = rng.random()
+                heap.push(item, keys[item])
+        popped = [heap.pop() for _ in range(len(heap))]
+        self.assertEqual(popped, sorted(keys.items(), key=lambda entry: entry[1]))
+
+
+class TestIXPScheduler(unittest.TestCase):
+    def test_weighted_fair_queueing(self):
+        scheduler = IXPScheduler()
+        scheduler.register_ixp("ams-ix", ports=1)
+        scheduler.request("holder")
+        # Network 'heavy' has twice the weight, so its requests finish earlier in virtual time
+        for i in range(2):
+            scheduler.request(f"light-{i}", weight=1.0)
+            scheduler.request(f"heavy-{i}", weight=2.0)
+        order = []
+        holder = "holder"
+        while scheduler.pending():
+            (holder, _), = scheduler.release(holder)
+            order.append(holder)
+        self.assertEqual(order, ["heavy-0", "heavy-1", "light-0", "light-1"])
+
+    def test_unavailable_ixp_is_skipped(self):
+        scheduler = IXPScheduler()
+        scheduler.register_ixp("ams-ix", ports=5)
+        scheduler.register_ixp("linx", ports=5, load=0.5)
+        scheduler.update("ams-ix", available=False)
+        self.assertEqual(scheduler.request("network1"), [("network1", "linx")])
+
+    def test_waiting_and_unknown_networks_can_be_released(self):
+        scheduler = IXPScheduler()
+        scheduler.register_ixp("ams-ix", ports=1)
+        scheduler.request("holder")
+        scheduler.request("gave-up")
+        scheduler.request("waiting")
+        self.assertEqual(scheduler.release("gave-up"), [])
+        self.assertEqual(scheduler.release("never-requested"), [])
+        self.assertEqual(scheduler.pending(), 1)
+        self.assertEqual(scheduler.release("holder"), [("waiting", "ams-ix")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import tempfile
+import threading
+import time
+import unittest
+from job_executor import Job, JobExecutor
+
+
+class Clock:
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def settle(executor):
+    """Waits for the runs submitted so far to finish."""
+    while any(job.running for job in executor.jobs.values()):
+        time.sleep(0.001)
+
+
+class TestJobExecutor(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.clock = Clock()
+
+    def executor(self):
+        executor = JobExecutor(self.directory, max_workers=2, clock=self.clock)
+        self.addCleanup(executor.stop)
+        return executor
+
+    def test_slow_job_does_not_delay_others(self):
+        executor = self.executor()
+        release = threading.Event()
+        ran = threading.Event()
+        executor.add(Job("slow", lambda: release.wait(5), interval=60))
+        executor.add(Job("fast", ran.set, interval=60))
+        self.assertAlmostEqual(executor.run_pending(), 60)
+        self.clock.now += 60
+        executor.run_pending()
+        self.assertTrue(ran.wait(5))
+        self.assertEqual(executor.jobs["slow"].running, 1)
+        self.clock.now += 60
+        executor.run_pending()  # The slow job is still running, so this run is skipped
+        release.set()
+        executor.stop()
+        self.assertEqual(executor.jobs["slow"].running, 0)
+
+    def test_each_run_happens_in_one_process(self):
+        runs = []
+        executors = [self.executor(), self.executor()]
+        for executor in executors:
+            executor.add(Job("insert", lambda: runs.append(1), interval=900, jitter=5))
+        for _ in range(3):
+            self.clock.now += 905
+            for executor in executors:
+                executor.run_pending()
+                settle(executor)
+        self.assertEqual(len(runs), 3)
+
+    def test_missed_run_is_caught_up_once(self):
+        runs = []
+        executor = self.executor()
+        executor.store.record("cleanup", self.clock.now - 3 * 86400)
+        executor.add(Job("cleanup", lambda: runs.append(1), at="00:00"))
+        executor.run_pending()
+        executor.stop()
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(executor.store.get("cleanup"), self.clock.now)
+        self.assertGreater(executor.jobs["cleanup"].next_run, self.clock.now)
+
+    def test_daily_jobs_run_at_the_given_time(self):
+        job = Job("cleanup", None, at="00:00")
+        following = job.following(self.clock.now)
+        self.assertLess(0, following - self.clock.now)
+        self.assertLessEqual(following - self.clock.now, 86400)
+        self.assertEqual(job.following(following), following + 86400)
+        with self.assertRaises(ValueError):
+            Job("cleanup", None, at="24:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
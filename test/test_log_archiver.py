@@ -0,0 +1,94 @@
+import os
+import tarfile
+import tempfile
+import time
+import unittest
+from unittest import mock
+from log_archiver import CleanupOperations, archive_bundle, iter_old_files
+
+
+class TestCleanupOperations(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.logs = os.path.join(directory.name, "logs")
+        self.archive = os.path.join(directory.name, "archive")
+        os.makedirs(self.logs)
+        old = time.time() - 40 * 86400
+        for i in range(30):
+            path = os.path.join(self.logs, f"app-{i:02d}.log")
+            with open(path, "w") as file:
+                file.write(f"line {i}\n" * 100)
+            if i < 25:
+                os.utime(path, (old, old))
+        os.symlink(os.path.join(self.logs, "app-00.log"), os.path.join(self.logs, "latest.log"))
+
+    def test_iter_old_files_skips_recent_files_and_links(self):
+        names = {name for name, _, _ in iter_old_files(self.logs, time.time() - 30 * 86400)}
+        self.assertEqual(names, {f"app-{i:02d}.log" for i in range(25)})
+
+    def test_old_logs_are_bundled_and_indexed(self):
+        cleanup = CleanupOperations(self.logs, self.archive, max_bundle_bytes=4000, workers=2)
+        summary = cleanup.perform_cleanup()
+        self.assertEqual(summary["files"], 25)
+        self.assertEqual(summary["bytes"], 10 * 700 + 15 * 800)
+        self.assertEqual(summary["bundles"], 5)  # At most 4,000 bytes of logs each
+        self.assertEqual(sorted(os.listdir(self.logs))[:2], ["app-25.log", "app-26.log"])
+        self.assertEqual(len(os.listdir(self.logs)), 6)
+
+        entries = cleanup.locate("app-07.log")
+        self.assertEqual(len(entries), 1)
+        with tarfile.open(os.path.join(self.archive, entries[0]["bundle"])) as bundle:
+            self.assertIn("app-07.log", bundle.getnames())
+        restored = cleanup.extract("app-07.log", os.path.join(self.archive, "restored"))
+        with open(restored) as file:
+            self.assertEqual(file.read(), "line 7\n" * 100)
+
+    def test_oldest_bundles_are_pruned_past_the_budget(self):
+        cleanup = CleanupOperations(self.logs, self.archive, max_bundle_bytes=4000, workers=1)
+        cleanup.perform_cleanup()
+        bundles = sorted(name for name in os.listdir(self.archive) if name.endswith(".tar.gz"))
+        budget = sum(os.path.getsize(os.path.join(self.archive, name)) for name in bundles[-3:])
+        with tarfile.open(os.path.join(self.archive, bundles[0])) as bundle:
+            pruned = bundle.getnames()[0]
+        with tarfile.open(os.path.join(self.archive, bundles[-1])) as bundle:
+            kept = bundle.getnames()[0]
+        self.assertEqual(cleanup.prune(budget), len(bundles) - 3)
+        self.assertEqual(cleanup.locate(pruned), [])
+        self.assertEqual(len(cleanup.locate(kept)), 1)
+
+    def test_unreadable_logs_are_skipped(self):
+        unreadable = os.path.join(self.logs, "app-01.log")
+        stat = os.stat
+
+        def failing_stat(path, *args, **kwargs):
+            if path == unreadable:
+                raise PermissionError(13, "Permission denied", path)
+            return stat(path, *args, **kwargs)
+
+        bundle = os.path.join(self.logs, "bundle.tar.gz")
+        with mock.patch("os.stat", failing_stat):
+            archived = archive_bundle(self.logs, bundle, ["app-00.log", "app-01.log", "app-02.log"])
+        self.assertEqual([name for name, _, _ in archived], ["app-00.log", "app-02.log"])
+        self.assertTrue(os.path.exists(unreadable))
+        with tarfile.open(bundle) as archive:
+            self.assertEqual(archive.getnames(), ["app-00.log", "app-02.log"])
+
+    def test_completed_bundles_are_indexed_when_one_fails(self):
+        os.makedirs(self.archive)
+        # The second bundle cannot be written
+        os.makedirs(os.path.join(self.archive, "logs-20260101T000000-00001.tar.gz.tmp"))
+        cleanup = CleanupOperations(self.logs, self.archive, max_bundle_bytes=4000, workers=2)
+        threshold = time.time() - 30 * 86400
+        with mock.patch("time.strftime", return_value="20260101T000000"):
+            summary = cleanup.archive(sorted(iter_old_files(self.logs, threshold)))
+        self.assertEqual((summary["bundles"], summary["bundles_failed"]), (4, 1))
+        self.assertEqual(summary["files"], 20)
+        self.assertEqual(len(cleanup.locate("app-00.log")), 1)
+        self.assertEqual(cleanup.locate("app-05.log"), [])
+        self.assertTrue(os.path.exists(os.path.join(self.logs, "app-05.log")))
+        self.assertEqual(len(os.listdir(self.logs)), 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+import httpx
+import main_asgi
+from bgp_simulator import SAMPLE_NETWORK
+
+
+class TestSimulationRuns(unittest.TestCase):
+    def test_runs_are_visible_to_every_worker(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main_asgi.app),
+                                         base_url="http://test") as client:
+                started = await client.post("/simulate_bgp/runs", json={"network_data": SAMPLE_NETWORK})
+                run_id = started.json()["run_id"]
+                await main_asgi.simulation_runs.get(run_id)[1]
+                main_asgi.simulation_runs.clear()  # As seen from a worker that did not start the run
+                status = await client.get(f"/simulate_bgp/runs/{run_id}")
+                events = await client.get(started.json()["events"])
+                missing = await client.get("/simulate_bgp/runs/../../etc/passwd")
+            return started, status, events, missing
+
+        # The path outside the run ids falls through to the Flask app, which would start the background work
+        with mock.patch("main_asgi.SIMULATION_RUNS_DIRECTORY", directory.name), \
+                mock.patch("main.get_network_data_buffer"), mock.patch("main.get_job_executor"):
+            started, status, events, missing = asyncio.run(run())
+        self.assertEqual(started.status_code, 202)
+        self.assertEqual(status.json()["type"], "result")
+        self.assertTrue(events.text.startswith("event: result\n"))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_malformed_network_data_is_a_bad_request(self):
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main_asgi.app),
+                                         base_url="http://test") as client:
+                return [await client.post("/simulate_bgp", json={"network_data": network_data})
+                        for network_data in ([1, 2], {"speakers": 5})]
+
+        for response in asyncio.run(run()):
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("error", response.json())
+
+
+if __name__ == "__main__":
+    unittest.main()
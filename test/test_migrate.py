@@ -0,0 +1,64 @@
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from migrate import MigrationError, MigrationRunner, iter_statements
+
+
+class TestStatementSplitter(unittest.TestCase):
+    def test_semicolons_in_quotes_and_comments_are_ignored(self):
+        sql = io.StringIO(
+            "-- leading comment; not a statement\n"
+            "INSERT INTO t VALUES ('a;b', 'it''s', \"c;d\");\n"
+            "/* block; comment */ UPDATE t\n"
+            "SET x = 1; CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql;\n"
+            "SELECT 2"
+        )
+        self.assertEqual(list(iter_statements(sql)), [
+            "INSERT INTO t VALUES ('a;b', 'it''s', \"c;d\")",
+            "UPDATE t\nSET x = 1",
+            "CREATE FUNCTION f() RETURNS int AS $body$ SELECT 1; $body$ LANGUAGE sql",
+            "SELECT 2",
+        ])
+
+    def test_unterminated_quote_is_an_error(self):
+        with self.assertRaises(MigrationError):
+            list(iter_statements(["SELECT 'open;"]))
+
+
+class TestMigrationRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.connection = sqlite3.connect(":memory:")
+        self.runner = MigrationRunner(self.connection, self.directory.name, dialect="sqlite")
+
+    def tearDown(self):
+        self.connection.close()
+        self.directory.cleanup()
+
+    def write(self, name, sql):
+        with open(os.path.join(self.directory.name, name), "w") as file:
+            file.write(sql)
+
+    def tables(self):
+        rows = self.connection.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'index')")
+        return {name for name, in rows}
+
+    def test_migrations_are_applied_once_in_order(self):
+        self.write("0002_index.sql", "CREATE INDEX idx_t_name ON t (name);")
+        self.write("0001_table.sql", "CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT);")
+        self.assertEqual(self.runner.run(), ["0001", "0002"])
+        self.assertEqual(self.runner.run(), [])
+        self.assertTrue({"t", "idx_t_name", "schema_migrations"} <= self.tables())
+
+    def test_failed_migration_is_rolled_back(self):
+        self.write("0001_broken.sql", "CREATE TABLE t (id INTEGER);\nINSERT INTO missing VALUES (1);")
+        with self.assertRaises(MigrationError):
+            self.runner.run()
+        self.assertNotIn("t", self.tables())
+        self.assertEqual([migration.version for migration in self.runner.pending()], ["0001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
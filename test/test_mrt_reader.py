@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import os
+import struct
+import tempfile
+import unittest
+from bgp_simulator import BGPSimulator
+from mrt_reader import MRTFormatError, iter_routes
+
+
+def mrt_record(kind, subtype, body, timestamp=1700000000):
+    return struct.pack("!IHHI", timestamp, kind, subtype, len(body)) + body
+
+
+def attribute(code, value):
+    return struct.pack("!BBB", 0x40, code, len(value)) + value
+
+
+def as_path(asns, as_size=4):
+    return bytes([2, len(asns)]) + struct.pack("!%d%s" % (len(asns), "I" if as_size == 4 else "H"), *asns)
+
+
+def table_dump():
+    """A TABLE_DUMP_V2 dump with two peers and one IPv4 prefix."""
+    peers = struct.pack("!IH", 0, 0) + struct.pack("!H", 2)
+    peers += bytes([2]) + bytes(4) + bytes([192, 0, 2, 1]) + struct.pack("!I", 64500)
+    peers += bytes([2]) + bytes(4) + bytes([192, 0, 2, 2]) + struct.pack("!I", 64501)
+    attrs_1 = attribute(1, b"\x00") + attribute(2, as_path([64500, 64496]))
+    attrs_2 = attribute(1, b"\x00") + attribute(2, as_path([64501, 64497, 64496]))
+    rib = struct.pack("!I", 0) + bytes([24, 10, 1, 2]) + struct.pack("!H", 2)
+    rib += struct.pack("!HIH", 0, 0, len(attrs_1)) + attrs_1
+    rib += struct.pack("!HIH", 1, 0, len(attrs_2)) + attrs_2
+    return mrt_record(13, 1, peers) + mrt_record(13, 2, rib)
+
+
+def bgp4mp_withdrawal():
+    """A BGP4MP_MESSAGE_AS4 UPDATE from 192.0.2.1 withdrawing 10.1.2.0/24."""
+    update = struct.pack("!H", 4) + bytes([24, 10, 1, 2]) + struct.pack("!H", 0)
+    message = b"\xff" * 16 + struct.pack("!HB", 19 + len(update), 2) + update
+    header = struct.pack("!IIHH", 64500, 64510, 0, 1) + bytes([192, 0, 2, 1, 192, 0, 2, 254])
+    return mrt_record(16, 4, header + message)
+
+
+class TestMRTReader(unittest.TestCase):
+    def test_table_dump_routes(self):
+        routes = list(iter_routes(table_dump()))
+        self.assertEqual(len(routes), 2)
+        self.assertEqual(routes[0].peer_ip, "192.0.2.1")
+        self.assertEqual(routes[0].as_path, (64500, 64496))
+        self.assertEqual(routes[1].peer_as, 64501)
+
+    def test_gzip_file_into_simulator_rib(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rib.mrt.gz")
+            with gzip.open(path, "wb") as file:
+                file.write(table_dump() + bgp4mp_withdrawal())
+            simulator = BGPSimulator()
+            stats = simulator.load_mrt(path)
+        self.assertEqual((stats["routes"], stats["withdrawals"], stats["errors"]), (2, 1, 0))
+        prefix, entry = simulator.collector_rib.longest_match("10.1.2.3")
+        self.assertEqual(prefix, "10.1.2.0/24")
+        self.assertEqual(entry.paths, {"192.0.2.2": (64501, 64497, 64496)})
+
+    def test_truncated_dump_is_reported(self):
+        stats = BGPSimulator().handle_large_data(table_dump()[:-5])
+        self.assertEqual(stats["errors"], 1)
+
+    def test_truncated_and_corrupt_compressed_files_are_reported(self):
+        dump = (table_dump() + bgp4mp_withdrawal()) * 50
+        compressed = {"truncated.gz": gzip.compress(dump)[:-40], "truncated.bz2": bz2.compress(dump)[:-40]}
+        corrupt = bytearray(gzip.compress(dump))
+        corrupt[len(corrupt) // 2] ^= 0xFF
+        compressed["corrupt.gz"] = bytes(corrupt)
+        with tempfile.TemporaryDirectory() as directory:
+            for name, data in compressed.items():
+                path = os.path.join(directory, name)
+                with open(path, "wb") as file:
+                    file.write(data)
+                with self.assertRaises(MRTFormatError, msg=name):
+                    list(iter_routes(path))
+                self.assertEqual(BGPSimulator().load_mrt(path)["errors"], 1, name)
+
+if __name__ == "__main__":
+    unittest.main()
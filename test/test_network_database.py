@@ -1,5 +1,6 @@
 import unittest
-from network_database import NetworkDatabase
+from db_pool import ConnectionPool
+from network_database import NetworkDatabase, copy_text
 
 class TestNetworkDatabase(unittest.TestCase):
     def setUp(self):
@@ -32,5 +33,113 @@ class TestNetworkDatabase(unittest.TestCase):
         updated_data = self.db.retrieve_data("network1")
         self.assertEqual(updated_data["status"], "inactive", "Network status should be updated")
 
+class RecordingConnection:
+    """Connection stand-in that records the statements sent to it."""
+
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self, **options):
+        return self
+
+    def executemany(self, query, rows):
+        self.calls.append(("executemany", len(rows)))
+
+    def copy_expert(self, query, file):
+        self.calls.append(("copy", file.read().count("\n")))
+
+    def commit(self):
+        self.calls.append(("commit",))
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestBulkInsert(unittest.TestCase):
+    def setUp(self):
+        self.connection = RecordingConnection()
+        self.pool = ConnectionPool(lambda: self.connection, min_size=0, max_size=1)
+
+    def test_mysql_batches_use_executemany(self):
+        db = NetworkDatabase(db_type="mysql", pool=self.pool)
+        records = ({"network_name": f"network{i}", "bandwidth": "1Gbps"} for i in range(5))
+        self.assertEqual(db.add_many(records, batch_size=2), 5)
+        self.assertEqual(self.connection.calls, [("executemany", 2), ("commit",), ("executemany", 2), ("commit",),
+                                                 ("executemany", 1), ("commit",)])
+
+    def test_postgresql_batches_use_copy(self):
+        db = NetworkDatabase(db_type="postgresql", pool=self.pool)
+        records = [{"network_name": f"network{i}", "network_ip": "10.0.0.1", "network_details": "x"} for i in range(3)]
+        self.assertEqual(db.add_many(records, batch_size=10), 3)
+        self.assertEqual(self.connection.calls, [("copy", 3), ("commit",)])
+
+    def test_copy_text_escapes_special_characters(self):
+        self.assertEqual(copy_text([("a\tb", None, "c\\d\n")]), "a\\tb\t\\N\tc\\\\d\\n\n")
+
+
+class TableConnection(RecordingConnection):
+    """Connection stand-in serving rows of a network_data table as tuples, like psycopg2."""
+
+    description = [("network_name",), ("network_status",)]
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+        self.result = []
+
+    def execute(self, query, params):
+        self.calls.append(("execute", query.split()[0], len(params)))
+        if query.startswith("UPDATE"):
+            status, name = params
+            self.rows[name] = (name, status)
+        else:
+            self.result = [self.rows[name] for name in params if name in self.rows]
+
+    def fetchmany(self, size):
+        rows, self.result = self.result[:size], self.result[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self.result = self.result, []
+        return rows
+
+
+class TestReadThroughCache(unittest.TestCase):
+    def setUp(self):
+        self.connection = TableConnection({f"network{i}": (f"network{i}", "active") for i in range(3)})
+        pool = ConnectionPool(lambda: self.connection, min_size=0, max_size=1)
+        self.db = NetworkDatabase(db_type="postgresql", pool=pool)
+
+    def queries(self):
+        return [call for call in self.connection.calls if call[0] == "execute"]
+
+    def test_repeated_lookups_are_cached(self):
+        self.assertEqual(self.db.retrieve_data("network0"), {"network_name": "network0", "network_status": "active"})
+        self.db.retrieve_data("network0")
+        self.assertEqual(len(self.queries()), 1)
+        self.assertEqual((self.db.cache_stats()["hits"], self.db.cache_stats()["misses"]), (1, 1))
+
+    def test_update_invalidates_cached_lookup(self):
+        self.db.retrieve_data("network0")
+        self.db.update_data("network0", "inactive")
+        self.assertEqual(self.db.retrieve_data("network0")["network_status"], "inactive")
+
+    def test_retrieve_many_fetches_misses_in_one_query(self):
+        self.db.retrieve_data("network0")
+        results = self.db.retrieve_many(["network0", "network1", "network2", "unknown"])
+        self.assertEqual(results["unknown"], {})
+        self.assertEqual(results["network2"]["network_status"], "active")
+        self.assertEqual(self.queries()[1:], [("execute", "SELECT", 3)])
+
+    def test_close_leaves_the_shared_pool_open(self):
+        first, second = NetworkDatabase(), NetworkDatabase()
+        self.assertIs(first.pool, second.pool)
+        first.close()
+        self.assertFalse(second.pool.closed)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,99 @@
+import random
+import time
+import unittest
+from optimizer import NetworkOptimizer
+
+
+def square(capacity=10):
+    # Two paths from a to c: a-b-c at cost 2 and a-d-c at cost 4
+    return [
+        {"source": "a", "target": "b", "capacity": capacity},
+        {"source": "b", "target": "c", "capacity": capacity},
+        {"source": "a", "target": "d", "capacity": capacity, "cost": 2},
+        {"source": "d", "target": "c", "capacity": capacity, "cost": 2},
+    ]
+
+
+def backbone(nodes=1000, links=3000, sources=30, demands=3000):
+    # A ring plus random chords, with demands from a few PoPs to anywhere
+    rng = random.Random(1)
+    config = {"links": [{"source": i, "target": (i + 1) % nodes, "capacity": 100} for i in range(nodes)], "demands": []}
+    while len(config["links"]) < links:
+        source, target = rng.randrange(nodes), rng.randrange(nodes)
+        if source != target:
+            config["links"].append({"source": source, "target": target, "capacity": rng.choice([10, 40, 100]),
+                                    "cost": rng.randint(1, 5)})
+    pops = rng.sample(range(nodes), sources)
+    config["demands"] = [{"source": rng.choice(pops), "target": rng.randrange(nodes), "volume": rng.uniform(0.1, 3)}
+                         for _ in range(demands)]
+    return config
+
+
+def link(result, source, target):
+    return next(link for link in result["links"] if (link["source"], link["target"]) == (source, target))
+
+
+class TestNetworkOptimizer(unittest.TestCase):
+    def test_demand_within_target_takes_the_cheapest_path(self):
+        result = NetworkOptimizer().optimize({"links": square(), "demands": [{"source": "a", "target": "c", "volume": 6}]})
+        self.assertEqual(result["solver"], "lp")
+        self.assertAlmostEqual(link(result, "a", "b")["flow"][0], 6)
+        self.assertAlmostEqual(link(result, "a", "d")["flow"][0], 0)
+        self.assertEqual(result["recommendations"], [])
+
+    def test_congested_demand_is_split_and_upgrades_are_recommended(self):
+        result = NetworkOptimizer(target_utilisation=0.8).optimize(
+            {"links": square(), "demands": [{"source": "a", "target": "c", "volume": 12}]})
+        self.assertAlmostEqual(link(result, "a", "b")["flow"][0], 8)
+        self.assertAlmostEqual(link(result, "a", "d")["flow"][0], 4)
+        self.assertAlmostEqual(result["max_utilisation"], 0.8)
+        upgrades = {(rec["source"], rec["target"]) for rec in result["recommendations"]}
+        self.assertTrue(upgrades and upgrades <= {("a", "b"), ("b", "c")})
+
+    def test_demand_beyond_capacity_is_unserved(self):
+        result = NetworkOptimizer().optimize({"links": square(), "demands": [
+            {"source": "a", "target": "c", "volume": 25}, {"source": "a", "target": "z", "volume": 1}]})
+        self.assertAlmostEqual(result["served_volume"], 20)
+        self.assertEqual({(item["target"], round(item["volume"])) for item in result["unserved"]}, {("c", 5), ("z", 1)})
+
+    def test_local_pref_follows_traffic_moved_between_ixps(self):
+        network_config = {
+            "links": square(),
+            "ixp_ports": [{"node": "b", "ixp": "DE-CIX", "capacity": 5}, {"node": "d", "ixp": "DE-CIX", "capacity": 100}],
+            "demands": [{"source": "a", "target": "DE-CIX", "volume": 9}],
+        }
+        result = NetworkOptimizer().optimize(network_config)
+        local_pref = {rec["node"]: rec["action"] for rec in result["recommendations"] if rec["type"] == "local_pref"}
+        self.assertEqual(local_pref, {"b": "decrease", "d": "increase"})
+        self.assertTrue(any(rec["type"] == "peering" and rec["node"] == "b" for rec in result["recommendations"]))
+
+    def test_large_problems_use_congestion_aware_shortest_paths(self):
+        optimizer = NetworkOptimizer(max_lp_variables=0, rounds=4)
+        result = optimizer.optimize({"links": square(), "demands": [{"source": "a", "target": "c", "volume": 16}]})
+        self.assertEqual(result["solver"], "congestion_aware_shortest_path")
+        self.assertGreater(link(result, "a", "d")["flow"][0], 0)
+        self.assertAlmostEqual(result["served_volume"], 16)
+
+    def test_large_networks_are_optimized_within_the_time_cap(self):
+        network_config = backbone()  # 180,000 flow variables
+        started = time.perf_counter()
+        result = NetworkOptimizer().optimize(network_config)
+        self.assertLess(time.perf_counter() - started, 5.0)
+        self.assertEqual(result["solver"], "congestion_aware_shortest_path")
+        self.assertAlmostEqual(result["served_volume"], result["demand_volume"])
+
+        # An LP that runs out of time still leaves room for the fallback
+        started = time.perf_counter()
+        result = NetworkOptimizer(max_lp_variables=10 ** 9, max_seconds=1.5).optimize(backbone(sources=10))
+        self.assertLess(time.perf_counter() - started, 2.5)
+        self.assertEqual(result["solver"], "congestion_aware_shortest_path")
+
+    def test_invalid_config_is_rejected(self):
+        with self.assertRaises(KeyError):
+            NetworkOptimizer().optimize({"links": [{"source": "a", "target": "b"}]})
+        with self.assertRaises(ValueError):
+            NetworkOptimizer().optimize({"links": square(), "demands": [{"source": "a", "target": "c", "volume": -1}]})
+
+
+if __name__ == "__main__":
+    unittest.main()
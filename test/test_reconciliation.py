@@ -0,0 +1,149 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import razorpay
+from db_pool import ConnectionPool
+from migrate import POSTGRESQL_MIGRATIONS_DIRECTORY, execute_sql_file
+from reconciliation import PaymentReconciler, RateLimiter
+
+
+class FakeRazorpayHandler(BaseHTTPRequestHandler):
+    """Serves GET /v1/payments from the server's payment list, newest first, like the Razorpay API."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        server = self.server
+        with server.lock:
+            server.queries.append(query)
+            throttled = server.throttle > 0
+            server.throttle -= throttled
+        if throttled:
+            return self.reply(429, {"error": {"code": "TOO_MANY_REQUESTS", "description": "Too many requests"}})
+        if url.path != "/v1/payments":
+            return self.reply(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "Not found"}})
+        start, end = int(query.get("from", 0)), int(query.get("to", 2 ** 40))
+        skip, count = int(query.get("skip", 0)), int(query.get("count", 10))
+        items = sorted((payment for payment in server.payments if start <= payment["created_at"] <= end),
+                       key=lambda payment: payment["created_at"], reverse=True)[skip:skip + count]
+        self.reply(200, {"entity": "collection", "count": len(items), "items": items})
+
+    def reply(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def payment(number, status="captured"):
+    return {"id": f"pay_{number}", "order_id": f"order_{number}", "amount": 100 * number, "currency": "INR",
+            "status": status, "created_at": 1700000000 + number, "notes": {"payer": f"payer{number % 3}"}}
+
+
+class TestPaymentReconciler(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRazorpayHandler)
+        cls.server.daemon_threads = True
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.payments = [payment(number, "failed" if number % 10 == 0 else "captured")
+                                for number in range(1, 251)]
+        self.server.queries = []
+        self.server.throttle = 0
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "billing.db")
+        self.pool = ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), min_size=0, max_size=2)
+        self.addCleanup(self.pool.close)
+        with self.pool.connection() as connection:
+            execute_sql_file(os.path.join(POSTGRESQL_MIGRATIONS_DIRECTORY, "0001_payment_reconciliation.sql"),
+                             connection)
+        self.now = 1700001000
+        client = razorpay.Client(auth=("key", "secret"), base_url=f"http://127.0.0.1:{self.server.server_port}")
+        self.reconciler = PaymentReconciler(client, self.pool, page_size=20, workers=4, rate=1000, batch_size=50,
+                                            lookback=0, placeholder="?", clock=lambda: self.now)
+
+    def stored(self):
+        with self.pool.connection() as connection:
+            return {order_id: (payment_id, status) for order_id, payment_id, status in
+                    connection.execute("SELECT order_id, payment_id, payment_status FROM payments")}
+
+    def test_first_run_pages_through_everything(self):
+        summary = self.reconciler.run()
+        self.assertEqual((summary["pages"], summary["payments"], summary["upserted"]), (13, 250, 225))
+        self.assertEqual(self.reconciler.position(), self.now)
+        stored = self.stored()
+        self.assertEqual(len(stored), 225)
+        self.assertEqual(stored["order_7"], ("pay_7", "Success"))
+        self.assertNotIn("order_10", stored)
+
+    def test_next_run_reads_only_new_payments(self):
+        self.reconciler.run()
+        self.server.queries = []
+        self.server.payments.append(payment(1500))
+        self.now = 1700002000
+        summary = self.reconciler.run()
+        self.assertEqual((summary["payments"], summary["upserted"]), (1, 1))
+        self.assertTrue(all(query["from"] == "1700001000" for query in self.server.queries))
+        self.assertEqual(len(self.stored()), 226)
+
+    def test_existing_orders_are_updated(self):
+        with self.pool.connection() as connection:
+            connection.execute("INSERT INTO payments (order_id, amount, currency, payer) VALUES ('order_1', 100, 'INR', 'Ann')")
+            connection.commit()
+        self.reconciler.run()
+        with self.pool.connection() as connection:
+            row = connection.execute("SELECT payer, payment_status FROM payments WHERE order_id = 'order_1'").fetchone()
+        self.assertEqual(row, ("Ann", "Success"))
+
+    def test_throttled_pages_are_retried(self):
+        self.server.throttle = 2
+        self.reconciler.max_attempts = 3
+        self.assertEqual(self.reconciler.run()["upserted"], 225)
+
+    def test_failed_run_keeps_the_high_water_mark(self):
+        self.server.throttle = 100
+        self.reconciler.max_attempts = 1
+        with self.assertRaises(razorpay.errors.ServerError):
+            self.reconciler.run()
+        self.assertIsNone(self.reconciler.position())
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_calls_beyond_the_burst_wait(self):
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(rate=10, burst=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            limiter.acquire()
+        self.assertEqual(len(waits), 2)
+        self.assertAlmostEqual(now[0], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
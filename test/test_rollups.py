@@ -0,0 +1,85 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, create_engine
+from sqlalchemy.orm import Session, declarative_base
+from web.rollups import RollupStore, floor_time, plan_range, utc_now
+
+Base = declarative_base()
+
+
+class NetworkActivity(Base):
+    __tablename__ = "network_activity"
+    id = Column(Integer, primary_key=True)
+    network_name = Column(String(100), nullable=False)
+    data_usage = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime)
+
+
+class MetricRollup(Base):
+    __tablename__ = "metric_rollups"
+    metric = Column(String(32), primary_key=True)
+    granularity = Column(String(8), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    subject = Column(String(100), primary_key=True)
+    total = Column(Float, nullable=False, default=0)
+    samples = Column(BigInteger, nullable=False, default=0)
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        self.session = Session(engine)
+        self.rollups = RollupStore(MetricRollup.__table__)
+        self.rollups.track(self.session, NetworkActivity, "data_usage",
+                           lambda row: (row.network_name, row.data_usage, row.created_at))
+        rng = random.Random(7)
+        origin = datetime(2024, 1, 1)
+        self.rows = [NetworkActivity(network_name=f"network{rng.randrange(3)}", data_usage=rng.randrange(1000),
+                                     created_at=origin + timedelta(minutes=rng.randrange(4 * 24 * 60)))
+                     for _ in range(800)]
+        for start in range(0, len(self.rows), 200):
+            self.session.add_all(self.rows[start:start + 200])
+            self.session.commit()
+
+    def tearDown(self):
+        self.session.close()
+
+    def expected(self, start=None, end=None):
+        totals = {}
+        for row in self.rows:
+            if (start is None or row.created_at >= start) and (end is None or row.created_at < end):
+                total, samples = totals.get(row.network_name, (0, 0))
+                totals[row.network_name] = (total + row.data_usage, samples + 1)
+        return totals
+
+    def test_all_time_totals(self):
+        self.assertEqual(self.rollups.totals(self.session, "data_usage"), self.expected())
+
+    def test_range_totals_match_raw_rows(self):
+        start, end = datetime(2024, 1, 1, 7, 13), datetime(2024, 1, 3, 18, 41)
+        self.assertEqual(self.rollups.totals(self.session, "data_usage", start, end), self.expected(start, end))
+
+    def test_unstamped_rows_are_stamped_and_bucketed_in_utc(self):
+        rollups = RollupStore(MetricRollup.__table__)
+        session = Session(self.session.get_bind())
+        self.addCleanup(session.close)
+        rollups.track(session, NetworkActivity, "data_usage",
+                      lambda row: (row.network_name, row.data_usage, row.created_at), stamp="created_at")
+        before = utc_now()
+        row = NetworkActivity(network_name="fresh", data_usage=5)
+        session.add(row)
+        session.commit()
+        self.assertTrue(before <= row.created_at <= utc_now())
+        minute = floor_time(row.created_at, "minute")
+        totals = rollups.totals(session, "data_usage", minute, minute + timedelta(minutes=1))
+        self.assertEqual(totals, {"fresh": (5, 1)})
+
+    def test_plan_range_uses_coarse_buckets_in_the_middle(self):
+        plan = plan_range(datetime(2024, 1, 1, 23, 58), datetime(2024, 1, 3, 1, 2))
+        self.assertEqual([granularity for granularity, _, _ in plan], ["minute", "day", "hour", "minute"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from lazy import lazy
+from startup_benchmark import HEAVY_MODULES, measure
+
+
+class TestStartup(unittest.TestCase):
+    def test_main_imports_without_heavy_dependencies(self):
+        result = measure("main", runs=1)
+        self.assertEqual(result["forbidden"], [])
+        self.assertEqual([name for name, _ in result["slowest"] if name.split(".")[0] in HEAVY_MODULES], [])
+
+    def test_import_has_no_side_effects(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, VAJRA_STATE_DIRECTORY=directory)
+            code = "import threading, main_asgi; print(threading.active_count())"
+            result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=root, env=env,
+                                    check=True)
+            self.assertEqual(result.stdout.strip(), "1", "Importing the app should start no threads")
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_lazy_factory_runs_once(self):
+        calls = []
+
+        @lazy
+        def service():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        self.assertFalse(service.created())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(service())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        self.assertTrue(service.created())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from timeseries import UsageStore
+
+
+class TestUsageStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = UsageStore(self.directory, segment_size=100, durable=False)
+        self.origin = datetime(2024, 1, 1)
+        self.samples = [(self.origin + timedelta(seconds=10 * i), 1000 + i % 7) for i in range(1050)]
+        for timestamp, usage in self.samples:
+            self.store.append("network/1", timestamp, usage)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def expected(self, start, end):
+        return [usage for timestamp, usage in self.samples if start <= timestamp < end]
+
+    def test_scan_returns_range_across_segments_and_tail(self):
+        start, end = self.origin + timedelta(seconds=995), self.origin + timedelta(seconds=10400)
+        timestamps, values = self.store.scan("network/1", start, end)
+        self.assertEqual(values.tolist(), self.expected(start, end))
+        self.assertEqual(timestamps[0], np.datetime64("2024-01-01T00:16:40", "ms"))
+
+    def test_segments_are_delta_encoded_and_reopened(self):
+        self.store.flush()
+        reopened = UsageStore(self.directory)
+        start, end = self.origin, self.origin + timedelta(days=1)
+        self.assertEqual(reopened.total("network/1", start, end), sum(self.expected(start, end)))
+        self.assertEqual(reopened.networks(), ["network/1"])
+        self.assertEqual(np.load(f"{self.directory}/network%2F1/000001.time.npy").dtype, np.int16)
+
+    def test_workers_share_samples_and_segments(self):
+        # Two processes writing to the same directory, and one that starts after a crash
+        other = UsageStore(self.directory, segment_size=100, durable=False)
+        extra = [(self.origin + timedelta(days=1, seconds=i), 5) for i in range(120)]
+        for i, (timestamp, usage) in enumerate(extra):
+            (self.store if i % 2 else other).append("network/1", timestamp, usage)
+        restarted = UsageStore(self.directory, segment_size=100)
+        start, end = self.origin, self.origin + timedelta(days=2)
+        self.assertEqual(restarted.total("network/1", start, end), sum(usage for _, usage in self.samples + extra))
+        self.assertEqual(len(self.store.scan("network/1")[0]), 1170)
+        with open(f"{self.directory}/network%2F1/index.json") as file:
+            numbers = [segment["number"] for segment in json.load(file)]
+        self.assertEqual(numbers, list(range(1, 12)))
+
+    def test_downsample(self):
+        starts, totals = self.store.downsample("network/1", 3600)
+        self.assertEqual(len(starts), 3)
+        self.assertEqual(totals.sum(), sum(usage for _, usage in self.samples))
+        _, counts = self.store.downsample("network/1", 3600, how="count")
+        self.assertEqual(counts.tolist(), [360, 360, 330])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import unittest
+from write_buffer import BufferFull, WriteBuffer
+
+
+class TestWriteBuffer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.directory.name, "network_data.journal")
+        self.batches = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_records_are_written_in_batches(self):
+        buffer = WriteBuffer(self.batches.append, journal_path=self.journal, max_batch=2, flush_interval=10)
+        for i in range(5):
+            buffer.put({"network_name": f"network{i}"})
+        self.assertTrue(buffer.flush(timeout=5))
+        buffer.close()
+        self.assertEqual([len(batch) for batch in self.batches], [2, 2, 1])
+        self.assertFalse(os.path.exists(buffer.journal_file), "A flushed journal should be removed on close")
+
+    def test_put_blocks_when_full(self):
+        release = threading.Event()
+        buffer = WriteBuffer(lambda batch: release.wait(), max_batch=1, max_pending=2, put_timeout=0.05)
+        buffer.put({"network_name": "network0"})
+        buffer.put({"network_name": "network1"})
+        with self.assertRaises(BufferFull):
+            buffer.put({"network_name": "network2"})
+        release.set()
+        buffer.close()
+
+    def test_unwritten_records_are_recovered_from_the_journal(self):
+        def failing_sink(batch):
+            raise ConnectionError("database unavailable")
+
+        buffer = WriteBuffer(failing_sink, journal_path=self.journal, flush_interval=0.01)
+        for i in range(3):
+            buffer.put({"network_name": f"network{i}"})
+        buffer.close()
+
+        recovered = WriteBuffer(self.batches.append, journal_path=self.journal)
+        self.assertTrue(recovered.flush(timeout=5))
+        recovered.close()
+        self.assertEqual(self.batches, [[{"network_name": f"network{i}"} for i in range(3)]])
+
+
+    def test_journals_of_exited_processes_are_adopted(self):
+        records = [{"seq": 1, "record": {"network_name": "network0"}}, {"flushed": 1},
+                   {"seq": 2, "record": {"network_name": "network1"}}]
+        for pid in ("4000001", "4000002"):
+            with open(f"{self.journal}.{pid}", "w") as file:
+                file.writelines(json.dumps(entry) + "\n" for entry in records)
+            open(f"{self.journal}.{pid}.lock", "w").close()
+        with open(f"{self.journal}.4000002.lock", "a") as running:
+            fcntl.flock(running, fcntl.LOCK_EX)  # Its process is still running
+            buffer = WriteBuffer(self.batches.append, journal_path=self.journal)
+            self.assertTrue(buffer.flush(timeout=5))
+            buffer.close()
+        self.assertEqual(self.batches, [[{"network_name": "network1"}]])
+        self.assertFalse(os.path.exists(f"{self.journal}.4000001"))
+        self.assertTrue(os.path.exists(f"{self.journal}.4000002"))
+
+    def test_rejected_records_are_dead_lettered(self):
+        def sink(batch):
+            if any(record["network_name"] == "bad" for record in batch):
+                raise ValueError("invalid network")
+            self.batches.append(batch)
+
+        buffer = WriteBuffer(sink, journal_path=self.journal, max_batch=10, flush_interval=10)
+        for name in ("network0", "bad", "network1"):
+            buffer.put({"network_name": name})
+        self.assertTrue(buffer.flush(timeout=5))
+        buffer.put({"network_name": "network2"})
+        self.assertTrue(buffer.flush(timeout=5))
+        buffer.close()
+        self.assertEqual(self.batches, [[{"network_name": "network0"}], [{"network_name": "network1"}],
+                                        [{"network_name": "network2"}]])
+        with open(self.journal + ".dead") as file:
+            dead = [json.loads(line) for line in file]
+        self.assertEqual([entry["record"] for entry in dead], [{"network_name": "bad"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
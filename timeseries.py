@@ -0,0 +1,278 @@
+import fcntl
+import json
+import os
+import urllib.parse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+
+# Narrowest signed types tried for delta-encoded columns
+_DELTA_TYPES = (np.int8, np.int16, np.int32, np.int64)
+
+_AGGREGATES = ("sum", "mean", "max", "min", "count")
+
+# Record of a tail file
+_SAMPLE = np.dtype([("timestamp", np.int64), ("value", np.int64)])
+
+
+def to_millis(moment):
+    """Converts a datetime (naive means UTC), datetime64 or epoch seconds to epoch milliseconds."""
+    if moment is None:
+        return None
+    if isinstance(moment, datetime):
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return int(moment.timestamp() * 1000)
+    if isinstance(moment, np.datetime64):
+        return int(moment.astype("datetime64[ms]").astype(np.int64))
+    return int(float(moment) * 1000)
+
+
+def _narrow(deltas):
+    for dtype in _DELTA_TYPES:
+        info = np.iinfo(dtype)
+        if not len(deltas) or (deltas.min() >= info.min and deltas.max() <= info.max):
+            return deltas.astype(dtype)
+    return deltas
+
+
+def _read_tail(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return np.empty(0, dtype=_SAMPLE)
+    return np.frombuffer(data[:len(data) - len(data) % _SAMPLE.itemsize], dtype=_SAMPLE)  # Drop a torn record
+
+
+def _next_number(index):
+    return index[-1]["number"] + 1 if index else 1
+
+
+class UsageStore:
+    """
+    Columnar store of (timestamp, data_usage) samples, partitioned by network.
+
+    Each network has a directory of sealed segments plus a tail file. A
+    segment keeps its first timestamp and value in the partition index and the
+    successive differences in .npy files using the narrowest integer type that
+    fits, so regular samples cost one or two bytes per column instead of an ORM
+    row. Segments are memory-mapped when read; the index also keeps each
+    segment's time bounds and total so range queries skip or sum whole segments
+    without decoding them.
+
+    Samples are appended (and by default fsynced) to the tail before extend()
+    returns, and every process sharing the directory reads and writes the tail and
+    index under a per-network file lock, so workers see each other's samples and a
+    crash loses nothing acknowledged. The tail is named after the segment it will
+    become; sealing writes the segment and the next tail, then replaces the index,
+    so a crash part-way leaves either the old or the new state.
+    """
+
+    def __init__(self, directory, segment_size=65536, durable=True):
+        """
+        :param directory: Root directory; one subdirectory is created per network
+        :param segment_size: Samples buffered per network before a segment is written
+        :param durable: fsync the tail before extend() returns
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.durable = durable
+        self._indexes = {}  # network -> (index file identity, list of segment metadata)
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, network, *names):
+        return os.path.join(self.directory, urllib.parse.quote(network, safe=""), *names)
+
+    def _tail_path(self, network, number):
+        return self._path(network, f"{number:06d}.tail")
+
+    @contextmanager
+    def _locked(self, network, operation):
+        with open(self._path(network, "lock"), "a") as lock:
+            fcntl.flock(lock, operation)
+            yield
+
+    def _index(self, network):
+        """Returns the partition index; call with the network locked. Reloaded whenever another process replaced it."""
+        path = self._path(network, "index.json")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return []
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._indexes.get(network)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        with open(path) as file:
+            index = json.load(file)
+        self._indexes[network] = (identity, index)
+        return index
+
+    def networks(self):
+        return sorted(urllib.parse.unquote(entry.name) for entry in os.scandir(self.directory) if entry.is_dir())
+
+    def append(self, network, timestamp, value):
+        """Records one usage sample."""
+        self.extend(network, [timestamp], [value])
+
+    def extend(self, network, timestamps, values):
+        """Records many usage samples for one network."""
+        samples = np.empty(len(timestamps), dtype=_SAMPLE)
+        samples["timestamp"] = [to_millis(timestamp) for timestamp in timestamps]
+        samples["value"] = [int(value) for value in values]
+        if not len(samples):
+            return
+        os.makedirs(self._path(network), exist_ok=True)
+        with self._locked(network, fcntl.LOCK_EX):
+            index = self._index(network)
+            number = _next_number(index)
+            path = self._tail_path(network, number)
+            with open(path, "ab") as tail:
+                size = tail.tell()
+                if size % _SAMPLE.itemsize:
+                    tail.truncate(size - size % _SAMPLE.itemsize)  # Torn by a crash
+                if size // _SAMPLE.itemsize + len(samples) < self.segment_size:
+                    tail.write(samples.tobytes())
+                    self._sync(tail)
+                    return
+            self._seal(network, index, number, np.concatenate([_read_tail(path), samples]))
+
+    def flush(self):
+        """Seals every network's tail into a segment."""
+        for network in self.networks():
+            with self._locked(network, fcntl.LOCK_EX):
+                index = self._index(network)
+                number = _next_number(index)
+                samples = _read_tail(self._tail_path(network, number))
+                if len(samples):
+                    self._seal(network, index, number, samples, everything=True)
+
+    def _sync(self, file):
+        file.flush()
+        if self.durable:
+            os.fsync(file.fileno())
+
+    def _seal(self, network, index, number, samples, everything=False):
+        """
+        Writes ``samples`` (the tail of segment ``number`` onwards) as segments of segment_size,
+        and the rest, unless ``everything``, as the new tail. Call with the network locked.
+        """
+        index = list(index)
+        first = number
+        end = len(samples) if everything else len(samples) - len(samples) % self.segment_size
+        for offset in range(0, end, self.segment_size):
+            self._write_segment(network, index, number, samples[offset:offset + self.segment_size])
+            number += 1
+        with open(self._tail_path(network, number), "wb") as tail:
+            tail.write(samples[end:].tobytes())
+            self._sync(tail)
+        # Replacing the index commits the segments and moves appends to the new tail
+        temporary = self._path(network, f"index.json.{os.getpid()}.tmp")
+        with open(temporary, "w") as file:
+            json.dump(index, file)
+            self._sync(file)
+        os.replace(temporary, self._path(network, "index.json"))
+        os.remove(self._tail_path(network, first))
+
+    def _write_segment(self, network, index, number, samples):
+        order = np.argsort(samples["timestamp"], kind="stable")
+        timestamps, values = samples["timestamp"][order], samples["value"][order]
+        np.save(self._path(network, f"{number:06d}.time.npy"), _narrow(np.diff(timestamps)))
+        np.save(self._path(network, f"{number:06d}.usage.npy"), _narrow(np.diff(values)))
+        index.append({
+            "number": number, "count": len(timestamps),
+            "start": int(timestamps[0]), "end": int(timestamps[-1]),
+            "first_value": int(values[0]), "total": int(values.sum()),
+        })
+
+    def _decode(self, network, segment):
+        number = segment["number"]
+        time_deltas = np.load(self._path(network, f"{number:06d}.time.npy"), mmap_mode="r")
+        usage_deltas = np.load(self._path(network, f"{number:06d}.usage.npy"), mmap_mode="r")
+        timestamps = np.empty(segment["count"], dtype=np.int64)
+        values = np.empty(segment["count"], dtype=np.int64)
+        timestamps[0], values[0] = segment["start"], segment["first_value"]
+        np.cumsum(time_deltas, dtype=np.int64, out=timestamps[1:])
+        np.cumsum(usage_deltas, dtype=np.int64, out=values[1:])
+        timestamps[1:] += segment["start"]
+        values[1:] += segment["first_value"]
+        return timestamps, values
+
+    def _pieces(self, network, start, end):
+        """Yields (segment or None, timestamps, values) clipped to [start, end)."""
+        if not os.path.isdir(self._path(network)):
+            return
+        with self._locked(network, fcntl.LOCK_SH):
+            segments = list(self._index(network))
+            samples = _read_tail(self._tail_path(network, _next_number(segments)))
+        tail = (samples["timestamp"], samples["value"])
+        for segment in segments:
+            if (end is not None and segment["start"] >= end) or (start is not None and segment["end"] < start):
+                continue
+            if (start is None or segment["start"] >= start) and (end is None or segment["end"] < end):
+                yield segment, None, None  # Entirely inside the range
+                continue
+            timestamps, values = self._decode(network, segment)
+            lo = 0 if start is None else np.searchsorted(timestamps, start, side="left")
+            hi = len(timestamps) if end is None else np.searchsorted(timestamps, end, side="left")
+            yield None, timestamps[lo:hi], values[lo:hi]
+        if len(tail[0]):
+            mask = np.ones(len(tail[0]), dtype=bool)
+            if start is not None:
+                mask &= tail[0] >= start
+            if end is not None:
+                mask &= tail[0] < end
+            yield None, tail[0][mask], tail[1][mask]
+
+    def scan(self, network, start=None, end=None):
+        """
+        Returns the samples of a network in [start, end).
+        :return: Tuple of (datetime64[ms] array, int64 usage array), ordered by time
+        """
+        start, end = to_millis(start), to_millis(end)
+        timestamps, values = [], []
+        for segment, piece_timestamps, piece_values in self._pieces(network, start, end):
+            if segment is not None:
+                piece_timestamps, piece_values = self._decode(network, segment)
+            timestamps.append(piece_timestamps)
+            values.append(piece_values)
+        if not timestamps:
+            return np.empty(0, dtype="datetime64[ms]"), np.empty(0, dtype=np.int64)
+        timestamps, values = np.concatenate(timestamps), np.concatenate(values)
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            order = np.argsort(timestamps, kind="stable")  # Segments written out of order overlap
+            timestamps, values = timestamps[order], values[order]
+        return timestamps.astype("datetime64[ms]"), values
+
+    def total(self, network, start=None, end=None):
+        """Sums a network's usage over [start, end) without decoding segments that lie entirely inside it."""
+        start, end = to_millis(start), to_millis(end)
+        total = 0
+        for segment, _, values in self._pieces(network, start, end):
+            total += segment["total"] if segment is not None else int(values.sum())
+        return total
+
+    def downsample(self, network, interval, start=None, end=None, how="sum"):
+        """
+        Aggregates a network's samples into fixed buckets.
+        :param interval: Bucket width in seconds
+        :param how: 'sum', 'mean', 'max', 'min' or 'count'
+        :return: Tuple of (bucket start datetime64[ms] array, aggregate array); empty buckets are omitted
+        """
+        if how not in _AGGREGATES:
+            raise ValueError(f"Unsupported aggregate {how}. Use one of {', '.join(_AGGREGATES)}.")
+        timestamps, values = self.scan(network, start, end)
+        width = int(interval * 1000)
+        if width <= 0:
+            raise ValueError("interval must be positive")
+        buckets = timestamps.astype(np.int64) // width * width
+        starts, first = np.unique(buckets, return_index=True)
+        if how == "count":
+            result = np.diff(np.append(first, len(buckets)))
+        elif how == "mean":
+            result = np.add.reduceat(values, first) / np.diff(np.append(first, len(buckets))) if len(first) else values[:0]
+        else:
+            reducer = {"sum": np.add, "max": np.maximum, "min": np.minimum}[how]
+            result = reducer.reduceat(values, first) if len(first) else values[:0]
+        return starts.astype("datetime64[ms]"), result
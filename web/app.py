@@ -1,16 +1,19 @@
+from datetime import datetime, timezone
 from flask import Flask, render_template, request, jsonify
 from flask_sqlalchemy import SQLAlchemy
-import razorpay
-from config import RAZORPAY_API_KEY, RAZORPAY_API_SECRET, PAYMENT_LINKS, DATABASE_URI
+from config import PAYMENT_LINKS, DATABASE_URI, TIMESERIES_DIRECTORY
 from ixp_manager import IXPManager
+from rollups import RollupStore, utc_now
+from timeseries import UsageStore
 
 app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db = SQLAlchemy(app)
 
-razorpay_client = razorpay.Client(auth=(RAZORPAY_API_KEY, RAZORPAY_API_SECRET))
 ixp_manager = IXPManager()
+# Shared by every worker; samples are on disk once extend() returns
+usage_store = UsageStore(TIMESERIES_DIRECTORY)
 
 # Database Models
 class Payment(db.Model):
@@ -19,21 +22,52 @@ class Payment(db.Model):
     user_id = db.Column(db.Integer, nullable=False)
     amount = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(10), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=utc_now)
 
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(100), nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=utc_now)
 
 class NetworkActivity(db.Model):
     __tablename__ = 'network_activity'
     id = db.Column(db.Integer, primary_key=True)
     network_name = db.Column(db.String(100), nullable=False)
     data_usage = db.Column(db.BigInteger, nullable=False)
-    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    created_at = db.Column(db.DateTime, default=utc_now)
+
+class MetricRollup(db.Model):
+    """Minute, hour and day aggregates of the tables above, maintained by RollupStore."""
+    __tablename__ = 'metric_rollups'
+    metric = db.Column(db.String(32), primary_key=True)
+    granularity = db.Column(db.String(8), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    subject = db.Column(db.String(100), primary_key=True)
+    total = db.Column(db.Float, nullable=False, default=0)
+    samples = db.Column(db.BigInteger, nullable=False, default=0)
+
+# Timestamps are naive UTC throughout; created_at is set before the rollups are folded
+rollups = RollupStore(MetricRollup.__table__)
+rollups.track(db.session, Payment, "revenue", lambda row: ("", row.amount, row.created_at), stamp="created_at")
+rollups.track(db.session, User, "users", lambda row: ("", 0, row.created_at), stamp="created_at")
+rollups.track(db.session, NetworkActivity, "data_usage",
+              lambda row: (row.network_name, row.data_usage, row.created_at), stamp="created_at")
+
+def init_db():
+    """Creates missing tables and, on the first run with rollups, folds in the rows recorded before them."""
+    db.create_all()
+    if not db.session.query(MetricRollup).first():
+        for model in (Payment, User, NetworkActivity):
+            rollups.backfill(db.session, model)
+        db.session.commit()
+
+@app.cli.command("init-db")
+def init_db_command():
+    # Run once per deployment before starting the workers: flask --app app init-db
+    init_db()
+    print("Database initialized successfully!")
 
 # Routes
 @app.route("/")
@@ -43,28 +77,85 @@ def index():
 @app.route("/ixp_status", methods=["GET"])
 def get_ixp_status():
     ixp_list = request.args.getlist("ixp_list")
-    ixp_manager.monitor_ixps(ixp_list)
-    return jsonify(ixp_manager.ixp_status)
+    # Cached statuses are served directly; uncached IXPs that miss the deadline are left out
+    statuses = ixp_manager.get_status(ixp_list, deadline=request.args.get("deadline", type=float))
+    return jsonify(statuses)
+
+def utc_naive(moment):
+    """Stores and rollups use naive UTC datetimes."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def time_range():
+    """Parses the optional ISO-8601 'start' and 'end' query parameters."""
+    return tuple(utc_naive(datetime.fromisoformat(request.args[name])) if name in request.args else None
+                 for name in ("start", "end"))
 
 @app.route("/analytics", methods=["GET"])
 def analytics_dashboard():
-    # Fetch data from the database
-    total_revenue = db.session.query(db.func.sum(Payment.amount)).scalar()
-    total_users = db.session.query(User).count()
-    network_usage = db.session.query(NetworkActivity.network_name, db.func.sum(NetworkActivity.data_usage)) \
-                              .group_by(NetworkActivity.network_name).all()
+    # Optional ISO-8601 range; totals are read from the rollups rather than the raw tables
+    try:
+        start, end = time_range()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time range: {e}"}), 400
+
+    revenue = rollups.totals(db.session, "revenue", start, end)
+    users = rollups.totals(db.session, "users", start, end)
+    network_usage = rollups.totals(db.session, "data_usage", start, end)
 
     # Format data for JSON response
     response_data = {
-        "total_revenue": total_revenue or 0,
-        "total_users": total_users,
-        "network_usage": {row[0]: row[1] for row in network_usage}
+        "total_revenue": revenue.get("", (0, 0))[0],
+        "total_users": users.get("", (0, 0))[1],
+        "network_usage": {network: int(total) for network, (total, _) in network_usage.items()}
     }
     return jsonify(response_data)
 
+@app.route("/usage_samples", methods=["POST"])
+def add_usage_samples():
+    # Samples go to the time-series store instead of one NetworkActivity row each
+    by_network = {}
+    rollup_samples = []
+    try:
+        for sample in request.json["samples"]:
+            if "timestamp" in sample:
+                moment = utc_naive(datetime.fromisoformat(sample["timestamp"]))
+            else:
+                moment = utc_now()
+            usage = int(sample["data_usage"])
+            timestamps, values = by_network.setdefault(sample["network_name"], ([], []))
+            timestamps.append(moment)
+            values.append(usage)
+            rollup_samples.append(("data_usage", sample["network_name"], usage, moment))
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid samples: {e}"}), 400
+
+    for network, (timestamps, values) in by_network.items():
+        usage_store.extend(network, timestamps, values)
+    rollups.record(db.session.connection(), rollup_samples)
+    db.session.commit()
+    return jsonify({"added": len(rollup_samples)})
+
+@app.route("/usage_series", methods=["GET"])
+def usage_series():
+    network = request.args.get("network")
+    if not network:
+        return jsonify({"error": "network is required"}), 400
+    try:
+        start, end = time_range()
+        starts, values = usage_store.downsample(network, request.args.get("interval", default=300, type=float),
+                                                start, end, request.args.get("how", "sum"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "network": network,
+        "series": [[str(moment), value.item()] for moment, value in zip(starts, values)],
+    })
+
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        init_db()
         print("Database initialized successfully!")
 
     app.run(debug=True)
@@ -0,0 +1,38 @@
+# Production entry point for an ASGI server, run from this directory, e.g.
+#   gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8080 app_asgi:app
+# /ixp_status and its push stream are served by the async app below, so dashboards waiting
+# for IXP APIs do not hold threads; every other route is served by app.app as before.
+from quart import Quart, request, jsonify
+from app import app as flask_app, ixp_manager
+from asgi_support import RouteDispatcher, sse_response
+from ixp_manager import IXPStatusFeed
+
+api = Quart(__name__, static_folder=None)
+
+# One poller per worker process serves every open status stream
+status_feed = IXPStatusFeed(ixp_manager)
+
+@api.after_serving
+async def close_clients():
+    await ixp_manager.close_async()
+
+@api.route("/ixp_status", methods=["GET"])
+async def get_ixp_status():
+    ixp_list = request.args.getlist("ixp_list")
+    # Cached statuses are served directly; uncached IXPs that miss the deadline are left out
+    statuses = await ixp_manager.get_status_async(ixp_list, deadline=request.args.get("deadline", type=float))
+    return jsonify(statuses)
+
+@api.route("/ixp_status/stream", methods=["GET"])
+async def stream_ixp_status():
+    # Server-sent 'snapshot' event with the current statuses, then a 'delta' event whenever some change
+    ixp_list = request.args.getlist("ixp_list")
+    if not ixp_list:
+        return jsonify({"error": "ixp_list is required"}), 400
+    return sse_response(status_feed.subscribe(ixp_list))
+
+app = RouteDispatcher(api, flask_app)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,177 @@
+import collections
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func, select
+
+# Bucket sizes in seconds, coarsest first
+GRANULARITIES = collections.OrderedDict([("day", 86400), ("hour", 3600), ("minute", 60)])
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def utc_now():
+    """Current time as a naive UTC datetime, the clock of every stored timestamp and bucket."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def floor_time(moment, granularity):
+    """Start of the bucket containing ``moment``."""
+    size = GRANULARITIES[granularity]
+    seconds = int((moment - _EPOCH).total_seconds())
+    return _EPOCH + timedelta(seconds=seconds - seconds % size)
+
+
+def ceil_time(moment, granularity):
+    floored = floor_time(moment, granularity)
+    return floored if floored == moment else floored + timedelta(seconds=GRANULARITIES[granularity])
+
+
+def plan_range(start, end, levels=tuple(GRANULARITIES)):
+    """
+    Covers [start, end) with as few buckets as possible: whole days in the middle,
+    hours next to them and minutes at the edges.
+    :return: List of (granularity, first bucket, end) ranges
+    """
+    if start >= end:
+        return []
+    if len(levels) == 1:
+        return [(levels[0], floor_time(start, levels[0]), floor_time(end, levels[0]))]
+    inner_start = ceil_time(start, levels[0])
+    inner_end = floor_time(end, levels[0])
+    if inner_start >= inner_end:
+        return plan_range(start, end, levels[1:])
+    return (plan_range(start, inner_start, levels[1:]) + [(levels[0], inner_start, inner_end)]
+            + plan_range(inner_end, end, levels[1:]))
+
+
+def _fold(samples):
+    deltas = collections.defaultdict(lambda: [0, 0])
+    for metric, subject, value, timestamp in samples:
+        timestamp = timestamp or utc_now()
+        for granularity in GRANULARITIES:
+            delta = deltas[(metric, granularity, floor_time(timestamp, granularity), subject or "")]
+            delta[0] += value or 0
+            delta[1] += 1
+    return deltas
+
+
+class RollupStore:
+    """
+    Per-metric, per-subject aggregates at minute, hour and day resolution.
+
+    Rows are folded into every granularity in the same transaction that inserts
+    them, so a query reads O(buckets) rollup rows instead of scanning the raw
+    tables. Time ranges are answered at minute resolution.
+    """
+
+    def __init__(self, table):
+        """
+        :param table: Table with metric, granularity, bucket, subject, total and samples columns,
+                      keyed by (metric, granularity, bucket, subject)
+        """
+        self.table = table
+        self.sources = {}  # Mapped class -> (metric, extractor, stamp attribute)
+
+    def track(self, session, model, metric, extractor, stamp=None):
+        """
+        Maintains a metric from rows of ``model`` added through ``session``.
+        :param extractor: Callable mapping a row to (subject, value, timestamp); a missing
+                          timestamp counts as now (UTC)
+        :param stamp: Timestamp attribute set to utc_now() on new rows that have none before they
+                      are folded, so a row and its buckets agree instead of waiting for a column default
+        """
+        if not self.sources:
+            event.listen(session, "before_flush", self._before_flush)
+        self.sources[model] = (metric, extractor, stamp)
+
+    def _before_flush(self, session, flush_context, instances):
+        # Runs in the flush's transaction, so the rollups commit or roll back with the rows
+        rows = [row for row in session.new if type(row) in self.sources]
+        if rows:
+            now = utc_now()
+            for row in rows:
+                stamp = self.sources[type(row)][2]
+                if stamp is not None and getattr(row, stamp) is None:
+                    setattr(row, stamp, now)
+            self.add(session.connection(), self._deltas(rows))
+
+    def _deltas(self, rows):
+        samples = []
+        for row in rows:
+            metric, extractor, _ = self.sources[type(row)]
+            samples.append((metric,) + tuple(extractor(row)))
+        return _fold(samples)
+
+    def record(self, connection, samples):
+        """
+        Adds samples that are not stored as tracked rows, e.g. usage kept in the time-series store.
+        :param samples: Iterable of (metric, subject, value, timestamp)
+        """
+        self.add(connection, _fold(samples))
+
+    def add(self, connection, deltas):
+        """Adds {(metric, granularity, bucket, subject): [total, samples]} to the stored aggregates."""
+        if not deltas:
+            return
+        table = self.table
+        rows = [{"metric": metric, "granularity": granularity, "bucket": bucket, "subject": subject,
+                 "total": total, "samples": samples}
+                for (metric, granularity, bucket, subject), (total, samples) in deltas.items()]
+        dialect = connection.dialect.name
+        if dialect == "mysql":
+            from sqlalchemy.dialects.mysql import insert
+            statement = insert(table)
+            statement = statement.on_duplicate_key_update(total=table.c.total + statement.inserted.total,
+                                                          samples=table.c.samples + statement.inserted.samples)
+        elif dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[column.name for column in table.primary_key.columns],
+                set_={"total": table.c.total + statement.excluded.total,
+                      "samples": table.c.samples + statement.excluded.samples},
+            )
+        else:
+            raise ValueError(f"Rollups are not supported on {dialect}")
+        connection.execute(statement, rows)
+
+    def backfill(self, session, model, batch_size=10000):
+        """Folds existing rows of ``model`` into the rollups; run once on a table with no tracked rows."""
+        batch = []
+        for row in session.query(model).yield_per(batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self.add(session.connection(), self._deltas(batch))
+                batch = []
+        self.add(session.connection(), self._deltas(batch))
+
+    def totals(self, session, metric, start=None, end=None):
+        """
+        Sums a metric per subject over [start, end), or over all time.
+        Bounds are rounded down to the minute.
+        :return: Dictionary of subject -> (total, samples)
+        """
+        table = self.table
+        if start is None and end is None:
+            ranges = [("day", None, None)]
+        else:
+            ranges = plan_range(start or _EPOCH, end or ceil_time(utc_now(), "minute"))
+        totals = collections.defaultdict(lambda: [0, 0])
+        for granularity, first, last in ranges:
+            query = (select(table.c.subject, func.sum(table.c.total), func.sum(table.c.samples))
+                     .where(table.c.metric == metric, table.c.granularity == granularity)
+                     .group_by(table.c.subject))
+            if first is not None:
+                query = query.where(table.c.bucket >= first, table.c.bucket < last)
+            for subject, total, samples in session.execute(query):
+                totals[subject][0] += total or 0
+                totals[subject][1] += samples or 0
+        return {subject: tuple(total) for subject, total in totals.items()}
+
+    def prune(self, session, granularity, before):
+        """Deletes buckets of one granularity older than ``before``; ranges reaching back that far lose precision."""
+        table = self.table
+        result = session.execute(table.delete().where(table.c.granularity == granularity, table.c.bucket < before))
+        return result.rowcount
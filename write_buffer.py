@@ -0,0 +1,355 @@
+import collections
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from db_pool import PoolTimeout
+
+
+class BufferFull(Exception):
+    """Raised when the buffer stays full for longer than the put timeout."""
+
+
+def is_transient(error):
+    """
+    Returns whether a sink error is worth retrying: connection and timeout errors, an
+    exhausted pool and DB-API OperationalError/InterfaceError. Anything else (integrity
+    or data errors, bugs) would fail the same way again.
+    """
+    if isinstance(error, (OSError, PoolTimeout)):
+        return True
+    return any(cls.__name__ in ("OperationalError", "InterfaceError") for cls in type(error).__mro__)
+
+
+class WriteBuffer:
+    """
+    Write-behind queue in front of a batch sink such as NetworkDatabase.add_many.
+
+    put() returns as soon as a record is queued and, when a journal is configured,
+    appended to it and fsynced. Concurrent puts share one fsync (group commit). A
+    background thread hands records to the sink in batches of up to ``max_batch``,
+    at least every ``flush_interval`` seconds, and records in the journal which
+    ones were written. On start-up, journaled records that were never flushed are
+    queued again, so delivery is at-least-once: a crash between a sink commit and
+    its journal marker replays that batch.
+
+    Every process keeps its own journal (``journal_path`` with a pid suffix), locked
+    for as long as the buffer is open, so several workers can share one path. At
+    start-up a buffer also adopts the journals of processes that have exited. Batches
+    failing with a transient error (see is_transient) are retried with backoff; a batch
+    the sink rejects otherwise is retried record by record and the rejected records
+    are moved to a dead-letter file, so one bad record cannot hold up the rest.
+    """
+
+    def __init__(self, sink, journal_path=None, max_batch=500, flush_interval=1.0, max_pending=10000,
+                 put_timeout=5.0, durable=True, journal_limit=64 * 1024 * 1024, transient=is_transient,
+                 dead_letter_path=None):
+        """
+        :param sink: Callable taking a list of records and storing them
+        :param journal_path: Append-only spill file, or None to keep records in memory only;
+                             each process writes to this path with its pid appended
+        :param max_batch: Maximum records per sink call; a full batch is flushed immediately
+        :param flush_interval: Maximum seconds a record waits before being flushed
+        :param max_pending: Records buffered before put() blocks
+        :param put_timeout: Seconds put() waits for space before raising BufferFull
+        :param durable: Wait for the journal fsync before put() returns
+        :param journal_limit: Journal size in bytes above which it is compacted
+        :param transient: Callable telling whether a sink error should be retried
+        :param dead_letter_path: File the records rejected by the sink are appended to,
+                                 defaults to journal_path + '.dead'; they are only logged without one
+        """
+        self.sink = sink
+        self.journal_path = journal_path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.durable = durable
+        self.journal_limit = journal_limit
+        self.transient = transient
+        self.dead_letter_path = dead_letter_path or (journal_path and journal_path + ".dead")
+        self.journal_file = journal_path and f"{journal_path}.{os.getpid()}"
+        self._pending = collections.deque()  # (seq, record)
+        self._seq = 0
+        self._flushed_seq = 0
+        self._synced_seq = 0
+        self._flush_requested = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._sync_lock = threading.Lock()  # Taken before _condition when both are needed
+        self._journal = None
+        self._lock = None  # Held while this process owns journal_file
+        if journal_path:
+            os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+            self._recover()
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, record, timeout=None):
+        """
+        Queues a record for writing.
+        :param timeout: Seconds to wait for space, defaults to put_timeout
+        :return: Sequence number of the record
+        """
+        timeout = self.put_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while len(self._pending) >= self.max_pending and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise BufferFull(f"Write buffer is full ({self.max_pending} records pending)")
+                self._condition.wait(remaining)
+            if self._closed:
+                raise BufferFull("Write buffer is closed")
+            self._seq += 1
+            seq = self._seq
+            self._pending.append((seq, record))
+            if self._journal is not None:
+                self._journal.write(json.dumps({"seq": seq, "record": record}) + "\n")
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify_all()
+        if self._journal is not None and self.durable:
+            self._sync(seq)
+        return seq
+
+    def flush(self, timeout=None):
+        """
+        Writes everything queued so far.
+        :return: True if all records were flushed before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            target = self._seq
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._flushed_seq < target and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return self._flushed_seq >= target
+
+    def close(self, timeout=None):
+        """Flushes pending records and stops the background thread."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+        with self._sync_lock, self._condition:
+            if self._journal is not None:
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
+                if not self._pending:
+                    # Nothing left to recover; keeps restarted workers from leaving files behind
+                    _remove(self.journal_file)
+                    _remove(self.journal_file + ".lock")
+            if self._lock is not None:
+                self._lock.close()
+                self._lock = None
+        if self._pending:
+            logging.warning(f"Write buffer closed with {len(self._pending)} records left in the journal")
+
+    def stats(self):
+        with self._condition:
+            return {"pending": len(self._pending), "written": self._flushed_seq, "accepted": self._seq}
+
+    def _sync(self, seq):
+        # Group commit: whoever holds the lock fsyncs every record written so far,
+        # so threads queued behind it usually find their record already synced
+        with self._sync_lock:
+            if self._synced_seq >= seq or self._journal is None:
+                return
+            with self._condition:
+                self._journal.flush()
+                target = self._seq
+            os.fsync(self._journal.fileno())
+            self._synced_seq = target
+
+    def _run(self):
+        backoff = 0.1
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.flush_interval
+                while (not self._closed and not self._flush_requested and len(self._pending) < self.max_batch):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if not self._pending:
+                    self._flush_requested = False
+                    self._condition.notify_all()
+                    if self._closed:
+                        return
+                    continue
+                # Records stay queued (and journaled) until the sink has stored them
+                batch = [self._pending[i] for i in range(min(self.max_batch, len(self._pending)))]
+
+            try:
+                self.sink([record for _, record in batch])
+                done = batch
+            except Exception as e:
+                if self.transient(e):
+                    logging.error(f"Error writing {len(batch)} buffered records: {e}")
+                    done = []
+                else:
+                    logging.error(f"Sink rejected a batch of {len(batch)} buffered records: {e}")
+                    done = self._write_singly(batch, e)
+            if len(done) < len(batch):
+                with self._condition:
+                    if self._closed and not done:
+                        return  # Left in the journal for the next start
+                    if not self._closed:
+                        self._condition.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+                if not done:
+                    continue
+            else:
+                backoff = 0.1
+            batch = done
+
+            with self._condition:
+                for _ in batch:
+                    self._pending.popleft()
+                self._flushed_seq = batch[-1][0]
+                if self._journal is not None:
+                    self._journal.write(json.dumps({"flushed": self._flushed_seq}) + "\n")
+                self._condition.notify_all()
+            if self._journal is not None:
+                self._compact()
+
+    def _write_singly(self, batch, error):
+        """
+        Writes a rejected batch one record at a time, dead-lettering the records the sink rejects.
+        :return: The leading records of the batch that are done with, up to the first transient error
+        """
+        if len(batch) == 1:
+            self._dead_letter(batch[0], error)
+            return batch
+        done = []
+        for entry in batch:
+            try:
+                self.sink([entry[1]])
+            except Exception as e:
+                if self.transient(e):
+                    logging.error(f"Error writing buffered record {entry[0]}, retrying: {e}")
+                    break
+                self._dead_letter(entry, e)
+            done.append(entry)
+        return done
+
+    def _dead_letter(self, entry, error):
+        seq, record = entry
+        logging.error(f"Dropping buffered record {seq} rejected by the sink: {error!r}")
+        if not self.dead_letter_path:
+            logging.error(f"Dropped record: {json.dumps(record)}")
+            return
+        line = json.dumps({"record": record, "error": repr(error), "time": time.time()}) + "\n"
+        with open(self.dead_letter_path, "a", encoding="utf-8") as file:
+            file.write(line)  # One append per line, so workers sharing the file do not interleave
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _compact(self, force=False):
+        """Rewrites the journal with only the unflushed records once it is empty or too large."""
+        with self._sync_lock, self._condition:
+            if not force and self._pending and self._journal.tell() < self.journal_limit:
+                return
+            if not force and not self._pending and self._journal.tell() == 0:
+                return
+            temporary = self.journal_file + ".tmp"
+            with open(temporary, "w", encoding="utf-8") as file:
+                for seq, record in self._pending:
+                    file.write(json.dumps({"seq": seq, "record": record}) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._journal.close()
+            os.replace(temporary, self.journal_file)
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            self._synced_seq = self._seq
+
+    def _recover(self):
+        # Starting buffers take turns, so an orphaned journal is adopted by exactly one of them
+        # and none mistakes another's journal for an orphan before its owner has locked it
+        with open(self.journal_path + ".recover.lock", "a") as recovery:
+            fcntl.flock(recovery, fcntl.LOCK_EX)
+            self._lock = open(self.journal_file + ".lock", "a")
+            try:
+                fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self._lock.close()
+                self._lock = None
+                raise RuntimeError(f"{self.journal_file} is used by another write buffer") from None
+
+            records, self._seq = _read_journal(self.journal_file)
+            self._pending.extend(records)
+            orphans = []
+            for lock_path in glob.glob(glob.escape(self.journal_path) + ".*.lock"):
+                pid = lock_path[len(self.journal_path) + 1:-len(".lock")]
+                if not pid.isdigit() or lock_path == self._lock.name:
+                    continue
+                lock = open(lock_path, "a")
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()  # Its process is still running
+                    continue
+                orphans.append((lock_path[:-len(".lock")], lock))
+            if os.path.exists(self.journal_path):
+                orphans.append((self.journal_path, None))  # Written before journals were per process
+            for path, _ in orphans:
+                records, _ = _read_journal(path)
+                if records:
+                    logging.info(f"Adopting {len(records)} unwritten records from {path}")
+                for _, record in records:
+                    self._seq += 1
+                    self._pending.append((self._seq, record))
+
+            self._flushed_seq = self._synced_seq = self._seq - len(self._pending)
+            if self._pending:
+                logging.info(f"Recovered {len(self._pending)} unwritten records into {self.journal_file}")
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            self._compact(force=True)
+            # The adopted records are in this process's journal now
+            for path, lock in orphans:
+                _remove(path)
+                if lock is not None:
+                    _remove(lock.name)
+                    lock.close()
+
+
+def _read_journal(path):
+    """
+    Reads a journal.
+    :return: The (seq, record) pairs that were never flushed, and the highest sequence number
+    """
+    records = []
+    flushed = 0
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Torn write at the end of the file
+                if "flushed" in entry:
+                    flushed = max(flushed, entry["flushed"])
+                else:
+                    records.append((entry["seq"], entry["record"]))
+    return [(seq, record) for seq, record in records if seq > flushed], max([flushed] + [seq for seq, _ in records])
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass